@@ -1,39 +1,223 @@
+import os
 import numpy as np
-from typing import Optional
+from typing import List, Optional
+
+from backend.config import settings
 
 PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
+N_FFT = 2048
+HOP_LENGTH = 512
+
+#Streaming analysis — frames per block (~47s at 22050 Hz) and tempogram window
+STREAM_BLOCK_FRAMES = 2048
+TEMPOGRAM_WIN_LENGTH = 384
+STREAM_FALLBACK_EXCERPT_SEC = 120.0
+
+#Bump whenever feature extraction changes so cached results are recomputed
+ANALYZER_VERSION = 2
+ENERGY_ENVELOPE_POINTS = 64
+
 
-def analyze_track(file_path: str) -> dict:
+def analyze_track(
+    file_path: str,
+    excerpt_sec: Optional[float] = None,
+    sample_rate: Optional[int] = None,
+) -> dict:
     #Extract BPM, key signature, and duration using librosa
     #Returns dict with nullable fields so track still gets cataloged on failure
+    #Decodes once (optionally just an excerpt) and shares one STFT between tempo and key
     import librosa
 
+    excerpt_sec = settings.analysis_excerpt_sec if excerpt_sec is None else excerpt_sec
+    sample_rate = sample_rate or settings.analysis_sample_rate
+
+    #Duration from the container header, no decode needed
+    duration_sec = read_duration(file_path)
+
+    #Long recordings go through the blockwise path so memory stays bounded
+    if not excerpt_sec and _should_stream(file_path):
+        result = analyze_track_streaming(file_path, duration_sec)
+        if result is not None:
+            return result
+        #Container not seekable by soundfile (e.g. some mp3s) — analyze a bounded excerpt instead
+        excerpt_sec = STREAM_FALLBACK_EXCERPT_SEC
+
+    offset = 0.0
+    load_duration = None
+    if excerpt_sec and excerpt_sec > 0:
+        load_duration = excerpt_sec
+        #Take the excerpt from the middle, intros and outros are often beatless
+        if duration_sec and duration_sec > excerpt_sec:
+            offset = (duration_sec - excerpt_sec) / 2
+
     try:
-        y, sr = librosa.load(file_path, sr=22050)
+        y, sr = librosa.load(file_path, sr=sample_rate, mono=True, offset=offset, duration=load_duration)
     except Exception:
         return {"duration_sec": None, "bpm": None, "key_signature": None}
 
-    #Duration
-    duration_sec = float(librosa.get_duration(y=y, sr=sr))
+    #No usable header — fall back to the decoded length if we decoded the whole file
+    decoded_sec = float(librosa.get_duration(y=y, sr=sr))
+    if duration_sec is None and (load_duration is None or decoded_sec < load_duration):
+        duration_sec = decoded_sec
 
-    #BPM via beat tracking
-    bpm = _extract_bpm(y, sr)
+    #A zero-length or corrupt decode fails here — the track is still cataloged with what we have
+    power = None
+    try:
+        power = _power_spectrogram(y)
+        onset_env = _onset_envelope(power, sr)
+    except Exception:
+        onset_env = np.zeros(0)
 
-    #Key via chroma analysis
-    key_signature = _extract_key(y, sr)
+    #BPM via beat tracking on the shared onset envelope
+    bpm = _extract_bpm(onset_env, sr)
+
+    #Key via chroma of the shared spectrogram
+    chroma_mean = _chroma_mean(power, sr) if power is not None else None
+    key_signature = _extract_key(chroma_mean)
 
     return {
         "duration_sec": duration_sec,
         "bpm": bpm,
         "key_signature": key_signature,
+        "chroma_mean": chroma_mean.tolist() if chroma_mean is not None else None,
+        "onset_mean": float(onset_env.mean()) if onset_env.size else None,
+        "onset_std": float(onset_env.std()) if onset_env.size else None,
+        "onset_max": float(onset_env.max()) if onset_env.size else None,
+        "energy_envelope": _resample_envelope(np.sqrt(power.mean(axis=0))) if power is not None else None,
     }
 
 
-def _extract_bpm(y: np.ndarray, sr: int) -> Optional[float]:
+def analyze_track_streaming(file_path: str, duration_sec: Optional[float] = None) -> Optional[dict]:
+    #Blockwise analysis: peak memory is one block regardless of file length
+    #Tempo comes from a running mean tempogram, key from a running chroma sum
+    #Returns None if the file can't be streamed so the caller can fall back
+    import librosa
+
+    try:
+        sr = librosa.get_samplerate(file_path)
+        blocks = librosa.stream(
+            file_path,
+            block_length=STREAM_BLOCK_FRAMES,
+            frame_length=N_FFT,
+            hop_length=HOP_LENGTH,
+            mono=True,
+            fill_value=0,
+        )
+    except Exception:
+        return None
+
+    chroma_sum = np.zeros(len(PITCH_CLASSES))
+    tempogram_sum = None
+    onset_sum = onset_sq_sum = 0.0
+    onset_max = 0.0
+    block_energy = []
+    n_frames = 0
+    n_samples = 0
+    try:
+        for block in blocks:
+            n_samples += len(block)
+            power = np.abs(librosa.stft(block, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)) ** 2
+            if power.shape[1] == 0:
+                continue
+
+            chroma = librosa.feature.chroma_stft(S=power, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+            chroma_sum += chroma.sum(axis=1)
+
+            onset_env = _onset_envelope(power, sr)
+            onset_sum += float(onset_env.sum())
+            onset_sq_sum += float(np.square(onset_env).sum())
+            onset_max = max(onset_max, float(onset_env.max()))
+            block_energy.append(float(np.sqrt(power.mean())))
+
+            tempogram = librosa.feature.tempogram(
+                onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH, win_length=TEMPOGRAM_WIN_LENGTH
+            )
+            block_sum = tempogram.sum(axis=1)
+            tempogram_sum = block_sum if tempogram_sum is None else tempogram_sum + block_sum
+            n_frames += power.shape[1]
+    except Exception:
+        return None
+
+    if n_samples == 0:
+        return None
+
+    if duration_sec is None:
+        duration_sec = n_samples / sr
+
+    if not n_frames:
+        return {"duration_sec": float(duration_sec), "bpm": None, "key_signature": None}
+
+    chroma_mean = chroma_sum / n_frames
+    onset_mean = onset_sum / n_frames
+    return {
+        "duration_sec": float(duration_sec),
+        "bpm": _tempo_from_tempogram(tempogram_sum / n_frames, sr),
+        "key_signature": _extract_key(chroma_mean),
+        "chroma_mean": chroma_mean.tolist(),
+        "onset_mean": onset_mean,
+        "onset_std": float(np.sqrt(max(onset_sq_sum / n_frames - onset_mean ** 2, 0.0))),
+        "onset_max": onset_max,
+        "energy_envelope": _resample_envelope(np.asarray(block_energy)),
+    }
+
+
+def _should_stream(file_path: str) -> bool:
+    threshold_mb = settings.analysis_stream_threshold_mb
+    if not threshold_mb:
+        return False
+    try:
+        return os.path.getsize(file_path) > threshold_mb * 1024 * 1024
+    except OSError:
+        return False
+
+
+def _tempo_from_tempogram(mean_tempogram: np.ndarray, sr: int, start_bpm: float = 120.0) -> Optional[float]:
+    #Same estimator as librosa.feature.tempo: log-normal prior around start_bpm, argmax over lags
+    import librosa
+
+    bpms = librosa.tempo_frequencies(len(mean_tempogram), hop_length=HOP_LENGTH, sr=sr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logprior = -0.5 * ((np.log2(bpms) - np.log2(start_bpm)) / 1.0) ** 2
+    logprior[~np.isfinite(bpms)] = -np.inf
+    logprior[bpms > 320] = -np.inf
+
+    scores = np.log1p(1e6 * mean_tempogram) + logprior
+    if not np.isfinite(scores).any():
+        return None
+    return float(bpms[int(np.argmax(scores))])
+
+
+def read_duration(file_path: str) -> Optional[float]:
+    #Header-only duration — soundfile for wav/flac, librosa's path mode for the rest
+    try:
+        import soundfile
+        return float(soundfile.info(file_path).duration)
+    except Exception:
+        pass
+    try:
+        import librosa
+        return float(librosa.get_duration(path=file_path))
+    except Exception:
+        return None
+
+
+def _power_spectrogram(y: np.ndarray) -> np.ndarray:
+    import librosa
+    return np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+
+
+def _onset_envelope(power: np.ndarray, sr: int) -> np.ndarray:
+    #Same mel/log front end librosa uses internally, built from the shared STFT
+    import librosa
+    mel = librosa.feature.melspectrogram(S=power, sr=sr)
+    return librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=sr, hop_length=HOP_LENGTH)
+
+
+def _extract_bpm(onset_env: np.ndarray, sr: int) -> Optional[float]:
     try:
         import librosa
-        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
         # librosa >= 0.10 returns an array
         if hasattr(tempo, "__len__"):
             return float(tempo[0])
@@ -42,12 +226,24 @@ def _extract_bpm(y: np.ndarray, sr: int) -> Optional[float]:
         return None
 
 
-def _extract_key(y: np.ndarray, sr: int) -> Optional[str]:
+def _chroma_mean(power: np.ndarray, sr: int) -> Optional[np.ndarray]:
     try:
         import librosa
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        chroma_mean = np.mean(chroma, axis=1)
-        key_index = int(np.argmax(chroma_mean))
-        return PITCH_CLASSES[key_index]
+        chroma = librosa.feature.chroma_stft(S=power, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        return np.mean(chroma, axis=1)
     except Exception:
         return None
+
+
+def _extract_key(chroma_mean: Optional[np.ndarray]) -> Optional[str]:
+    if chroma_mean is None or not np.isfinite(chroma_mean).all():
+        return None
+    return PITCH_CLASSES[int(np.argmax(chroma_mean))]
+
+
+def _resample_envelope(values: np.ndarray, points: int = ENERGY_ENVELOPE_POINTS) -> Optional[List[float]]:
+    #Fixed-length energy envelope so every track's feature vector has the same shape
+    if values.size == 0:
+        return None
+    positions = np.linspace(0, values.size - 1, points)
+    return np.interp(positions, np.arange(values.size), values).astype(float).tolist()
@@ -0,0 +1,189 @@
+import fcntl
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from backend.config import settings
+from backend.audio_processor.analyzer import (
+    ANALYZER_VERSION,
+    ENERGY_ENVELOPE_POINTS,
+    PITCH_CLASSES,
+    analyze_track,
+)
+from backend.audio_processor.scanner import full_content_hash
+
+#One fixed-size record per track, stored as a single memory-mapped .npy array
+RECORD_DTYPE = np.dtype([
+    ("key", "S32"),
+    ("last_access", "<f8"),
+    ("duration_sec", "<f4"),
+    ("bpm", "<f4"),
+    ("key_index", "<i1"),
+    ("chroma_mean", "<f4", (len(PITCH_CLASSES),)),
+    ("onset_mean", "<f4"),
+    ("onset_std", "<f4"),
+    ("onset_max", "<f4"),
+    ("energy_envelope", "<f4", (ENERGY_ENVELOPE_POINTS,)),
+])
+
+
+def cache_key(content_hash: str) -> bytes:
+    #Keyed on the full-content hash only, so a copy, a restore or the same file on another node hits;
+    #analyzer version and parameters are part of the key, so changing either misses cleanly
+    params = (
+        f"{content_hash}:{ANALYZER_VERSION}:{settings.analysis_sample_rate}:"
+        f"{settings.analysis_excerpt_sec}:{settings.analysis_stream_threshold_mb}"
+    )
+    return hashlib.blake2b(params.encode(), digest_size=16).hexdigest().encode()
+
+
+def _optional(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+class FeatureCache:
+    #On-disk analysis cache with size-bounded LRU eviction
+    #Writes take an flock so several API workers can share one cache file
+    def __init__(self, directory: str, max_mb: int):
+        self.directory = directory
+        self.capacity = max(1, (max_mb * 1024 * 1024) // RECORD_DTYPE.itemsize)
+        self.path = os.path.join(directory, "features.npy")
+        self.lock_path = os.path.join(directory, "features.lock")
+        self._records: Optional[np.memmap] = None
+        self._index: Dict[bytes, int] = {}
+        self._free: list = []
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self):
+        if self._records is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        records = None
+        if os.path.exists(self.path):
+            try:
+                records = np.lib.format.open_memmap(self.path, mode="r+")
+                if records.dtype != RECORD_DTYPE or records.shape != (self.capacity,):
+                    #Layout or size changed — start over rather than migrate
+                    records = None
+            except (ValueError, OSError):
+                records = None
+        if records is None:
+            records = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=RECORD_DTYPE, shape=(self.capacity,)
+            )
+        self._records = records
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        keys = self._records["key"]
+        used = np.flatnonzero(keys != b"")
+        self._index = {bytes(keys[slot]): int(slot) for slot in used}
+        self._free = np.flatnonzero(keys == b"").tolist()
+
+    def get(self, content_hash: Optional[str]) -> Optional[dict]:
+        if not content_hash:
+            return None
+        self._open()
+        key = cache_key(content_hash)
+        slot = self._index.get(key)
+        if slot is None or self._records["key"][slot] != key:
+            #Another process may have evicted or written this slot since we indexed
+            if slot is not None:
+                self._rebuild_index()
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._records["last_access"][slot] = time.time()
+        return self._to_analysis(self._records[slot])
+
+    def put(self, content_hash: Optional[str], analysis: dict):
+        #Failed analyses aren't cached — the next scan should retry them
+        if not content_hash or analysis.get("duration_sec") is None:
+            return
+        self._open()
+        key = cache_key(content_hash)
+        with open(self.lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            slot = self._index.get(key)
+            if slot is None:
+                slot = self._claim_slot()
+            self._write(slot, key, analysis)
+
+    def flush(self):
+        if self._records is not None:
+            self._records.flush()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _claim_slot(self) -> int:
+        while self._free:
+            slot = self._free.pop()
+            if self._records["key"][slot] == b"":
+                return slot
+        #Full — evict the least recently used entry
+        slot = int(np.argmin(self._records["last_access"]))
+        self._index.pop(bytes(self._records["key"][slot]), None)
+        return slot
+
+    def _write(self, slot: int, key: bytes, analysis: dict):
+        record = np.zeros((), dtype=RECORD_DTYPE)
+        record["key"] = key
+        record["last_access"] = time.time()
+        record["duration_sec"] = analysis.get("duration_sec")
+        record["bpm"] = np.nan if analysis.get("bpm") is None else analysis["bpm"]
+        key_signature = analysis.get("key_signature")
+        record["key_index"] = PITCH_CLASSES.index(key_signature) if key_signature in PITCH_CLASSES else -1
+        record["chroma_mean"] = analysis.get("chroma_mean") or np.nan
+        for field in ("onset_mean", "onset_std", "onset_max"):
+            record[field] = np.nan if analysis.get(field) is None else analysis[field]
+        record["energy_envelope"] = analysis.get("energy_envelope") or np.nan
+        self._records[slot] = record
+        self._index[key] = slot
+
+    @staticmethod
+    def _to_analysis(record) -> dict:
+        chroma_mean = record["chroma_mean"]
+        energy_envelope = record["energy_envelope"]
+        key_index = int(record["key_index"])
+        return {
+            "duration_sec": _optional(record["duration_sec"]),
+            "bpm": _optional(record["bpm"]),
+            "key_signature": PITCH_CLASSES[key_index] if key_index >= 0 else None,
+            "chroma_mean": None if np.isnan(chroma_mean).any() else chroma_mean.astype(float).tolist(),
+            "onset_mean": _optional(record["onset_mean"]),
+            "onset_std": _optional(record["onset_std"]),
+            "onset_max": _optional(record["onset_max"]),
+            "energy_envelope": None if np.isnan(energy_envelope).any() else energy_envelope.astype(float).tolist(),
+        }
+
+
+def analyze_track_cached(file_path: str, content_hash: Optional[str] = None) -> dict:
+    #Cache-first analysis for one-off re-analysis outside the scan pipeline
+    #content_hash, when given, must be the file's full_content_hash
+    if not settings.feature_cache_enabled:
+        return analyze_track(file_path)
+    content_hash = content_hash or full_content_hash(file_path)
+    cached = feature_cache.get(content_hash)
+    if cached is not None:
+        return cached
+    analysis = analyze_track(file_path)
+    feature_cache.put(content_hash, analysis)
+    feature_cache.flush()
+    return analysis
+
+
+# Singleton
+feature_cache = FeatureCache(settings.feature_cache_dir, settings.feature_cache_max_mb)
@@ -0,0 +1,223 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from backend.db.database import async_session_factory
+from backend.db.queries import LibraryQueries, ScanJobQueries
+from backend.audio_processor.scanner import scan_directory
+from backend.audio_processor.pipeline import analyze_and_store, plan_rescan
+from backend.audio_processor.track_index import track_index
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled", "interrupted"}
+RESUMABLE_STATUSES = {"failed", "cancelled", "interrupted"}
+
+
+class ScanJob:
+    #In-memory state of a running scan, mirrored to the scan_jobs table on every batch commit
+    def __init__(self, job_id: int, directory_path: str):
+        self.id = job_id
+        self.directory_path = directory_path
+        self.status = "pending"
+        self.files_found = 0
+        self.files_analyzed = 0
+        self.files_failed = 0
+        self.files_skipped = 0
+        self.files_moved = 0
+        self.files_removed = 0
+        self.last_committed_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def files_processed(self) -> int:
+        return self.files_analyzed + self.files_failed
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        throughput = self.files_processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.files_found - self.files_skipped - self.files_processed
+        eta = remaining / throughput if throughput > 0 and remaining > 0 else None
+        return {
+            "job_id": self.id,
+            "directory_path": self.directory_path,
+            "status": self.status,
+            "files_found": self.files_found,
+            "files_analyzed": self.files_analyzed,
+            "files_failed": self.files_failed,
+            "files_skipped": self.files_skipped,
+            "files_moved": self.files_moved,
+            "files_removed": self.files_removed,
+            "last_committed_path": self.last_committed_path,
+            "error": self.error,
+            "elapsed_sec": round(elapsed, 1),
+            "files_per_sec": round(throughput, 2),
+            "eta_sec": round(eta, 1) if eta is not None else None,
+        }
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=16)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self):
+        #Slow consumers drop stale snapshots — the latest one always gets through
+        snapshot = self.snapshot()
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+
+def snapshot_from_record(record) -> dict:
+    #Status for jobs not running in this process (finished, or from a previous run)
+    return {
+        "job_id": record.id,
+        "directory_path": record.directory_path,
+        "status": record.status,
+        "files_found": record.files_found,
+        "files_analyzed": record.files_analyzed,
+        "files_failed": record.files_failed,
+        "files_skipped": record.files_skipped,
+        "files_moved": record.files_moved,
+        "files_removed": record.files_removed,
+        "last_committed_path": record.last_committed_path,
+        "error": record.error,
+        "elapsed_sec": None,
+        "files_per_sec": None,
+        "eta_sec": None,
+    }
+
+
+class ScanJobManager:
+    def __init__(self):
+        self.jobs: Dict[int, ScanJob] = {}
+
+    async def start(self, directory_path: str) -> ScanJob:
+        async with async_session_factory() as db:
+            record = await ScanJobQueries.create_job(db, directory_path)
+            await db.commit()
+        return self._launch(ScanJob(record.id, directory_path))
+
+    async def resume(self, job_id: int) -> Optional[ScanJob]:
+        #Rerun an interrupted job — files committed before it stopped match their fingerprint and are skipped
+        active = self.jobs.get(job_id)
+        if active and active.status not in FINISHED_STATUSES:
+            return active
+
+        async with async_session_factory() as db:
+            record = await ScanJobQueries.get_by_id(db, job_id)
+        if record is None:
+            return None
+        if record.status not in RESUMABLE_STATUSES:
+            raise ValueError(f"Scan job {job_id} is {record.status} and cannot be resumed")
+        return self._launch(ScanJob(record.id, record.directory_path))
+
+    def cancel(self, job_id: int) -> Optional[ScanJob]:
+        job = self.jobs.get(job_id)
+        if job and job.task and not job.task.done():
+            job.task.cancel()
+        return job
+
+    def get_active(self, job_id: int) -> Optional[ScanJob]:
+        return self.jobs.get(job_id)
+
+    async def get_status(self, job_id: int) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job:
+            return job.snapshot()
+        async with async_session_factory() as db:
+            record = await ScanJobQueries.get_by_id(db, job_id)
+        return snapshot_from_record(record) if record else None
+
+    async def recover(self) -> int:
+        #Called at startup — anything still marked running died with the previous process
+        async with async_session_factory() as db:
+            return await ScanJobQueries.mark_interrupted(db)
+
+    async def shutdown(self):
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, job: ScanJob) -> ScanJob:
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: ScanJob):
+        async with async_session_factory() as db:
+
+            async def persist(**fields):
+                await ScanJobQueries.update_job(
+                    db,
+                    job.id,
+                    status=job.status,
+                    files_found=job.files_found,
+                    files_analyzed=job.files_analyzed,
+                    files_failed=job.files_failed,
+                    files_skipped=job.files_skipped,
+                    files_moved=job.files_moved,
+                    files_removed=job.files_removed,
+                    last_committed_path=job.last_committed_path,
+                    error=job.error,
+                    **fields,
+                )
+
+            def on_result(entry: dict, analysis: dict):
+                if analysis.get("duration_sec") is None:
+                    job.files_failed += 1
+                else:
+                    job.files_analyzed += 1
+                job.publish()
+
+            async def on_commit(rows: List[dict]):
+                job.last_committed_path = rows[-1]["file_path"]
+                await persist()
+
+            try:
+                job.status = "running"
+                loop = asyncio.get_running_loop()
+                found = await loop.run_in_executor(None, scan_directory, job.directory_path)
+                job.files_found = len(found)
+
+                plan = await plan_rescan(db, job.directory_path, found)
+                job.files_moved = await LibraryQueries.relink_tracks(db, plan.moves)
+                job.files_removed = await LibraryQueries.tombstone_tracks(db, plan.missing_ids)
+                track_index.invalidate([move["id"] for move in plan.moves] + plan.missing_ids)
+                job.files_skipped = len(found) - len(plan.to_analyze)
+                await persist()
+                job.publish()
+
+                await analyze_and_store(db, plan.to_analyze, on_result=on_result, on_commit=on_commit)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"Scan job {job.id} failed: {e}")
+            finally:
+                persisted = True
+                try:
+                    await persist(finished_at=datetime.now(timezone.utc))
+                except Exception as e:
+                    persisted = False
+                    print(f"Scan job {job.id} could not persist final state: {e}")
+                job.publish()
+                #Finished jobs are served from scan_jobs by get_status, so only running ones stay in memory;
+                #one whose final state didn't reach the DB is kept so its status stays accurate
+                if persisted and self.jobs.get(job.id) is job:
+                    del self.jobs[job.id]
+                print(f"Scan job {job.id} {job.status}: {job.files_analyzed} analyzed, {job.files_failed} failed")
+
+
+# Singleton
+scan_jobs = ScanJobManager()
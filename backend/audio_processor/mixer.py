@@ -0,0 +1,228 @@
+import math
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.config import settings
+from backend.models.schemas import ModulationSchedule
+from backend.audio_processor.analyzer import PITCH_CLASSES
+from backend.audio_processor.renderer import ScheduleRenderer, to_pcm16, wav_header
+
+#Cost weights for picking the next track
+KEY_DISTANCE_WEIGHT = 0.05
+REPEAT_PENALTY = 1.0
+#Tracks shorter than this can't carry a crossfade on both ends
+MIN_TRACK_SEC = 20.0
+
+
+@dataclass
+class MixSegment:
+    #One library track placed on the session timeline
+    file_path: str
+    start_sec: float
+    duration_sec: float
+    #Playback rate, >1 speeds the track up toward the step's target_bpm
+    rate: float
+    fade_in_sec: float
+    fade_out_sec: float
+
+
+def fifths_distance(key_a: Optional[str], key_b: Optional[str]) -> int:
+    #Steps apart on the circle of fifths, 0 when either key is unknown
+    if key_a not in PITCH_CLASSES or key_b not in PITCH_CLASSES:
+        return 0
+    a = PITCH_CLASSES.index(key_a) * 7 % 12
+    b = PITCH_CLASSES.index(key_b) * 7 % 12
+    return min(abs(a - b), 12 - abs(a - b))
+
+
+def tempo_rate(track_bpm: float, target_bpm: float, max_stretch: float) -> Optional[float]:
+    #Playback rate that lands the track on target_bpm, allowing half/double time
+    #None when even the closest octave needs more stretch than max_stretch
+    octave = round(math.log2(target_bpm / track_bpm))
+    rate = target_bpm / (track_bpm * 2 ** octave)
+    if abs(rate - 1) > max_stretch:
+        return None
+    return rate
+
+
+def plan_mix(
+    tracks: Sequence,
+    schedule: ModulationSchedule,
+    crossfade_sec: Optional[float] = None,
+    max_stretch: Optional[float] = None,
+) -> List[MixSegment]:
+    #Greedy track order: for the step active at each point, take the track needing the least
+    #tempo change, nudged toward keys near the previous track and away from repeats
+    #Tracks only need file_path, bpm, key_signature and duration_sec, so ORM rows or plain objects work
+    crossfade_sec = settings.mix_crossfade_sec if crossfade_sec is None else crossfade_sec
+    max_stretch = settings.mix_max_stretch if max_stretch is None else max_stretch
+    candidates = [
+        t for t in tracks
+        if t.bpm and t.duration_sec and t.duration_sec >= max(MIN_TRACK_SEC, 2 * crossfade_sec)
+    ]
+    steps = sorted(schedule.steps, key=lambda s: s.timestamp_sec)
+    total = float(schedule.total_duration_sec)
+
+    plan: List[MixSegment] = []
+    plays = {}
+    previous = None
+    position = 0.0
+    while candidates and position < total - crossfade_sec:
+        target_bpm = next(s for s in reversed(steps) if s.timestamp_sec <= position or s is steps[0]).target_bpm
+        best = None
+        for track in candidates:
+            rate = tempo_rate(track.bpm, target_bpm, max_stretch)
+            tempo_cost = abs(math.log(rate)) if rate else 1.0 + abs(math.log(target_bpm / track.bpm))
+            cost = (
+                tempo_cost
+                + KEY_DISTANCE_WEIGHT * fifths_distance(previous and previous.key_signature, track.key_signature)
+                + REPEAT_PENALTY * plays.get(track.file_path, 0)
+            )
+            if best is None or cost < best[0]:
+                best = (cost, track, rate or 1.0)
+        _, track, rate = best
+
+        duration = min(track.duration_sec / rate, total - position)
+        fade_in = crossfade_sec if plan else 0.0
+        plan.append(MixSegment(track.file_path, position, duration, rate, fade_in, crossfade_sec))
+        plays[track.file_path] = plays.get(track.file_path, 0) + 1
+        previous = track
+        position += duration - crossfade_sec
+    if plan:
+        plan[-1].fade_out_sec = min(crossfade_sec, plan[-1].duration_sec)
+    return plan
+
+
+def decode_blocks(file_path: str, block_frames: int) -> Iterator[tuple]:
+    #(stereo float32 block, sample rate) pairs, only one block of the file in memory at a time
+    #Decoding starts after the response headers are out, so a file that was moved, deleted or can't
+    #be read just ends early — FrameReader pads the rest of its slot with silence
+    import soundfile as sf
+
+    try:
+        with sf.SoundFile(file_path) as f:
+            sample_rate = f.samplerate
+            for block in f.blocks(blocksize=block_frames, dtype="float32", always_2d=True):
+                if block.shape[1] == 1:
+                    block = np.repeat(block, 2, axis=1)
+                yield block[:, :2], sample_rate
+    except Exception as e:
+        print(f"Mix decode failed for {file_path}, leaving its slot silent: {e}")
+
+
+def varispeed(blocks: Iterable[tuple], out_rate: int, rate: float) -> Iterator[np.ndarray]:
+    #Resamples a block stream by linear interpolation, folding the sample-rate conversion and the
+    #tempo change into one step ratio; pitch moves with tempo, like a DJ deck's pitch fader
+    tail = None
+    position = 0.0
+    for block, in_rate in blocks:
+        step = rate * in_rate / out_rate
+        buffer = block if tail is None else np.concatenate([tail, block])
+        last = len(buffer) - 1
+        if last < 1:
+            tail = buffer
+            continue
+        count = int(math.floor((last - position) / step)) + 1
+        positions = position + step * np.arange(count)
+        index = np.arange(len(buffer))
+        out = np.empty((count, 2), dtype=np.float32)
+        for channel in range(2):
+            out[:, channel] = np.interp(positions, index, buffer[:, channel])
+        yield out
+        position = positions[-1] + step - last
+        tail = buffer[-1:]
+
+
+class FrameReader:
+    #Pulls exact frame counts out of a generator of arbitrarily sized blocks
+    def __init__(self, blocks: Iterator[np.ndarray]):
+        self._blocks = blocks
+        self._pending = np.zeros((0, 2), dtype=np.float32)
+
+    def read(self, n: int) -> np.ndarray:
+        parts = [self._pending]
+        have = len(self._pending)
+        while have < n:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            parts.append(block)
+            have += len(block)
+        data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        self._pending = data[n:]
+        out = data[:n]
+        if len(out) < n:
+            out = np.concatenate([out, np.zeros((n - len(out), 2), dtype=np.float32)])
+        return out
+
+
+def _fade_gain(frames: np.ndarray, total: int, fade_in: int, fade_out: int) -> np.ndarray:
+    #Equal-power fades, so overlapping tracks keep a steady loudness through the crossfade
+    gain = np.ones(len(frames))
+    if fade_in:
+        x = np.clip(frames / fade_in, 0, 1)
+        gain *= np.sin(x * np.pi / 2)
+    if fade_out:
+        x = np.clip((total - frames) / fade_out, 0, 1)
+        gain *= np.sin(x * np.pi / 2)
+    return gain
+
+
+def music_blocks(plan: List[MixSegment], sample_rate: int, total_frames: int, block_frames: int) -> Iterator[np.ndarray]:
+    #Sums the planned segments into fixed-size blocks; a segment is only opened (and decoded)
+    #once the timeline reaches it, and dropped when it ends
+    pending = sorted(plan, key=lambda s: s.start_sec)
+    active = []
+    for block_start in range(0, total_frames, block_frames):
+        n = min(block_frames, total_frames - block_start)
+        block_end = block_start + n
+        while pending and int(pending[0].start_sec * sample_rate) < block_end:
+            segment = pending.pop(0)
+            decoded = decode_blocks(segment.file_path, block_frames)
+            active.append((segment, int(segment.start_sec * sample_rate), FrameReader(varispeed(decoded, sample_rate, segment.rate))))
+
+        out = np.zeros((n, 2), dtype=np.float32)
+        still_active = []
+        for segment, start, reader in active:
+            length = int(segment.duration_sec * sample_rate)
+            lo = max(block_start, start)
+            hi = min(block_end, start + length)
+            if hi > lo:
+                frames = np.arange(lo - start, hi - start)
+                gain = _fade_gain(
+                    frames, length,
+                    int(segment.fade_in_sec * sample_rate), int(segment.fade_out_sec * sample_rate),
+                )
+                out[lo - block_start:hi - block_start] += reader.read(hi - lo) * gain[:, None]
+            if start + length > block_end:
+                still_active.append((segment, start, reader))
+        active = still_active
+        yield out
+
+
+def mix_blocks(
+    music: Iterable[np.ndarray],
+    modulation: Iterable[np.ndarray],
+    music_gain: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    #Beds the music under the rendered modulation layers
+    music_gain = settings.mix_music_gain if music_gain is None else music_gain
+    for bed, layers in zip(music, modulation):
+        yield np.clip(bed * music_gain + layers, -1.0, 1.0)
+
+
+def stream_mix_wav(
+    schedule: ModulationSchedule,
+    tracks: Sequence,
+    sample_rate: Optional[int] = None,
+) -> Iterator[bytes]:
+    #Header first, then one block at a time — the first audio goes out after decoding one block
+    renderer = ScheduleRenderer(schedule, sample_rate=sample_rate)
+    block_frames = int(settings.render_block_sec * renderer.sample_rate)
+    plan = plan_mix(tracks, schedule)
+    yield wav_header(renderer.total_frames, renderer.sample_rate)
+    music = music_blocks(plan, renderer.sample_rate, renderer.total_frames, block_frames)
+    for block in mix_blocks(music, renderer.blocks(block_sec=settings.render_block_sec)):
+        yield to_pcm16(block)
@@ -0,0 +1,53 @@
+from typing import Dict, get_args
+
+import numpy as np
+
+from backend.models.schemas import ModulationSchedule, ModulationStep
+
+LAYERS = list(get_args(ModulationStep.model_fields["layer"].annotation))
+#Columns of ModulationTimeline.targets, one gain column per layer after the two parameters
+PARAMS = ["target_bpm", "binaural_freq"] + [f"gain_{layer}" for layer in LAYERS]
+
+
+class ModulationTimeline:
+    #Continuous parameter curves for a schedule
+    #Each step ramps linearly from wherever the previous ramp had got to, over ramp_duration_sec,
+    #and its layer's gain ramps to 1 while the other layers fade to 0
+    def __init__(self, schedule: ModulationSchedule):
+        steps = sorted(schedule.steps, key=lambda s: s.timestamp_sec)
+        self.duration_sec = float(schedule.total_duration_sec)
+        self.timestamps = np.array([s.timestamp_sec for s in steps], dtype=np.float64)
+        self.ramps = np.array([s.ramp_duration_sec for s in steps], dtype=np.float64)
+        self.targets = np.zeros((len(steps), len(PARAMS)), dtype=np.float64)
+        for i, step in enumerate(steps):
+            self.targets[i, 0] = step.target_bpm
+            self.targets[i, 1] = step.binaural_freq
+            self.targets[i, 2 + LAYERS.index(step.layer)] = 1.0
+
+        #Value each ramp starts from — a step can begin before the previous ramp finished
+        self.starts = self.targets.copy()
+        for i in range(1, len(steps)):
+            self.starts[i] = self._value(i - 1, self.timestamps[i])
+
+    def _value(self, i: int, t: float) -> np.ndarray:
+        progress = 1.0 if self.ramps[i] <= 0 else min(max((t - self.timestamps[i]) / self.ramps[i], 0.0), 1.0)
+        return self.starts[i] + (self.targets[i] - self.starts[i]) * progress
+
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        #(len(times), len(PARAMS)) parameter values, vectorized over any number of time points
+        times = np.asarray(times, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.timestamps, times, side="right") - 1, 0, None)
+        ramps = self.ramps[index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            progress = np.where(ramps > 0, (times - self.timestamps[index]) / ramps, 1.0)
+        progress = np.clip(progress, 0.0, 1.0)[:, None]
+        return self.starts[index] + (self.targets[index] - self.starts[index]) * progress
+
+    def frame_at(self, t: float) -> Dict:
+        values = self.sample(np.array([t]))[0]
+        return {
+            "t": round(t, 3),
+            "target_bpm": round(float(values[0]), 2),
+            "binaural_freq": round(float(values[1]), 3),
+            "gains": {layer: round(float(values[2 + i]), 3) for i, layer in enumerate(LAYERS)},
+        }
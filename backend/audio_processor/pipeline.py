@@ -0,0 +1,242 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+from backend.db.queries import LibraryQueries
+from backend.audio_processor.scanner import full_content_hash, hash_entries
+
+#Shared process pool — librosa is CPU-bound and holds the GIL, so threads don't help
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_worker_count() -> int:
+    return settings.scan_workers or os.cpu_count() or 1
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=get_worker_count())
+    return _executor
+
+
+def shutdown_executor():
+    #Called from app lifespan shutdown
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def build_library_row(entry: dict, analysis: dict) -> dict:
+    #Entries carrying an id are changed files being re-analyzed in place
+    return {
+        "id": entry.get("id"),
+        "file_path": entry["file_path"],
+        "filename": entry["filename"],
+        "format": entry["format"],
+        "duration_sec": analysis.get("duration_sec"),
+        "bpm": analysis.get("bpm"),
+        "key_signature": analysis.get("key_signature"),
+        "analyzed_at": datetime.now(timezone.utc) if analysis.get("duration_sec") else None,
+        "file_size": entry.get("file_size"),
+        "file_mtime": entry.get("file_mtime"),
+        "content_hash": entry.get("content_hash"),
+        "missing_at": None,
+    }
+
+
+class RescanPlan:
+    #Diff of a directory walk against stored fingerprints
+    def __init__(self):
+        self.to_analyze: List[dict] = []
+        self.moves: List[dict] = []
+        self.missing_ids: List[int] = []
+        self.unchanged = 0
+
+
+def _relink_row(track_id: int, entry: dict) -> dict:
+    return {
+        "id": track_id,
+        "file_path": entry["file_path"],
+        "filename": entry["filename"],
+        "format": entry["format"],
+        "file_size": entry.get("file_size"),
+        "file_mtime": entry.get("file_mtime"),
+        "content_hash": entry.get("content_hash"),
+        "missing_at": None,
+    }
+
+
+async def plan_rescan(db: AsyncSession, directory_path: str, found: List[dict]) -> RescanPlan:
+    #Only new or changed files get analyzed; moved files are re-linked, missing ones tombstoned
+    prefix = os.path.join(os.path.abspath(directory_path), "")
+    stored = await LibraryQueries.get_fingerprints(db, prefix)
+    stored_by_path = {row["file_path"]: row for row in stored}
+    found_paths = {entry["file_path"] for entry in found}
+
+    plan = RescanPlan()
+    new_entries = []
+    changed_entries = []
+    for entry in found:
+        row = stored_by_path.get(entry["file_path"])
+        if row is None:
+            new_entries.append(entry)
+        elif (
+            row["file_size"] == entry["file_size"]
+            and row["file_mtime"] == entry["file_mtime"]
+            #A failed analysis is never cached, so the file is retried like a changed one
+            and row["analyzed_at"] is not None
+        ):
+            plan.unchanged += 1
+            if row["missing_at"] is not None:
+                #File came back with the same fingerprint — just lift the tombstone
+                entry["content_hash"] = row["content_hash"]
+                plan.moves.append(_relink_row(row["id"], entry))
+        else:
+            entry["id"] = row["id"]
+            changed_entries.append(entry)
+
+    if settings.scan_content_hash and (new_entries or changed_entries):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, hash_entries, new_entries + changed_entries)
+
+    #Candidates a new path could have been moved from
+    by_hash: Dict[str, List[dict]] = {}
+    by_stat: Dict[tuple, List[dict]] = {}
+    for row in stored:
+        #Relinking copies a row's analysis to the new path, which is no use when it has none
+        if row["file_path"] in found_paths or row["analyzed_at"] is None:
+            continue
+        if row["content_hash"]:
+            by_hash.setdefault(row["content_hash"], []).append(row)
+        else:
+            by_stat.setdefault((row["file_size"], row["file_mtime"]), []).append(row)
+
+    relinked = set()
+    for entry in new_entries:
+        candidates = by_hash.get(entry.get("content_hash")) or by_stat.get((entry["file_size"], entry["file_mtime"]))
+        if candidates:
+            row = candidates.pop()
+            relinked.add(row["id"])
+            plan.moves.append(_relink_row(row["id"], entry))
+        else:
+            plan.to_analyze.append(entry)
+    plan.to_analyze.extend(changed_entries)
+
+    plan.missing_ids = [
+        row["id"] for row in stored
+        if row["file_path"] not in found_paths
+        and row["id"] not in relinked
+        and row["missing_at"] is None
+    ]
+    return plan
+
+
+async def analyze_and_store(
+    db: AsyncSession,
+    entries: List[dict],
+    on_result: Optional[Callable[[dict, dict], None]] = None,
+    on_commit: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+) -> int:
+    #Fan entries out across the process pool, keep a bounded number in flight,
+    #and write results back in multi-row batches as they complete
+    if not entries:
+        return 0
+    #numpy and the analyzer load on the first scan, not at API startup
+    from backend.audio_processor.analyzer import analyze_track
+    from backend.audio_processor.feature_cache import feature_cache
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    max_in_flight = get_worker_count() * 2
+    batch_size = max(1, settings.scan_batch_size)
+    use_cache = settings.feature_cache_enabled
+
+    pending_entries = iter(entries)
+    exhausted = False
+    #future -> (entry, "hash" | "analyze")
+    in_flight = {}
+    batch = []
+    stored = 0
+
+    def record(entry: dict, analysis: dict):
+        batch.append(build_library_row(entry, analysis))
+        if on_result:
+            on_result(entry, analysis)
+
+    def analyze(entry: dict):
+        future = loop.run_in_executor(executor, analyze_track, entry["file_path"])
+        in_flight[future] = (entry, "analyze")
+
+    def fill():
+        #Top up the pool. With the cache on, each file is first hashed in full on a thread — the
+        #cache is keyed on content alone — and only misses go on to a worker
+        nonlocal exhausted
+        while len(in_flight) < max_in_flight and len(batch) < batch_size:
+            entry = next(pending_entries, None)
+            if entry is None:
+                exhausted = True
+                return
+            if use_cache:
+                future = loop.run_in_executor(None, full_content_hash, entry["file_path"])
+                in_flight[future] = (entry, "hash")
+            else:
+                analyze(entry)
+
+    async def flush():
+        nonlocal batch, stored
+        if use_cache:
+            feature_cache.flush()
+        if not batch:
+            return
+        rows, batch = batch, []
+        stored += await LibraryQueries.save_tracks_bulk(db, rows)
+        if on_commit:
+            await on_commit(rows)
+
+    try:
+        while True:
+            fill()
+            done_all = exhausted and not in_flight
+            if len(batch) >= batch_size or done_all:
+                await flush()
+            if done_all:
+                break
+            if not in_flight:
+                continue
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                entry, stage = in_flight.pop(future)
+                if stage == "hash":
+                    entry["feature_hash"] = future.result()
+                    cached = feature_cache.get(entry["feature_hash"])
+                    if cached is not None:
+                        record(entry, cached)
+                    else:
+                        analyze(entry)
+                    continue
+                try:
+                    analysis = future.result()
+                except Exception as e:
+                    #Worker crashed — still catalog the file with null fields
+                    print(f"Analysis failed for {entry['file_path']}: {e}")
+                    analysis = {}
+                if use_cache:
+                    feature_cache.put(entry.get("feature_hash"), analysis)
+                record(entry, analysis)
+    except asyncio.CancelledError:
+        #Keep already-finished results so a resumed scan doesn't redo them
+        await flush()
+        raise
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    return stored
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Set
+
+from backend.config import settings
+
+if TYPE_CHECKING:
+    from backend.audio_processor.modulation import ModulationTimeline
+
+
+class PlaybackStream:
+    #One socket's position in a session, fed by the shared TimerWheel
+    #Frames go into a small latest-wins mailbox: a slow client skips stale frames instead of
+    #buffering without bound, and the next frame it gets is always current
+    def __init__(self, session_id: int, timeline: "ModulationTimeline", offset: float, tick_hz: float):
+        self.session_id = session_id
+        self.timeline = timeline
+        self.tick_hz = tick_hz
+        self.seq = 0
+        self.frames_dropped = 0
+        self.ended = False
+        self._mailbox: Deque[dict] = deque(maxlen=max(1, settings.playback_send_buffer))
+        self._wakeup = asyncio.Event()
+        self._origin = 0.0
+        self.seek(offset)
+
+    @property
+    def position(self) -> float:
+        return time.monotonic() - self._origin
+
+    def seek(self, offset: float):
+        self.ended = False
+        self._origin = time.monotonic() - max(0.0, min(offset, self.timeline.duration_sec))
+
+    def tick(self):
+        #Called from the wheel, must never block
+        t = self.position
+        if t >= self.timeline.duration_sec:
+            self._push({"type": "ended", "t": self.timeline.duration_sec})
+            self.ended = True
+            return
+        frame = self.timeline.frame_at(t)
+        frame["type"] = "frame"
+        frame["seq"] = self.seq
+        self.seq += 1
+        self._push(frame)
+
+    def _push(self, event: dict):
+        if len(self._mailbox) == self._mailbox.maxlen:
+            self.frames_dropped += 1
+        self._mailbox.append(event)
+        self._wakeup.set()
+
+    async def next_events(self) -> List[dict]:
+        await self._wakeup.wait()
+        self._wakeup.clear()
+        events = list(self._mailbox)
+        self._mailbox.clear()
+        return events
+
+
+class TimerWheel:
+    #Single asyncio task ticking every playback stream in the process
+    #Streams are hashed into slots by due tick, so each tick only touches the streams due on it
+    def __init__(self, resolution_ms: int, slots: int):
+        self.resolution = resolution_ms / 1000
+        self.slots: List[Set[PlaybackStream]] = [set() for _ in range(max(1, slots))]
+        self._due: Dict[PlaybackStream, int] = {}
+        self._intervals: Dict[PlaybackStream, int] = {}
+        self._tick = 0
+        self._task: Optional[asyncio.Task] = None
+        self.late_ticks = 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def add(self, stream: PlaybackStream):
+        self.remove(stream)
+        interval = max(1, round(1 / (stream.tick_hz * self.resolution)))
+        self._intervals[stream] = interval
+        self._schedule(stream, self._tick + 1)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def remove(self, stream: PlaybackStream):
+        due = self._due.pop(stream, None)
+        self._intervals.pop(stream, None)
+        if due is not None:
+            self.slots[due % len(self.slots)].discard(stream)
+
+    def _schedule(self, stream: PlaybackStream, due: int):
+        self._due[stream] = due
+        self.slots[due % len(self.slots)].add(stream)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        while self._due:
+            next_at += self.resolution
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -self.resolution:
+                #Fell behind by more than a tick, resync instead of bursting to catch up
+                self.late_ticks += 1
+                next_at = loop.time()
+            self._tick += 1
+            slot = self.slots[self._tick % len(self.slots)]
+            for stream in [s for s in slot if self._due.get(s) == self._tick]:
+                slot.discard(stream)
+                stream.tick()
+                if stream.ended:
+                    self.remove(stream)
+                else:
+                    self._schedule(stream, self._tick + self._intervals[stream])
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "streams": len(self._due),
+            "resolution_ms": round(self.resolution * 1000),
+            "late_ticks": self.late_ticks,
+        }
+
+    async def stop(self):
+        self._due.clear()
+        self._intervals.clear()
+        for slot in self.slots:
+            slot.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def clamp_tick_hz(tick_hz: Optional[float]) -> float:
+    if not tick_hz or tick_hz <= 0:
+        return settings.playback_tick_hz
+    return min(tick_hz, settings.playback_max_tick_hz)
+
+
+# Singleton
+timer_wheel = TimerWheel(
+    resolution_ms=max(1, round(1000 / settings.playback_max_tick_hz)),
+    slots=256,
+)
@@ -0,0 +1,222 @@
+import io
+import struct
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from backend.config import settings
+from backend.models.schemas import ModulationSchedule
+from backend.audio_processor.modulation import LAYERS, ModulationTimeline
+
+#Binaural beats sit on a low carrier, left at carrier - beat/2 and right at carrier + beat/2
+BINAURAL_CARRIER_HZ = 200.0
+ISOCHRONIC_CARRIER_HZ = 300.0
+#Parameters are evaluated every CONTROL_HOP samples and linearly interpolated in between
+CONTROL_HOP = 256
+#Ambient bed: noise drawn at these decimations of the sample rate and interpolated, i.e. softly lowpassed
+AMBIENT_DECIMATIONS = (8, 64)
+#Noise knots are drawn in chunks seeded by (seed, decimation, chunk), so knot k never depends on what was rendered before it
+NOISE_CHUNK_KNOTS = 4096
+LAYER_LEVELS = {"binaural": 0.25, "isochronic": 0.2, "ambient": 0.15}
+
+TWO_PI = 2 * np.pi
+
+
+class ScheduleRenderer:
+    #Renders a schedule to stereo float32 blocks, every block computed with array ops
+    #Oscillator phases carry across blocks and the noise is a function of the absolute frame, so block
+    #edges are seamless and independently rendered ranges of the same schedule join up
+    def __init__(self, schedule: ModulationSchedule, sample_rate: Optional[int] = None, seed: int = 0):
+        self.timeline = ModulationTimeline(schedule)
+        self.sample_rate = sample_rate or settings.render_sample_rate
+        self.total_frames = int(round(self.timeline.duration_sec * self.sample_rate))
+        #left, right, isochronic carrier, isochronic pulse
+        self._phases = np.zeros(4)
+        self.seed = seed
+        #(decimation index, chunk) -> knots, only the chunks around the current position are kept
+        self._noise_chunks: Dict[Tuple[int, int], np.ndarray] = {}
+        self._next_frame = 0
+
+    def seek(self, start_frame: int):
+        #Sets each oscillator to the phase it would have reached rendering from 0, by integrating the
+        #control-rate frequency curves, so independently rendered ranges join without a click
+        points = np.append(np.arange(0, start_frame, CONTROL_HOP), start_frame).astype(np.float64)
+        params = self.timeline.sample(points / self.sample_rate)
+        widths = np.diff(points)
+
+        def cycles(freq_hz: np.ndarray) -> float:
+            return float(np.sum((freq_hz[1:] + freq_hz[:-1]) / 2 * widths)) / self.sample_rate
+
+        beat_hz, bpm = params[:, 1], params[:, 0]
+        self._phases[:] = [
+            cycles(BINAURAL_CARRIER_HZ - beat_hz / 2),
+            cycles(BINAURAL_CARRIER_HZ + beat_hz / 2),
+            ISOCHRONIC_CARRIER_HZ * start_frame / self.sample_rate,
+            cycles(bpm / 60),
+        ]
+        self._phases = (self._phases % 1.0) * TWO_PI
+        self._next_frame = start_frame
+
+    def blocks(self, start_sec: float = 0.0, block_sec: Optional[float] = None, end_sec: Optional[float] = None) -> Iterator[np.ndarray]:
+        block_frames = int((block_sec or settings.render_block_sec) * self.sample_rate)
+        position = int(start_sec * self.sample_rate)
+        end = self.total_frames if end_sec is None else min(self.total_frames, int(end_sec * self.sample_rate))
+        if position != self._next_frame:
+            self.seek(position)
+        while position < end:
+            n = min(block_frames, end - position)
+            yield self.render(position, n)
+            position += n
+
+    def render(self, start_frame: int, n: int) -> np.ndarray:
+        sr = self.sample_rate
+        #Control-rate parameter curves, upsampled to one value per sample
+        control_frames = np.arange(start_frame, start_frame + n + CONTROL_HOP, CONTROL_HOP)
+        params = self.timeline.sample(control_frames / sr)
+        frames = np.arange(start_frame, start_frame + n)
+
+        def curve(column: int):
+            #Most blocks sit between ramps, where a scalar is enough
+            values = params[:, column]
+            if values.min() == values.max():
+                return float(values[0])
+            return np.interp(frames, control_frames, values)
+
+        out = np.zeros((n, 2), dtype=np.float32)
+        #Layers silent for the whole block are skipped, their phase restarts while inaudible
+        if params[:, 2 + LAYERS.index("binaural")].max() > 0:
+            beat_hz = curve(1)
+            gain = curve(2 + LAYERS.index("binaural")) * LAYER_LEVELS["binaural"]
+            out[:, 0] += self._oscillator(0, n, BINAURAL_CARRIER_HZ - beat_hz / 2) * gain
+            out[:, 1] += self._oscillator(1, n, BINAURAL_CARRIER_HZ + beat_hz / 2) * gain
+
+        if params[:, 2 + LAYERS.index("isochronic")].max() > 0:
+            #One carrier gated by a raised-cosine pulse at target_bpm pulses per minute
+            gain = curve(2 + LAYERS.index("isochronic")) * LAYER_LEVELS["isochronic"]
+            pulse = 0.5 - 0.5 * np.cos(self._phase_ramp(3, n, curve(0) / 60))
+            isochronic = self._oscillator(2, n, ISOCHRONIC_CARRIER_HZ) * pulse * gain
+            out += isochronic[:, None]
+
+        if params[:, 2 + LAYERS.index("ambient")].max() > 0:
+            gain = curve(2 + LAYERS.index("ambient")) * LAYER_LEVELS["ambient"]
+            out += (self._ambient(start_frame, n) * gain)[:, None]
+        self._next_frame = start_frame + n
+        return out
+
+    def _phase_ramp(self, index: int, n: int, freq_hz) -> np.ndarray:
+        #Integrated instantaneous frequency, so frequency changes never click
+        if np.isscalar(freq_hz):
+            phase = self._phases[index] + (TWO_PI * freq_hz / self.sample_rate) * np.arange(1, n + 1)
+        else:
+            phase = self._phases[index] + TWO_PI * np.cumsum(freq_hz) / self.sample_rate
+        self._phases[index] = phase[-1] % TWO_PI
+        return phase
+
+    def _oscillator(self, index: int, n: int, freq_hz) -> np.ndarray:
+        return np.sin(self._phase_ramp(index, n, freq_hz))
+
+    def _knots(self, layer: int, first: int, count: int) -> np.ndarray:
+        first_chunk = first // NOISE_CHUNK_KNOTS
+        last_chunk = (first + count - 1) // NOISE_CHUNK_KNOTS
+        for key in [key for key in self._noise_chunks if key[0] == layer and key[1] < first_chunk]:
+            del self._noise_chunks[key]
+        chunks = []
+        for chunk in range(first_chunk, last_chunk + 1):
+            knots = self._noise_chunks.get((layer, chunk))
+            if knots is None:
+                knots = np.random.default_rng([self.seed, layer, chunk]).standard_normal(NOISE_CHUNK_KNOTS)
+                self._noise_chunks[(layer, chunk)] = knots
+            chunks.append(knots)
+        start = first - first_chunk * NOISE_CHUNK_KNOTS
+        return np.concatenate(chunks)[start:start + count]
+
+    def _ambient(self, start_frame: int, n: int) -> np.ndarray:
+        out = np.zeros(n)
+        for i, decimation in enumerate(AMBIENT_DECIMATIONS):
+            #Knot k sits at frame k * decimation
+            first = start_frame // decimation
+            positions = (start_frame - first * decimation + np.arange(n)) / decimation
+            knots = self._knots(i, first, int(positions[-1]) + 2)
+            out += np.interp(positions, np.arange(len(knots)), knots)
+        return out / len(AMBIENT_DECIMATIONS) / 3
+
+
+def to_pcm16(block: np.ndarray) -> bytes:
+    return (np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def wav_header(total_frames: int, sample_rate: int, channels: int = 2) -> bytes:
+    #Canonical 44-byte PCM16 header — the length is known up front, so the body can stream
+    data_size = total_frames * channels * 2
+    return b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE" + b"fmt " + struct.pack(
+        "<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16
+    ) + b"data" + struct.pack("<I", data_size)
+
+
+def stream_wav(renderer: ScheduleRenderer, start_sec: float = 0.0) -> Iterator[bytes]:
+    start_frame = int(start_sec * renderer.sample_rate)
+    yield wav_header(max(0, renderer.total_frames - start_frame), renderer.sample_rate)
+    for block in renderer.blocks(start_sec):
+        yield to_pcm16(block)
+
+
+class _ChunkSink(io.RawIOBase):
+    #Seekable write target for the FLAC encoder that hands out bytes as soon as they're written
+    #The encoder rewrites STREAMINFO at close; those bytes have already gone out and are dropped,
+    #which leaves a valid stream with unknown total samples
+    def __init__(self):
+        self._buffer = bytearray()
+        self._sent = 0
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        end = self._pos + len(data)
+        if end > self._sent:
+            skip = max(0, self._sent - self._pos)
+            offset = self._pos + skip - self._sent
+            self._buffer[offset:offset + len(data) - skip] = data[skip:]
+        self._pos = end
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._sent + len(self._buffer)
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._sent += len(data)
+        self._buffer.clear()
+        return data
+
+
+def stream_flac(renderer: ScheduleRenderer, start_sec: float = 0.0) -> Iterator[bytes]:
+    import soundfile as sf
+
+    sink = _ChunkSink()
+    with sf.SoundFile(sink, mode="w", samplerate=renderer.sample_rate, channels=2,
+                      format="FLAC", subtype="PCM_16") as out:
+        for block in renderer.blocks(start_sec):
+            out.write(block)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    chunk = sink.take()
+    if chunk:
+        yield chunk
@@ -1,11 +1,18 @@
+import hashlib
 import os
-from typing import List
+from typing import List, Optional
 
 SUPPORTED_FORMATS = {"wav", "flac", "mp3"}
 
+#Partial hash reads this many bytes from the head and tail of each file
+HASH_CHUNK_BYTES = 64 * 1024
+#Full hash reads the file in blocks this size
+FULL_HASH_BLOCK_BYTES = 1024 * 1024
+
 
 def scan_directory(directory_path: str) -> List[dict]:
     #Walk directory tree, collect audio files matching supported formats
+    #Size + mtime come along for free so rescans can skip unchanged files
     if not os.path.isdir(directory_path):
         raise ValueError(f"Directory does not exist: {directory_path}")
 
@@ -17,10 +24,53 @@ def scan_directory(directory_path: str) -> List[dict]:
                 continue
 
             file_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
             tracks.append({
                 "file_path": os.path.abspath(file_path),
                 "filename": filename,
                 "format": ext,
+                "file_size": stat.st_size,
+                "file_mtime": stat.st_mtime,
             })
 
     return tracks
+
+
+def partial_content_hash(file_path: str, file_size: Optional[int] = None) -> Optional[str]:
+    #Fast fingerprint: size + first and last chunk, enough to recognise a moved file
+    try:
+        if file_size is None:
+            file_size = os.path.getsize(file_path)
+        digest = hashlib.blake2b(str(file_size).encode(), digest_size=16)
+        with open(file_path, "rb") as f:
+            digest.update(f.read(HASH_CHUNK_BYTES))
+            if file_size > HASH_CHUNK_BYTES:
+                f.seek(max(HASH_CHUNK_BYTES, file_size - HASH_CHUNK_BYTES))
+                digest.update(f.read(HASH_CHUNK_BYTES))
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def full_content_hash(file_path: str) -> Optional[str]:
+    #Digest of every byte — keys analysis results, where two files sharing size, head and tail
+    #(different encodes of one master) must not share features. hashlib drops the GIL on large
+    #updates, so this runs in parallel on a thread pool
+    try:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            while block := f.read(FULL_HASH_BLOCK_BYTES):
+                digest.update(block)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def hash_entries(entries: List[dict]) -> List[dict]:
+    #Adds content_hash to each entry in place — run in an executor, this is file I/O
+    for entry in entries:
+        entry["content_hash"] = partial_content_hash(entry["file_path"], entry.get("file_size"))
+    return entries
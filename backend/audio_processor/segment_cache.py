@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from backend.config import settings
+from backend.models.schemas import ModulationSchedule
+
+#Bump whenever rendering changes so stale segments are never served
+RENDERER_VERSION = 2
+#Schedules remembered in memory for hash-addressed segment requests, the rest are read back from disk
+MAX_KNOWN_SCHEDULES = 1024
+SCHEDULE_FILE = "schedule.json"
+KEY_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def schedule_hash(schedule: ModulationSchedule, sample_rate: int) -> str:
+    #Same schedule + same render settings = same audio, whichever session asked for it
+    payload = f"{RENDERER_VERSION}:{sample_rate}:{settings.segment_sec}:{schedule.model_dump_json()}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class SegmentCache:
+    #Fixed-length rendered segments on disk, keyed by (schedule hash, segment index)
+    #Hits are plain files, so they can go out with sendfile; LRU eviction by file mtime
+    def __init__(self, directory: str, max_mb: int, segment_sec: float, sample_rate: int):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.segment_sec = segment_sec
+        self.sample_rate = sample_rate
+        self._schedules: "OrderedDict[str, ModulationSchedule]" = OrderedDict()
+        self._rendering: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._sizes: Optional[Dict[str, int]] = None
+        #Renders finish on executor threads, size bookkeeping is shared between them
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, schedule: ModulationSchedule) -> str:
+        #The schedule is written next to its segments, so any worker sharing the directory can
+        #render them, including after a restart
+        key = schedule_hash(schedule, self.sample_rate)
+        if key not in self._schedules:
+            self._write_schedule(key, schedule)
+        self._remember(key, schedule)
+        return key
+
+    def _remember(self, key: str, schedule: ModulationSchedule):
+        self._schedules[key] = schedule
+        self._schedules.move_to_end(key)
+        while len(self._schedules) > MAX_KNOWN_SCHEDULES:
+            self._schedules.popitem(last=False)
+
+    def _write_schedule(self, key: str, schedule: ModulationSchedule):
+        path = os.path.join(self.directory, key[:2], key, SCHEDULE_FILE)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(schedule.model_dump_json())
+        os.replace(tmp_path, path)
+
+    def _load_schedule(self, key: str) -> Optional[ModulationSchedule]:
+        schedule = self._schedules.get(key)
+        if schedule is not None:
+            return schedule
+        try:
+            with open(os.path.join(self.directory, key[:2], key, SCHEDULE_FILE)) as f:
+                schedule = ModulationSchedule.model_validate(json.load(f))
+        except (OSError, ValueError):
+            return None
+        self._remember(key, schedule)
+        return schedule
+
+    def segment_count(self, schedule: ModulationSchedule) -> int:
+        return math.ceil(schedule.total_duration_sec / self.segment_sec)
+
+    def playlist(self, schedule: ModulationSchedule, url_prefix: str) -> str:
+        #HLS-style VOD playlist, segment URLs are content-addressed and immutable
+        key = self.register(schedule)
+        count = self.segment_count(schedule)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{math.ceil(self.segment_sec)}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+        ]
+        for index in range(count):
+            duration = min(self.segment_sec, schedule.total_duration_sec - index * self.segment_sec)
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(f"{url_prefix}/{key}/{index}.wav")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def _path(self, key: str, index: int) -> str:
+        return os.path.join(self.directory, key[:2], key, f"{index:05d}.wav")
+
+    async def get(self, key: str, index: int) -> Optional[str]:
+        #Path to the segment file, rendered on first request; None for unknown schedules or indexes
+        if not KEY_PATTERN.fullmatch(key) or index < 0:
+            return None
+        path = self._path(key, index)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            return path
+        schedule = self._load_schedule(key)
+        if schedule is None or not 0 <= index < self.segment_count(schedule):
+            return None
+
+        self.misses += 1
+        #Concurrent listeners of the same segment share one render
+        future = self._rendering.get((key, index))
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, self._render, schedule, index, path)
+            self._rendering[(key, index)] = future
+            future.add_done_callback(lambda _: self._rendering.pop((key, index), None))
+        await asyncio.shield(future)
+        return path
+
+    def _render(self, schedule: ModulationSchedule, index: int, path: str):
+        #Each segment seeks to its own start; phases and noise depend only on the absolute frame, so the
+        #joined segments are the same audio /audio renders for this schedule
+        from backend.audio_processor.renderer import ScheduleRenderer, to_pcm16, wav_header
+
+        renderer = ScheduleRenderer(schedule, sample_rate=self.sample_rate)
+        start = index * self.segment_sec
+        end = min(start + self.segment_sec, schedule.total_duration_sec)
+        frames = int(end * self.sample_rate) - int(start * self.sample_rate)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(wav_header(frames, self.sample_rate))
+            for block in renderer.blocks(start, end_sec=end):
+                f.write(to_pcm16(block))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._account(path, os.path.getsize(path))
+
+    def _scan(self) -> Dict[str, int]:
+        sizes = {}
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".wav"):
+                    path = os.path.join(root, name)
+                    sizes[path] = os.path.getsize(path)
+        return sizes
+
+    def _account(self, path: str, size: int):
+        if self._sizes is None:
+            self._sizes = self._scan()
+        self._sizes[path] = size
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        #Least recently served first — hits refresh mtime
+        for victim in sorted(self._sizes, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0):
+            if total <= self.max_bytes:
+                break
+            if victim == path:
+                continue
+            try:
+                os.remove(victim)
+            except FileNotFoundError:
+                pass
+            total -= self._sizes.pop(victim)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_mb": round(sum((self._sizes or {}).values()) / 1024 / 1024, 1),
+            "max_mb": self.max_bytes // 1024 // 1024,
+        }
+
+
+# Singleton
+segment_cache = SegmentCache(
+    settings.segment_cache_dir,
+    max_mb=settings.segment_cache_max_mb,
+    segment_sec=settings.segment_sec,
+    sample_rate=settings.render_sample_rate,
+)
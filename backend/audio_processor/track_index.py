@@ -0,0 +1,85 @@
+import os
+import stat as stat_module
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from backend.config import settings
+from backend.db.database import async_session_factory
+from backend.db.queries import LibraryQueries
+
+
+@dataclass
+class TrackLocation:
+    file_path: str
+    filename: str
+    format: Optional[str]
+    content_hash: Optional[str]
+
+
+def strong_etag(location: TrackLocation, stat: os.stat_result) -> str:
+    #Content hash when the scan computed one, size and mtime keep it honest if the file changed since
+    fingerprint = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    if location.content_hash:
+        fingerprint = f"{location.content_hash}-{fingerprint}"
+    return f'"{fingerprint}"'
+
+
+class TrackIndex:
+    #track id -> on-disk location, so seeking players never touch the DB
+    #Entries are checked against a stat on every hit; a file that moved or vanished falls back to the DB
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, TrackLocation]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, track_id: int) -> Optional[tuple]:
+        #(location, stat) for a servable track, None when it's unknown, tombstoned or gone from disk
+        location = self._entries.get(track_id)
+        if location is not None:
+            stat = _stat_file(location.file_path)
+            if stat is not None:
+                self.hits += 1
+                self._entries.move_to_end(track_id)
+                return location, stat
+            self._entries.pop(track_id, None)
+
+        self.misses += 1
+        async with async_session_factory() as db:
+            track = await LibraryQueries.get_by_id(db, track_id)
+        if track is None or track.missing_at is not None:
+            return None
+        stat = _stat_file(track.file_path)
+        if stat is None:
+            return None
+        location = TrackLocation(track.file_path, track.filename, track.format, track.content_hash)
+        self._entries[track_id] = location
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return location, stat
+
+    def invalidate(self, track_ids: Iterable[int]):
+        for track_id in track_ids:
+            self._entries.pop(track_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def _stat_file(path: str) -> Optional[os.stat_result]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat if stat_module.S_ISREG(stat.st_mode) else None
+
+
+# Singleton
+track_index = TrackIndex(max_entries=settings.track_index_max_entries)
@@ -0,0 +1,81 @@
+#Compare single-decode analyze_track against the original full-decode path
+#Usage: python -m backend.benchmarks.bench_analyzer <music_dir> [--limit N] [--excerpt SEC] [--sr HZ]
+import argparse
+import time
+
+import numpy as np
+
+from backend.audio_processor.analyzer import PITCH_CLASSES, analyze_track
+from backend.audio_processor.scanner import scan_directory
+
+
+def analyze_track_full_decode(file_path: str) -> dict:
+    #The pre-refactor analyzer: full decode, beat_track and chroma_cqt each build their own front end
+    import librosa
+
+    try:
+        y, sr = librosa.load(file_path, sr=22050)
+    except Exception:
+        return {"duration_sec": None, "bpm": None, "key_signature": None}
+
+    duration_sec = float(librosa.get_duration(y=y, sr=sr))
+    try:
+        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        bpm = float(tempo[0]) if hasattr(tempo, "__len__") else float(tempo)
+    except Exception:
+        bpm = None
+    try:
+        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+        key_signature = PITCH_CLASSES[int(np.argmax(np.mean(chroma, axis=1)))]
+    except Exception:
+        key_signature = None
+    return {"duration_sec": duration_sec, "bpm": bpm, "key_signature": key_signature}
+
+
+def bpm_agrees(a, b, tolerance=0.04) -> bool:
+    #Count half/double-tempo picks as agreement, beat trackers routinely disagree on octave
+    if a is None or b is None:
+        return a is b
+    return any(abs(a * factor - b) <= tolerance * b for factor in (0.5, 1.0, 2.0))
+
+
+def timed(fn, *args, **kwargs):
+    start = time.process_time()
+    result = fn(*args, **kwargs)
+    return result, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--excerpt", type=float, default=0)
+    parser.add_argument("--sr", type=int, default=22050)
+    args = parser.parse_args()
+
+    files = [e["file_path"] for e in scan_directory(args.directory)][:args.limit]
+    if not files:
+        print("No audio files found")
+        return
+
+    ref_cpu = new_cpu = 0.0
+    bpm_matches = key_matches = 0
+    for path in files:
+        ref, ref_t = timed(analyze_track_full_decode, path)
+        new, new_t = timed(analyze_track, path, excerpt_sec=args.excerpt, sample_rate=args.sr)
+        ref_cpu += ref_t
+        new_cpu += new_t
+        bpm_matches += bpm_agrees(new["bpm"], ref["bpm"])
+        key_matches += new["key_signature"] == ref["key_signature"]
+        print(f"{ref_t:6.2f}s -> {new_t:6.2f}s  bpm {ref['bpm']} -> {new['bpm']}  "
+              f"key {ref['key_signature']} -> {new['key_signature']}  {path}")
+
+    n = len(files)
+    print(f"\n{n} tracks, excerpt={args.excerpt or 'full'}, sr={args.sr}")
+    print(f"CPU per track: full-decode {ref_cpu / n:.2f}s, single-decode {new_cpu / n:.2f}s "
+          f"({ref_cpu / max(new_cpu, 1e-9):.1f}x)")
+    print(f"BPM agreement: {bpm_matches}/{n}  key agreement: {key_matches}/{n}")
+
+
+if __name__ == "__main__":
+    main()
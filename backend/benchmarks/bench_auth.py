@@ -0,0 +1,114 @@
+#Authenticated request throughput against /auth/me, with the principal cache on and off
+#Runs the auth router in-process over httpx's ASGI transport against a seeded SQLite file, so the
+#numbers are app + DB cost without a network; every --login-every requests a client logs in again,
+#which updates last_active and evicts its principal
+#Usage: python -m backend.benchmarks.bench_auth --users 1000 --clients 1 16 64 --requests 200
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.db.database import build_engine, get_db
+from backend.db.principal_cache import principal_cache
+from backend.models.orm import Base, User
+from backend.routers.auth import create_access_token, hash_password, router as auth_router
+
+PASSWORD = "benchmark-password"
+
+
+async def seed(factory: async_sessionmaker, users: int):
+    now = datetime.now(timezone.utc)
+    hashed = hash_password(PASSWORD)
+    async with factory() as db:
+        await db.execute(insert(User), [
+            {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": hashed,
+             "created_at": now, "last_active": now, "activity": True}
+            for i in range(1, users + 1)
+        ])
+        await db.commit()
+
+
+async def client(http: httpx.AsyncClient, users: int, requests: int, login_every: int, latencies: list, counts: dict):
+    user_id = random.randint(1, users)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+    for i in range(requests):
+        if login_every and i % login_every == login_every - 1:
+            await http.post("/auth/login", json={"email": f"user{user_id}@example.com", "password": PASSWORD})
+        start = time.perf_counter()
+        response = await http.get("/auth/me", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="per client")
+    parser.add_argument("--login-every", type=int, default=0, help="0 = never")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'auth.db')}")
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(factory, args.users)
+
+        user_selects = 0
+
+        def count_user_selects(_conn, _cursor, statement, *_args):
+            nonlocal user_selects
+            if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+                user_selects += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count_user_selects)
+
+        async def bench_db():
+            async with factory() as session:
+                try:
+                    yield session
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+
+        app = FastAPI()
+        app.include_router(auth_router)
+        app.dependency_overrides[get_db] = bench_db
+
+        print(f"{'cache':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'user SELECTs':>13} {'hit rate':>9}  status")
+        for enabled in (False, True):
+            for n in args.clients:
+                principal_cache.enabled = enabled
+                principal_cache.hits = principal_cache.misses = 0
+                await principal_cache.backend.delete(range(1, args.users + 1))
+                user_selects = 0
+                latencies, counts = [], {}
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                    start = time.perf_counter()
+                    await asyncio.gather(*[
+                        client(http, args.users, args.requests, args.login_every, latencies, counts) for _ in range(n)
+                    ])
+                    elapsed = time.perf_counter() - start
+                latencies.sort()
+                hit_rate = principal_cache.stats()["hit_rate"]
+                print(
+                    f"{'on' if enabled else 'off':>6} {n:>8} {len(latencies) / elapsed:>8.0f} "
+                    f"{latencies[len(latencies) // 2] * 1000:>8.2f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.2f} "
+                    f"{user_selects:>13} {hit_rate if hit_rate is not None else '-':>9}  {counts}"
+                )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+#Queries per second for the LibraryQueries and UserQueries hot paths under each engine profile
+#  echo     — the old default: SQL logged on every statement (output discarded), stock pool, no pragmas
+#  stock    — SQLAlchemy defaults, no pragmas
+#  tuned    — the Settings profile: pool sizing, statement caches, WAL/synchronous/mmap pragmas
+#Each profile gets a freshly seeded database, since journal mode sticks to a SQLite file
+#Usage: python -m backend.benchmarks.bench_db --tracks 20000 --users 2000 --concurrency 1 8 32
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.db.database import build_engine, engine_options
+from backend.db.queries import LibraryQueries, UserQueries
+from backend.models.orm import Base, Library, User
+
+PROFILES = ("echo", "stock", "tuned")
+FORMATS = ["mp3", "flac", "wav", "ogg"]
+KEYS = ["C", "G", "D", "A", "E", "B", "F#", "C#", "F", "A#", "D#", "G#"]
+#Tracks are spread over this many directories, get_fingerprints reads one of them
+DIRECTORIES = 100
+
+
+def profile_engine(profile: str, database_url: str):
+    if profile == "tuned":
+        return build_engine(database_url)
+    return build_engine(database_url, options={"echo": profile == "echo"}, pragmas=[])
+
+
+async def seed(factory: async_sessionmaker, tracks: int, users: int):
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "file_path": f"/music/d{i % DIRECTORIES:03d}/track_{i:07d}.flac",
+            "filename": f"track_{i:07d}.flac",
+            "format": FORMATS[i % len(FORMATS)],
+            "duration_sec": 120 + i % 300,
+            "bpm": 60 + i % 120,
+            "key_signature": KEYS[i % len(KEYS)],
+            "file_size": 5_000_000 + i,
+            "file_mtime": 1.7e9 + i,
+            "content_hash": f"{i:032x}",
+            "analyzed_at": now,
+        }
+        for i in range(tracks)
+    ]
+    people = [
+        {
+            "email": f"user{i}@example.com",
+            "username": f"user{i}",
+            "hashed_password": "x" * 60,
+            "created_at": now,
+            "last_active": now,
+            "activity": True,
+        }
+        for i in range(users)
+    ]
+    async with factory() as db:
+        for i in range(0, len(rows), 5000):
+            await db.execute(insert(Library), rows[i:i + 5000])
+        await db.execute(insert(User), people)
+        await db.commit()
+
+
+def hot_paths(tracks: int, users: int) -> dict:
+    return {
+        "library.get_by_id": lambda db: LibraryQueries.get_by_id(db, random.randint(1, tracks)),
+        "library.list_tracks": lambda db: _list_tracks(db),
+        "library.get_fingerprints": lambda db: LibraryQueries.get_fingerprints(db, f"/music/d{random.randrange(DIRECTORIES):03d}/"),
+        "user.get_by_email": lambda db: UserQueries.get_by_email(db, f"user{random.randrange(users)}@example.com"),
+        "user.get_by_id": lambda db: UserQueries.get_by_id(db, random.randint(1, users)),
+        "user.update_last_active": lambda db: UserQueries.update_last_active(db, random.randint(1, users)),
+    }
+
+
+def _list_tracks(db: AsyncSession):
+    bpm = random.randint(60, 170)
+    return LibraryQueries.list_tracks(db, bpm_min=bpm, bpm_max=bpm + 10, format=random.choice(FORMATS))
+
+
+async def measure(factory: async_sessionmaker, query, concurrency: int, seconds: float) -> float:
+    #Each worker opens a session per query, like a request does through get_db
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            async with factory() as db:
+                await query(db)
+            done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return done / (time.perf_counter() - start)
+
+
+async def run_profile(profile: str, database_url: str, args) -> dict:
+    engine = profile_engine(profile, database_url)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await seed(factory, args.tracks, args.users)
+
+    results = {}
+    for name, query in hot_paths(args.tracks, args.users).items():
+        for concurrency in args.concurrency:
+            results[name, concurrency] = await measure(factory, query, concurrency, args.seconds)
+    await engine.dispose()
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file per profile")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, profile + '.db')}"
+            print(f"{profile}: {engine_options(database_url) if profile == 'tuned' else 'stock engine'}")
+            #echo's StreamHandler binds stdout when the engine is built, so both happen under the redirect
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull) if profile == "echo" else contextlib.nullcontext():
+                    results[profile] = await run_profile(profile, database_url, args)
+
+    print(f"\n{'query':<26} {'conc':>5} " + " ".join(f"{p + ' qps':>11}" for p in args.profiles))
+    for name, concurrency in results[args.profiles[0]]:
+        row = " ".join(f"{results[p][name, concurrency]:>11.0f}" for p in args.profiles)
+        print(f"{name:<26} {concurrency:>5} {row}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+#Database round trips per request flow — statements sent and commits, counted with engine events
+#Each flow runs like an endpoint does: its own session, committed once on the way out like get_db
+#Usage: python -m backend.benchmarks.bench_db_roundtrips [--database-url ...] [--rows 500]
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.db.database import build_engine
+from backend.db.queries import AudioTrackQueries, LibraryQueries, SessionQueries, UserQueries
+from backend.models.orm import Base
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_statement)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_statement(self, *_args):
+        self.statements += 1
+
+    def _on_commit(self, *_args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+async def register(db: AsyncSession, i: int, _rows: int):
+    await UserQueries.get_by_email(db, f"user{i}@example.com")
+    await UserQueries.get_by_username(db, f"user{i}")
+    user = await UserQueries.create_user(db, f"user{i}@example.com", f"user{i}", "x" * 60)
+    return user.id
+
+
+async def login(db: AsyncSession, i: int, _rows: int):
+    user = await UserQueries.get_by_email(db, f"user{i}@example.com")
+    await UserQueries.update_last_active(db, user.id)
+
+
+async def start_session(db: AsyncSession, i: int, _rows: int):
+    session = await SessionQueries.create_session(db, user_id=i, intent="focus", schedule={}, duration_sec=1800)
+    return session.id
+
+
+async def end_session(db: AsyncSession, i: int, _rows: int):
+    await SessionQueries.end_session(db, i, rating=5, feedback_note="good")
+
+
+async def create_audio_track(db: AsyncSession, i: int, _rows: int):
+    track = await AudioTrackQueries.create_track(db, f"tone{i}", f"/tones/{i}.wav", "binaural", 60.0, 10.0)
+    return track.id
+
+
+async def library_rows(db: AsyncSession, i: int, rows: int):
+    #Per-row create_track, the way rows were added before the bulk helpers
+    for n in range(rows):
+        await LibraryQueries.create_track(db, f"/music/{i}/{n}.flac", f"{n}.flac", format="flac", bpm=120.0)
+
+
+async def library_insert_many(db: AsyncSession, i: int, rows: int):
+    await LibraryQueries.insert_many(db, [
+        {"file_path": f"/bulk/{i}/{n}.flac", "filename": f"{n}.flac", "format": "flac", "bpm": 120.0}
+        for n in range(rows)
+    ])
+
+
+async def library_upsert_many(db: AsyncSession, i: int, rows: int):
+    #Same paths as insert_many, so every row takes the update branch
+    await LibraryQueries.upsert_many(db, [
+        {"file_path": f"/bulk/{i}/{n}.flac", "filename": f"{n}.flac", "format": "flac", "bpm": 124.0}
+        for n in range(rows)
+    ])
+
+
+async def session_insert_many(db: AsyncSession, i: int, rows: int):
+    await SessionQueries.insert_many(db, [
+        {"user_id": i, "intent": "focus", "schedule": {}, "duration_sec": 1800} for _ in range(rows)
+    ])
+
+
+FLOWS = [
+    ("register", register),
+    ("login", login),
+    ("start_session", start_session),
+    ("end_session", end_session),
+    ("audio_track.create", create_audio_track),
+    ("library.create_track x rows", library_rows),
+    ("library.insert_many", library_insert_many),
+    ("library.upsert_many", library_upsert_many),
+    ("session.insert_many", session_insert_many),
+]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--requests", type=int, default=50, help="times each flow runs")
+    parser.add_argument("--rows", type=int, default=500, help="rows per bulk flow")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'roundtrips.db')}"
+        engine = build_engine(database_url)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        counter = RoundTripCounter(engine)
+
+        print(f"dialect {engine.dialect.name}, {args.requests} requests per flow, {args.rows} rows per bulk flow")
+        print(f"{'flow':<28} {'stmts/req':>10} {'commits/req':>12} {'ms/req':>8}")
+        for name, flow in FLOWS:
+            counter.reset()
+            start = time.perf_counter()
+            for i in range(1, args.requests + 1):
+                async with factory() as db:
+                    await flow(db, i, args.rows)
+                    await db.commit()
+            elapsed = (time.perf_counter() - start) / args.requests
+            print(
+                f"{name:<28} {counter.statements / args.requests:>10.1f} "
+                f"{counter.commits / args.requests:>12.1f} {elapsed * 1000:>8.2f}"
+            )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
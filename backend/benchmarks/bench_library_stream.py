@@ -0,0 +1,57 @@
+#Concurrent seeking clients against /library/{id}/stream on a running API
+#Each client opens the track, then issues random byte-range reads like a player scrubbing through it,
+#revalidating with If-None-Match between bursts
+#Usage: python -m backend.benchmarks.bench_library_stream --track-id 1 --clients 50 --seeks 40
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+
+async def client(http: httpx.AsyncClient, path: str, seeks: int, range_bytes: int, latencies: list, counts: dict):
+    head = await http.get(path, headers={"Range": "bytes=0-0"})
+    size = int(head.headers["content-range"].rsplit("/", 1)[1])
+    etag = head.headers.get("etag")
+    for i in range(seeks):
+        start = random.randrange(0, max(1, size - range_bytes))
+        t = time.perf_counter()
+        response = await http.get(path, headers={"Range": f"bytes={start}-{start + range_bytes - 1}", "If-Range": etag})
+        latencies.append(time.perf_counter() - t)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        counts["bytes"] = counts.get("bytes", 0) + len(response.content)
+        if i % 10 == 9:
+            revalidate = await http.get(path, headers={"If-None-Match": etag})
+            counts[revalidate.status_code] = counts.get(revalidate.status_code, 0) + 1
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--track-id", type=int, required=True)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--seeks", type=int, default=40)
+    parser.add_argument("--range-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    path = f"/library/{args.track_id}/stream"
+    print(f"{'clients':>8} {'seeks/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'MB/s':>8}  status counts")
+    for n in args.clients:
+        latencies, counts = [], {}
+        limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as http:
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                client(http, path, args.seeks, args.range_kb * 1024, latencies, counts) for _ in range(n)
+            ])
+            elapsed = time.perf_counter() - start
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        mb = counts.pop("bytes", 0) / 1e6
+        print(f"{n:>8} {len(latencies) / elapsed:>9.0f} {p50:>8.1f} {p99:>8.1f} {mb / elapsed:>8.1f}  {counts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
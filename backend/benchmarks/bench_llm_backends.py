@@ -0,0 +1,65 @@
+#Latency, peak RSS and schedule validity rate for each LLM inference backend
+#Every backend loads in its own process so RSS numbers don't bleed into each other
+#Usage: python -m backend.benchmarks.bench_llm_backends --backends bf16 int8 --model Qwen/Qwen2.5-0.5B-Instruct
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import statistics
+import time
+
+INTENTS = [
+    "deep focus for coding",
+    "wind down before sleep",
+    "calm meditation after work",
+    "energized study session",
+    "light relaxation while reading",
+]
+
+
+def run_backend(backend: str, model_id: str, runs: int, results):
+    from backend.config import settings
+    from backend.llm_engine.client import llm_engine
+    from backend.llm_engine.fallbacks import is_fallback_schedule
+
+    settings.llm_backend = backend
+    settings.llm_schedule_model_id = model_id
+    start = time.perf_counter()
+    asyncio.run(llm_engine.load())
+    load_sec = time.perf_counter() - start
+
+    latencies, valid = [], 0
+    for i in range(runs):
+        start = time.perf_counter()
+        schedule = llm_engine.generate_schedule(INTENTS[i % len(INTENTS)], 25)
+        latencies.append(time.perf_counter() - start)
+        valid += not is_fallback_schedule(schedule)
+
+    #ru_maxrss is KiB on Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((backend, load_sec, statistics.median(latencies), max(latencies), rss_mb, valid / runs))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["bf16", "int8", "fp32"])
+    parser.add_argument("--model", default=None, help="defaults to HF_MODEL_ID")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    print(f"{'backend':>8} {'load s':>8} {'p50 s':>8} {'max s':>8} {'peak RSS MB':>12} {'valid':>6}")
+    for backend in args.backends:
+        proc = ctx.Process(target=run_backend, args=(backend, args.model, args.runs, results))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            print(f"{backend:>8} failed (exit {proc.exitcode})")
+            continue
+        name, load_sec, p50, worst, rss_mb, validity = results.get()
+        print(f"{name:>8} {load_sec:>8.1f} {p50:>8.2f} {worst:>8.2f} {rss_mb:>12.0f} {validity:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
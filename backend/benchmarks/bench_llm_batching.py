@@ -0,0 +1,70 @@
+#Schedules/sec at N concurrent users: one generate per request vs the batching scheduler
+#Usage: python -m backend.benchmarks.bench_llm_batching --model Qwen/Qwen2.5-0.5B-Instruct --max-new-tokens 256
+import argparse
+import asyncio
+import time
+
+from backend.config import settings
+from backend.llm_engine.client import llm_engine
+from backend.llm_engine.scheduler import GenerationScheduler
+
+INTENTS = [
+    "deep focus for coding",
+    "help me sleep",
+    "relax after work",
+    "study for an exam",
+    "meditation",
+    "calm my anxiety",
+    "focus on writing",
+    "wind down before bed",
+]
+
+
+def make_requests(n: int):
+    #Distinct intents per user so coalescing doesn't flatter the batched numbers
+    return [(f"{INTENTS[i % len(INTENTS)]} #{i}", 25) for i in range(n)]
+
+
+async def run_unbatched(requests) -> float:
+    #Today's path: every request calls generate_schedule on the default thread pool
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        loop.run_in_executor(None, llm_engine.generate_schedule, intent, duration)
+        for intent, duration in requests
+    ])
+    return time.perf_counter() - start
+
+
+async def run_batched(requests, batch_size: int, wait_ms: int) -> float:
+    scheduler = GenerationScheduler(llm_engine, max_batch_size=batch_size, max_wait_ms=wait_ms)
+    start = time.perf_counter()
+    await asyncio.gather(*[scheduler.submit(intent, duration) for intent, duration in requests])
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=int, default=25)
+    args = parser.parse_args()
+
+    settings.hf_model_id = args.model
+    settings.llm_max_new_tokens = args.max_new_tokens
+    await llm_engine.load()
+
+    print(f"{'users':>6} {'unbatched/s':>12} {'batched/s':>10} {'speedup':>8}")
+    for n in args.concurrency:
+        requests = make_requests(n)
+        unbatched = await run_unbatched(requests)
+        batched = await run_batched(requests, args.batch_size, args.wait_ms)
+        print(f"{n:>6} {n / unbatched:>12.2f} {n / batched:>10.2f} {unbatched / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+#Time-to-first-token with and without the cached prompt-prefix KV
+#Usage: python -m backend.benchmarks.bench_llm_prefix_cache --model Qwen/Qwen2.5-0.5B-Instruct
+import argparse
+import asyncio
+import statistics
+import time
+
+import torch
+
+from backend.config import settings
+from backend.llm_engine.client import llm_engine
+
+
+def time_to_first_token(intents, batch_size: int) -> float:
+    #One new token means the measurement is almost entirely prefill
+    texts = [llm_engine._build_input(intent, 25) for intent in intents[:batch_size]]
+    start = time.perf_counter()
+    inputs, past_key_values = llm_engine._encode_batch(texts)
+    with torch.no_grad():
+        llm_engine.model.generate(
+            **inputs,
+            max_new_tokens=1,
+            do_sample=False,
+            pad_token_id=llm_engine.tokenizer.pad_token_id,
+            past_key_values=past_key_values,
+        )
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    settings.hf_model_id = args.model
+    settings.llm_constrained_decoding = False
+    await llm_engine.load()
+    intents = [f"deep focus for coding #{i}" for i in range(max(args.batch_sizes))]
+    prefix_ids = llm_engine.prefix_ids
+
+    print(f"prefix tokens: {len(prefix_ids) if prefix_ids else 0}")
+    print(f"{'batch':>6} {'no cache ms':>12} {'cached ms':>10}")
+    for batch_size in args.batch_sizes:
+        llm_engine.prefix_ids = None
+        cold = [time_to_first_token(intents, batch_size) for _ in range(args.runs)]
+        llm_engine.prefix_ids = prefix_ids
+        warm = [time_to_first_token(intents, batch_size) for _ in range(args.runs)]
+        print(f"{batch_size:>6} {statistics.median(cold) * 1000:>12.1f} {statistics.median(warm) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
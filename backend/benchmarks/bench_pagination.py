@@ -0,0 +1,145 @@
+#Page latency at increasing depth, OFFSET paging vs keyset cursors, on a synthetic table
+#  library  — list_tracks filtered by format, ordered by (bpm, id)
+#  sessions — one heavy user's history, list_by_user newest first
+#The keyset cursor for a depth is found untimed, then the page behind it is timed
+#Usage: python -m backend.benchmarks.bench_pagination --rows 1000000 [--database-url ...]
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.db.database import build_engine
+from backend.db.queries import LibraryQueries, SessionQueries
+from backend.models.orm import Base, Library, Session
+
+FORMATS = ["mp3", "flac", "wav", "ogg"]
+PAGE = 50
+#Sessions of the user whose history is paged; the rest are spread over other users
+HEAVY_USER = 1
+
+
+async def seed(factory: async_sessionmaker, rows: int):
+    rng = random.Random(0)
+    epoch = datetime(2024, 1, 1)
+    chunk = 20000
+    async with factory() as db:
+        for start in range(0, rows, chunk):
+            n = min(chunk, rows - start)
+            await LibraryQueries.insert_many(db, [
+                {
+                    "file_path": f"/music/{i:08d}.{FORMATS[i % 4]}",
+                    "filename": f"{i:08d}.{FORMATS[i % 4]}",
+                    "format": FORMATS[i % 4],
+                    "bpm": round(rng.uniform(60, 180), 1),
+                    "duration_sec": 180.0,
+                }
+                for i in range(start, start + n)
+            ])
+            await SessionQueries.insert_many(db, [
+                {
+                    "user_id": HEAVY_USER if i % 4 == 0 else 2 + i % 5000,
+                    "intent": "focus",
+                    "schedule": {},
+                    "duration_sec": 1800,
+                    "started_at": epoch + timedelta(seconds=i * 60),
+                }
+                for i in range(start, start + n)
+            ])
+            await db.commit()
+
+
+async def timed(factory: async_sessionmaker, fetch_page, repeat: int) -> float:
+    #Best of repeat, in ms — each run gets a fresh session so nothing comes from the identity map
+    best = float("inf")
+    for _ in range(repeat):
+        async with factory() as db:
+            start = time.perf_counter()
+            rows = await fetch_page(db)
+            best = min(best, time.perf_counter() - start)
+        assert len(rows) == PAGE
+    return best * 1000
+
+
+def offset_page(query):
+    async def fetch(db: AsyncSession):
+        return (await db.execute(query)).scalars().all()
+    return fetch
+
+
+def library_offset(depth: int):
+    return (
+        select(Library)
+        .where(Library.missing_at.is_(None), Library.format == "flac")
+        .order_by(Library.bpm, Library.id)
+        .offset(depth).limit(PAGE)
+    )
+
+
+def session_offset(depth: int):
+    return (
+        select(Session)
+        .where(Session.user_id == HEAVY_USER)
+        .order_by(Session.started_at.desc(), Session.id.desc())
+        .offset(depth).limit(PAGE)
+    )
+
+
+async def library_cursor(factory: async_sessionmaker, depth: int):
+    if depth == 0:
+        return None
+    async with factory() as db:
+        last = (await db.execute(library_offset(depth - 1).limit(1))).scalar_one()
+    return last.bpm, last.id
+
+
+async def session_cursor(factory: async_sessionmaker, depth: int):
+    if depth == 0:
+        return None
+    async with factory() as db:
+        last = (await db.execute(session_offset(depth - 1).limit(1))).scalar_one()
+    return last.started_at, last.id
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=None, help="defaults to a SQLite file in a temp directory")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'pagination.db')}"
+        engine = build_engine(database_url)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        start = time.perf_counter()
+        await seed(factory, args.rows)
+        print(f"seeded {args.rows} library and session rows in {time.perf_counter() - start:.0f}s")
+
+        #A quarter of the rows match each listing
+        depths = [d for d in (0, 1_000, 10_000, 50_000, 100_000, 200_000) if d < args.rows // 4 - PAGE]
+        print(f"{'listing':<9} {'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+        for name, offset_query, find_cursor, keyset in (
+            ("library", library_offset, library_cursor,
+             lambda after: lambda db: LibraryQueries.list_tracks(db, format="flac", limit=PAGE, after=after)),
+            ("sessions", session_offset, session_cursor,
+             lambda before: lambda db: SessionQueries.list_by_user(db, HEAVY_USER, limit=PAGE, before=before)),
+        ):
+            for depth in depths:
+                cursor = await find_cursor(factory, depth)
+                offset_ms = await timed(factory, offset_page(offset_query(depth)), args.repeat)
+                keyset_ms = await timed(factory, keyset(cursor), args.repeat)
+                print(f"{name:<9} {depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+#Sockets per core for server-driven playback frames
+#Opens N websockets against a running API, counts frames and inter-frame jitter, and reads the
+#server's CPU time from /proc to work out how many sockets one fully used core would carry
+#Usage: python -m backend.benchmarks.bench_playback_sockets --session-id 1 --server-pid <uvicorn pid> --connections 2000
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import websockets
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    #utime and stime are fields 14 and 15 of the full line, in clock ticks
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def listen(url: str, duration: float, gaps: list, counts: list):
+    async with websockets.connect(url, max_queue=None) as ws:
+        frames = 0
+        last = None
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            try:
+                message = await asyncio.wait_for(ws.recv(), end - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            event = json.loads(message)
+            if event.get("type") != "frame":
+                continue
+            now = time.monotonic()
+            if last is not None:
+                gaps.append(now - last)
+            last = now
+            frames += 1
+        counts.append(frames)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--session-id", type=int, required=True)
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--tick-hz", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--server-pid", type=int, default=None)
+    args = parser.parse_args()
+
+    url = f"{args.url}/sessions/ws/{args.session_id}?tick_hz={args.tick_hz}"
+    print(f"{'sockets':>8} {'frames/s':>10} {'expected':>9} {'gap p50 ms':>11} {'gap p99 ms':>11} {'server cpu':>11} {'sockets/core':>13}")
+    for n in args.connections:
+        gaps, counts = [], []
+        cpu_start = cpu_seconds(args.server_pid) if args.server_pid else None
+        start = time.monotonic()
+        await asyncio.gather(*[listen(url, args.duration, gaps, counts) for _ in range(n)], return_exceptions=True)
+        wall = time.monotonic() - start
+        rate = sum(counts) / wall
+        gaps.sort()
+        p50 = gaps[len(gaps) // 2] * 1000 if gaps else float("nan")
+        p99 = gaps[int(len(gaps) * 0.99)] * 1000 if gaps else float("nan")
+        if cpu_start is not None:
+            utilisation = (cpu_seconds(args.server_pid) - cpu_start) / wall
+            per_core = f"{len(counts) / utilisation:>13.0f}" if utilisation else f"{'-':>13}"
+            cpu = f"{utilisation:>10.0%} "
+        else:
+            cpu, per_core = f"{'-':>11}", f"{'-':>13}"
+        print(f"{n:>8} {rate:>10.0f} {n * args.tick_hz:>9.0f} {p50:>11.1f} {p99:>11.1f} {cpu}{per_core}")
+        if counts:
+            print(f"{'':>8} median frames per socket {statistics.median(counts):.0f}, {n - len(counts)} connections failed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+#Render speed of the NumPy schedule renderer against real time
+#Usage: python -m backend.benchmarks.bench_renderer --intent focus --format wav
+import argparse
+import time
+
+from backend.llm_engine.fallbacks import FALLBACK_SCHEDULES
+from backend.audio_processor.renderer import ScheduleRenderer, stream_flac, stream_wav
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--intent", default="focus", choices=sorted(FALLBACK_SCHEDULES))
+    parser.add_argument("--format", default="wav", choices=["raw", "wav", "flac"])
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--all-layers", action="store_true", help="cycle binaural/isochronic/ambient across steps")
+    args = parser.parse_args()
+
+    schedule = FALLBACK_SCHEDULES[args.intent].model_copy(deep=True)
+    if args.all_layers:
+        layers = ["binaural", "isochronic", "ambient"]
+        for i, step in enumerate(schedule.steps):
+            step.layer = layers[i % len(layers)]
+    renderer = ScheduleRenderer(schedule, sample_rate=args.sample_rate)
+
+    start = time.perf_counter()
+    first_chunk = None
+    total_bytes = 0
+    if args.format == "raw":
+        chunks = (block.tobytes() for block in renderer.blocks())
+    else:
+        chunks = (stream_wav if args.format == "wav" else stream_flac)(renderer)
+    for chunk in chunks:
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    duration = schedule.total_duration_sec
+    print(f"schedule {args.intent}: {duration / 60:.0f} min at {args.sample_rate} Hz, format {args.format}")
+    print(f"rendered in {elapsed:.2f}s ({duration / elapsed:.0f}x real time), {total_bytes / 1e6:.1f} MB")
+    print(f"time to first chunk {first_chunk * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
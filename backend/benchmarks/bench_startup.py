@@ -0,0 +1,99 @@
+#Cold start of an API process: import backend.main plus the lifespan up to serving, in fresh interpreters
+#Runs with LLM_MODE=remote against a throwaway SQLite database so no model or worker is needed
+#Fails when the median start exceeds --target-ms or a module that should load on first use is already imported
+#Usage: python -m backend.benchmarks.bench_startup [--runs 5] [--target-ms 1000] [--top 15]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+#Only needed once audio is analyzed, rendered or mixed, never to serve the first request
+DEFERRED_MODULES = [
+    "numpy",
+    "librosa",
+    "soundfile",
+    "torch",
+    "transformers",
+    "httpx",
+    "backend.audio_processor.analyzer",
+    "backend.audio_processor.feature_cache",
+    "backend.audio_processor.renderer",
+    "backend.audio_processor.mixer",
+    "backend.audio_processor.modulation",
+]
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import backend.main
+imported = time.perf_counter()
+
+async def serve():
+    async with backend.main.app.router.lifespan_context(backend.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(serve())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "ready_ms": (ready - start) * 1000,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def run_child(env: dict, importtime: bool = False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD % DEFERRED_MODULES]
+    return subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+
+
+def top_imports(stderr: str, limit: int):
+    #-X importtime lines: "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=1000.0)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list, 0 to skip")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            LLM_MODE="remote",
+            DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'startup.db')}",
+        )
+        #First run creates the schema and writes bytecode, it is not timed
+        run_child(env)
+        results = [json.loads(run_child(env).stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+        profile = run_child(env, importtime=True) if args.top else None
+
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    ready_ms = statistics.median(r["ready_ms"] for r in results)
+    loaded = results[-1]["loaded"]
+    print(f"import backend.main  median {import_ms:7.1f} ms  best {min(r['import_ms'] for r in results):7.1f} ms")
+    print(f"lifespan ready       median {ready_ms:7.1f} ms  best {min(r['ready_ms'] for r in results):7.1f} ms")
+    print(f"deferred modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    if profile is not None:
+        print("\nslowest imports (cumulative):")
+        for cumulative, name in top_imports(profile.stderr, args.top):
+            print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    ok = ready_ms <= args.target_ms and not loaded
+    print(f"\nStartup target {args.target_ms:.0f} ms: {'ok' if ok else 'FAILED'}")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
+from typing import Optional
 
 class Settings(BaseSettings):
     #App settings and configs
@@ -19,15 +20,112 @@ class Settings(BaseSettings):
     secret_key: str = "temp_secret_key"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    #Signed-in user lookups — slim principals cached by user id, evicted when the user row changes
+    principal_cache_enabled: bool = True
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_entries: int = 10000
+    #"local" keeps entries in this process, "redis" shares them between workers
+    principal_cache_backend: str = "local"
+    principal_cache_redis_url: str = "redis://localhost:6379/0"
 
     #Database config — SQLite default for local dev, override via .env for MySQL
     database_url: str = "sqlite+aiosqlite:///./neurotune.db"
+    #Apply pending schema migrations in init_db; turn off to run python -m backend.db.migrations by hand
+    db_migrate_on_startup: bool = True
+    #SQL logging, separate from debug so request paths don't log every statement
+    db_echo: bool = False
+    #Compiled statement cache entries, also used for sqlite3's per-connection statement cache
+    db_statement_cache_size: int = 1000
+    #Server databases (MySQL) — recycle below the server's wait_timeout, pre-ping drops dead connections
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    #SQLite — a single writer, WAL lets readers carry on while it writes
+    sqlite_pool_size: int = 5
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_mb: int = 256
+    sqlite_cache_mb: int = 64
+    sqlite_busy_timeout_ms: int = 5000
 
     #LLM config
     hf_model_id: str = "deepseek-ai/DeepSeek-R1-Distill-Llama-8B"
+    #Optional smaller model used for schedule generation instead of hf_model_id
+    llm_schedule_model_id: Optional[str] = None
+    #auto (fp16 on GPU, bf16 on CPU), fp16, bf16, int8 (dynamic quantization, CPU), fp32
+    llm_backend: str = "auto"
     llm_max_new_tokens: int = 2048
     llm_temperature: float = 0.6
     llm_timeout_seconds: int = 15
+    #Stop decoding as soon as the first complete JSON object has been generated
+    llm_early_stop: bool = True
+    #Mask logits against the ModulationSchedule JSON grammar so output always validates
+    llm_constrained_decoding: bool = True
+    #Reuse the KV cache of the static prompt instructions across requests
+    llm_prefix_cache: bool = True
+    #Micro-batching — a batch closes at llm_batch_size requests or after llm_batch_wait_ms
+    llm_batch_size: int = 8
+    llm_batch_wait_ms: int = 25
+    #Admission queue bound, requests beyond it are shed to a fallback schedule (0 = unbounded)
+    llm_max_queue_depth: int = 64
+    #local loads the model in this process, remote sends requests to backend.llm_engine.server
+    llm_mode: str = "local"
+    llm_server_url: str = "http://127.0.0.1:8100"
+    #Unix socket path for the worker, takes priority over the URL's host/port when set
+    llm_server_socket: Optional[str] = None
+    llm_server_pool_size: int = 16
+    #A failed model load is retried after llm_load_retry_sec, doubling up to llm_load_retry_max_sec (0 = no retries)
+    llm_load_retry_sec: float = 5.0
+    llm_load_retry_max_sec: float = 300.0
+
+    #Schedule cache in front of the LLM
+    schedule_cache_max_entries: int = 1024
+    schedule_cache_ttl_seconds: int = 24 * 3600
+    schedule_cache_fuzzy: bool = True
+    schedule_cache_similarity: float = 0.6
+    schedule_cache_prewarm_limit: int = 200
+
+    #Session playback frames over the websocket
+    playback_tick_hz: float = 10.0
+    playback_max_tick_hz: float = 50.0
+    #Frames held per socket before stale ones are dropped
+    playback_send_buffer: int = 8
+
+    #Server-side audio rendering
+    render_sample_rate: int = 44100
+    render_block_sec: float = 1.0
+    #Pre-rendered segments for playlist delivery
+    segment_sec: float = 6.0
+    segment_cache_dir: str = "./segment_cache"
+    segment_cache_max_mb: int = 2048
+
+    #Library tracks mixed under the modulation layers
+    mix_crossfade_sec: float = 8.0
+    #Largest tempo change applied to a track, as a fraction of its speed
+    mix_max_stretch: float = 0.08
+    mix_music_gain: float = 0.6
+    mix_candidate_limit: int = 500
+
+    #Library streaming — id -> path entries kept in memory for seeking players
+    track_index_max_entries: int = 10000
+
+    #Library scan config — 0 workers means one per CPU core
+    scan_workers: int = 0
+    scan_batch_size: int = 200
+    scan_content_hash: bool = True
+
+    #Audio analysis — excerpt of 0 analyzes the whole track
+    analysis_sample_rate: int = 22050
+    analysis_excerpt_sec: float = 0
+    #Files larger than this are analyzed blockwise with bounded memory, 0 disables
+    analysis_stream_threshold_mb: int = 100
+
+    #Analysis feature cache — memory-mapped, LRU-evicted once it reaches max size
+    feature_cache_enabled: bool = True
+    feature_cache_dir: str = "./feature_cache"
+    feature_cache_max_mb: int = 256
 
 #Global settings object
 settings = Settings()
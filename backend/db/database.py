@@ -1,14 +1,75 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from typing import AsyncGenerator
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from typing import AsyncGenerator, Optional
 
 from backend.config import settings
-from backend.models.orm import Base
+from backend.db import migrations
+
+
+def engine_options(database_url: str) -> dict:
+    #Per-backend engine profile from Settings
+    url = make_url(database_url)
+    options = {
+        "echo": settings.db_echo,
+        "query_cache_size": settings.db_statement_cache_size,
+    }
+    if url.get_backend_name() == "sqlite":
+        if url.database and url.database != ":memory:":
+            #File databases get a queue pool; SQLite has one writer, so keep it small
+            options["pool_size"] = settings.sqlite_pool_size
+            options["max_overflow"] = 0
+        options["connect_args"] = {
+            "cached_statements": settings.db_statement_cache_size,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        }
+    else:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    return options
+
+
+def sqlite_pragmas() -> list:
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}",
+        #Negative cache_size is in KiB
+        f"PRAGMA cache_size={-settings.sqlite_cache_mb * 1024}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def build_engine(database_url: str, options: Optional[dict] = None, pragmas: Optional[list] = None) -> AsyncEngine:
+    #options/pragmas default to the Settings profile; the DB benchmark passes its own to compare
+    new_engine = create_async_engine(database_url, **(engine_options(database_url) if options is None else options))
+    if pragmas is None:
+        pragmas = sqlite_pragmas()
+    if new_engine.dialect.name == "sqlite" and pragmas:
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, _record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
 
 #async database engine and session maker
-engine = create_async_engine(settings.database_url, echo=settings.debug)
+engine = build_engine(settings.database_url)
 async_session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 #database dependency session management
+#The commit runs in the cleanup after yield; with FastAPI's default "request" scope that is after the
+#response has been sent, so routes that write must use Depends(get_db, scope="function") to commit first
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_factory() as session:
         try:
@@ -16,11 +77,16 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.commit()
         except Exception:
             await session.rollback()
+            raise
         finally:
             await session.close()
 
-#initializing the database
+#initializing the database — schema changes go through backend/db/migrations
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("DB initialized")
+    if not settings.db_migrate_on_startup:
+        pending = [revision for revision, _, applied in await migrations.status(engine) if not applied]
+        if pending:
+            print(f"DB has pending migrations {', '.join(pending)}, run python -m backend.db.migrations")
+        return
+    applied = await migrations.upgrade(engine)
+    print(f"DB initialized, {len(applied)} migrations applied")
@@ -0,0 +1,212 @@
+#Ordered schema revisions, applied at startup by init_db or with python -m backend.db.migrations
+#Each module in versions/ (vNNNN_name.py) defines revision, description and upgrade(conn), where conn is a
+#sync Connection; applied revisions are recorded in schema_migrations and never run twice
+import asyncio
+import importlib
+import pkgutil
+import time
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import List
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from backend.db.migrations import versions
+
+#Serializes concurrent upgrades from several workers: a named lock on MySQL, an advisory lock on
+#Postgres, and a BEGIN IMMEDIATE write transaction around the whole upgrade on SQLite
+MYSQL_LOCK_NAME = "neurotune_migrations"
+POSTGRES_LOCK_KEY = 0x4E54_0001
+LOCK_TIMEOUT_SEC = 60
+LOCK_POLL_SEC = 0.25
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("revision", String(64), primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def load_revisions() -> List[ModuleType]:
+    #Every vNNNN_*.py under versions/, in file name order
+    names = sorted(info.name for info in pkgutil.iter_modules(versions.__path__) if info.name.startswith("v"))
+    revisions = [importlib.import_module(f"{versions.__name__}.{name}") for name in names]
+    seen = set()
+    for module in revisions:
+        if module.revision in seen:
+            raise RuntimeError(f"Duplicate migration revision {module.revision} in {module.__name__}")
+        seen.add(module.revision)
+    return revisions
+
+
+def applied_revisions(conn: Connection) -> List[str]:
+    _metadata.create_all(conn, checkfirst=True)
+    return list(conn.execute(select(schema_migrations.c.revision)).scalars())
+
+
+def pending_revisions(conn: Connection) -> List[ModuleType]:
+    applied = set(applied_revisions(conn))
+    return [module for module in load_revisions() if module.revision not in applied]
+
+
+async def upgrade(engine: AsyncEngine) -> List[str]:
+    #Applies pending revisions in order; returns the revisions applied. Pending revisions are read
+    #after the lock is taken, so a worker that waited on another finds nothing left to do
+    async with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            return await _upgrade_sqlite(conn)
+
+        await _acquire_lock(conn)
+        applied = []
+        try:
+            pending = await conn.run_sync(pending_revisions)
+            await conn.commit()
+            #One transaction per revision; MySQL commits DDL implicitly, so a failed revision there
+            #can leave part of its changes behind
+            for module in pending:
+                await conn.run_sync(_apply, module)
+                await conn.commit()
+                applied.append(module.revision)
+        finally:
+            await conn.rollback()
+            await _release_lock(conn)
+    return applied
+
+
+async def _acquire_lock(conn: AsyncConnection):
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        got = await conn.scalar(text("SELECT GET_LOCK(:name, :timeout)"),
+                                {"name": MYSQL_LOCK_NAME, "timeout": LOCK_TIMEOUT_SEC})
+    elif dialect == "postgresql":
+        deadline = time.monotonic() + LOCK_TIMEOUT_SEC
+        while not (got := await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": POSTGRES_LOCK_KEY})):
+            await conn.commit()
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(LOCK_POLL_SEC)
+    else:
+        return
+    await conn.commit()
+    if not got:
+        raise RuntimeError(f"Timed out after {LOCK_TIMEOUT_SEC}s waiting for another process's migrations")
+
+
+async def _release_lock(conn: AsyncConnection):
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MYSQL_LOCK_NAME})
+    elif dialect == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": POSTGRES_LOCK_KEY})
+    await conn.commit()
+
+
+async def _upgrade_sqlite(conn: AsyncConnection) -> List[str]:
+    #SQLite has no named locks, but DDL is transactional: the whole upgrade runs in one BEGIN IMMEDIATE
+    #transaction, which holds the database's write lock, and a second worker waits for it to commit.
+    #The driver's own transaction handling is switched off so it can't commit early
+    await conn.execution_options(isolation_level="AUTOCOMMIT")
+    deadline = time.monotonic() + LOCK_TIMEOUT_SEC
+    while True:
+        try:
+            await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            break
+        except OperationalError as e:
+            if "locked" not in str(e) or time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(LOCK_POLL_SEC)
+    try:
+        pending = await conn.run_sync(pending_revisions)
+        for module in pending:
+            await conn.run_sync(_apply, module)
+        await conn.exec_driver_sql("COMMIT")
+    except BaseException:
+        await conn.exec_driver_sql("ROLLBACK")
+        raise
+    return [module.revision for module in pending]
+
+
+async def status(engine: AsyncEngine) -> List[tuple]:
+    #(revision, description, applied) for every known revision
+    async with engine.connect() as conn:
+        applied = set(await conn.run_sync(applied_revisions))
+        await conn.commit()
+    return [(m.revision, m.description, m.revision in applied) for m in load_revisions()]
+
+
+def schema_drift(conn: Connection) -> List[str]:
+    #Tables, columns and indexes the ORM models declare but the database lacks
+    from backend.models.orm import Base
+
+    inspector = inspect(conn)
+    problems = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"missing table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems += [f"missing column {table.name}.{c.name}" for c in table.columns if c.name not in columns]
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        problems += [f"missing index {index.name}" for index in table.indexes if index.name not in indexes]
+    return problems
+
+
+async def check_legacy_upgrade() -> List[str]:
+    #Builds a throwaway SQLite database with the pre-migration schema (revision 0001, unstamped, as
+    #create_all left it), adds a row per table the app reads, upgrades it and then runs the library
+    #and session queries against it; returns what went wrong, empty when the upgrade path is sound
+    import tempfile
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from backend.db.migrations.versions import v0001_baseline
+    from backend.db.queries import LibraryQueries, SessionQueries
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/legacy.db")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(v0001_baseline.metadata.create_all)
+                await conn.execute(text(
+                    "INSERT INTO library (file_path, filename, format, bpm, tags) "
+                    "VALUES ('/music/a.flac', 'a.flac', 'flac', 120.0, '[\"calm\"]')"
+                ))
+                await conn.execute(text(
+                    "INSERT INTO sessions (user_id, intent, schedule, duration_sec) VALUES (1, 'focus', '{}', 1500)"
+                ))
+            await upgrade(engine)
+
+            async with engine.connect() as conn:
+                problems = await conn.run_sync(schema_drift)
+            if problems:
+                return problems
+            factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            async with factory() as db:
+                tracks = await LibraryQueries.list_tracks(db, format="flac")
+                tagged = await LibraryQueries.list_tracks(db, tag="calm")
+                sessions = await SessionQueries.list_by_user(db, 1)
+                fingerprints = await LibraryQueries.get_fingerprints(db, "/music/")
+            if not (len(tracks) == len(tagged) == len(sessions) == len(fingerprints) == 1):
+                return [f"legacy rows not returned after upgrade: {len(tracks)} tracks, {len(tagged)} tagged, "
+                        f"{len(sessions)} sessions, {len(fingerprints)} fingerprints"]
+        except Exception as e:
+            return [f"{type(e).__name__}: {e}"]
+        finally:
+            await engine.dispose()
+    return []
+
+
+def _apply(conn: Connection, module: ModuleType):
+    print(f"Applying migration {module.revision}: {module.description}")
+    module.upgrade(conn)
+    conn.execute(schema_migrations.insert().values(
+        revision=module.revision,
+        description=module.description,
+        applied_at=datetime.now(timezone.utc),
+    ))
@@ -0,0 +1,40 @@
+#Usage: python -m backend.db.migrations [upgrade|status|check] [--database-url ...]
+#check upgrades a throwaway database built with the pre-migration schema and verifies it against the models
+import argparse
+import asyncio
+
+from backend.config import settings
+from backend.db.database import build_engine
+from backend.db.migrations import check_legacy_upgrade, schema_drift, status, upgrade
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status", "check"], default="upgrade")
+    parser.add_argument("--database-url", default=settings.database_url)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        problems = await check_legacy_upgrade()
+        for problem in problems:
+            print(problem)
+        print("Legacy schema upgrade: " + ("FAILED" if problems else "ok"))
+        raise SystemExit(1 if problems else 0)
+
+    engine = build_engine(args.database_url)
+    try:
+        if args.command == "upgrade":
+            applied = await upgrade(engine)
+            print(f"Applied {len(applied)} migrations" + (f": {', '.join(applied)}" if applied else ", schema is current"))
+        else:
+            for revision, description, applied in await status(engine):
+                print(f"{revision}  {'applied' if applied else 'pending'}  {description}")
+            async with engine.connect() as conn:
+                for problem in await conn.run_sync(schema_drift):
+                    print(f"drift  {problem}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
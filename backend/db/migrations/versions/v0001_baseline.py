@@ -0,0 +1,80 @@
+#Schema as create_all left it before any of the scan, rescan and pagination work — frozen here, later
+#revisions change it. Databases created by create_all back then already have these tables; checkfirst
+#only adds what is missing, it never alters a table, so columns added since belong in later revisions
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, MetaData, String, Table, Text, func
+from sqlalchemy.engine import Connection
+
+revision = "0001"
+description = "baseline schema"
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(50), unique=True, index=True, nullable=False),
+    Column("email", String(255), unique=True, index=True, nullable=False),
+    Column("hashed_password", String(255), nullable=False),
+    Column("neurotype", String(50), nullable=True),
+    Column("user_preferences", Text, nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("last_active", DateTime, server_default=func.now()),
+    Column("activity", Boolean, nullable=True),
+)
+
+Table(
+    "audio", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False),
+    Column("file_path", String(500), nullable=False),
+    Column("audio_type", String(50), nullable=False),
+    Column("duration", Float, nullable=False),
+    Column("frequency", Float, nullable=False),
+    Column("bpm", Float, nullable=True),
+    Column("tags", Text, nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("activity", Boolean, nullable=True),
+)
+
+Table(
+    "sessions", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=True),
+    Column("intent", String(100), nullable=False),
+    Column("schedule", Text, nullable=False),
+    Column("duration_sec", Integer, nullable=True),
+    Column("started_at", DateTime, server_default=func.now()),
+    Column("ended_at", DateTime, nullable=True),
+    Column("rating", Integer, nullable=True),
+    Column("feedback_note", Text, nullable=True),
+)
+
+Table(
+    "library", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("file_path", String(512), unique=True, nullable=False),
+    Column("filename", String(255), nullable=False),
+    Column("format", String(10), nullable=True),
+    Column("duration_sec", Float, nullable=True),
+    Column("bpm", Float, nullable=True),
+    Column("key_signature", String(10), nullable=True),
+    Column("tags", Text, nullable=True),
+    Column("analyzed_at", DateTime, nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+)
+
+Table(
+    "prompts", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), unique=True, nullable=False),
+    Column("template", Text, nullable=False),
+    Column("model", String(100)),
+    Column("version", Integer),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("updated_at", DateTime, server_default=func.now()),
+)
+
+
+def upgrade(conn: Connection):
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,26 @@
+#Text columns holding JSON become native JSON columns
+#Values that aren't valid JSON are wrapped first: tags into a one-element list, preferences into a JSON string
+#SQLite keeps JSON as text under any declared type, so only the clean-up runs there
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+revision = "0002"
+description = "native JSON columns for schedules, tags and preferences"
+
+#table, column, how to wrap invalid values, MySQL column definition
+COLUMNS = [
+    ("sessions", "schedule", "json_object()", "JSON NOT NULL"),
+    ("library", "tags", "json_array({col})", "JSON NULL"),
+    ("audio", "tags", "json_array({col})", "JSON NULL"),
+    ("users", "user_preferences", "json_quote({col})", "JSON NULL"),
+]
+
+
+def upgrade(conn: Connection):
+    for table, column, wrap, mysql_type in COLUMNS:
+        conn.execute(text(
+            f"UPDATE {table} SET {column} = {wrap.format(col=column)} "
+            f"WHERE {column} IS NOT NULL AND NOT json_valid({column})"
+        ))
+        if conn.dialect.name == "mysql":
+            conn.execute(text(f"ALTER TABLE {table} MODIFY {column} {mysql_type}"))
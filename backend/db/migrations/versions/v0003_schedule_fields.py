@@ -0,0 +1,34 @@
+#Generated columns over sessions.schedule: step count and the first step's binaural beat, both indexed
+#Virtual, so existing rows are covered without a rewrite
+from sqlalchemy import Column, Computed, Float, Index, Integer, MetaData, Table, inspect, literal, literal_column
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from backend.models.orm import json_array_length, json_number
+
+revision = "0003"
+description = "generated step_count and initial_binaural_freq on sessions"
+
+schedule = literal_column("schedule")
+sessions = Table(
+    "sessions", MetaData(),
+    Column("step_count", Integer, Computed(json_array_length(schedule, literal("$.steps")), persisted=False)),
+    Column("initial_binaural_freq", Float,
+           Computed(json_number(schedule, literal("$.steps[0].binaural_freq")), persisted=False)),
+    Index("ix_sessions_step_count", "step_count"),
+    Index("ix_sessions_initial_binaural", "initial_binaural_freq"),
+)
+
+
+def upgrade(conn: Connection):
+    inspector = inspect(conn)
+    existing_columns = {column["name"] for column in inspector.get_columns("sessions")}
+    for column in sessions.columns:
+        if column.name not in existing_columns:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE sessions ADD COLUMN {ddl}")
+
+    existing_indexes = {index["name"] for index in inspector.get_indexes("sessions")}
+    for index in sessions.indexes:
+        if index.name not in existing_indexes:
+            index.create(conn)
@@ -0,0 +1,34 @@
+#library_tags side table — one row per (tag, track), filled from the existing library.tags lists
+from sqlalchemy import JSON, Column, ForeignKey, Index, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Connection
+
+revision = "0004"
+description = "library_tags side table for indexed tag filters"
+
+BACKFILL_CHUNK = 1000
+TAG_LENGTH = 64
+
+metadata = MetaData()
+library = Table(
+    "library", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tags", JSON),
+)
+library_tags = Table(
+    "library_tags", metadata,
+    Column("tag", String(TAG_LENGTH), primary_key=True),
+    Column("track_id", Integer, ForeignKey("library.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_library_tags_track", "track_id"),
+)
+
+
+def upgrade(conn: Connection):
+    library_tags.create(conn, checkfirst=True)
+    rows = conn.execute(select(library.c.id, library.c.tags).where(library.c.tags.is_not(None))).all()
+    pairs = [
+        {"tag": tag, "track_id": track_id}
+        for track_id, tags in rows if isinstance(tags, list)
+        for tag in {t[:TAG_LENGTH] for t in tags if isinstance(t, str)}
+    ]
+    for i in range(0, len(pairs), BACKFILL_CHUNK):
+        conn.execute(library_tags.insert(), pairs[i:i + BACKFILL_CHUNK])
@@ -0,0 +1,65 @@
+#Columns, tables and indexes the scan, rescan and pagination work added after the baseline
+#Each piece is only added when missing, so databases whose baseline already had them pass through
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text, func, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+revision = "0005"
+description = "library fingerprint columns, scan_jobs and listing indexes"
+
+metadata = MetaData()
+#Baseline columns are listed only so the indexes can name them; they already exist and are skipped
+library = Table(
+    "library", metadata,
+    Column("format", String(10), nullable=True),
+    Column("bpm", Float, nullable=True),
+    Column("file_size", BigInteger, nullable=True),
+    Column("file_mtime", Float, nullable=True),
+    Column("content_hash", String(32), nullable=True),
+    Column("missing_at", DateTime, nullable=True),
+    Index("ix_library_content_hash", "content_hash"),
+    Index("ix_library_format_bpm", "format", "bpm"),
+    Index("ix_library_bpm", "bpm"),
+)
+sessions = Table(
+    "sessions", metadata,
+    Column("user_id", Integer, nullable=True),
+    Column("started_at", DateTime),
+    Index("ix_sessions_user_started", "user_id", "started_at"),
+)
+scan_jobs = Table(
+    "scan_jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("directory_path", String(512), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("files_found", Integer),
+    Column("files_analyzed", Integer),
+    Column("files_failed", Integer),
+    Column("files_skipped", Integer),
+    Column("files_moved", Integer),
+    Column("files_removed", Integer),
+    Column("last_committed_path", String(512), nullable=True),
+    Column("error", Text, nullable=True),
+    Column("started_at", DateTime, server_default=func.now()),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+
+def upgrade(conn: Connection):
+    inspector = inspect(conn)
+    if not inspector.has_table("scan_jobs"):
+        scan_jobs.create(conn)
+        inspector = inspect(conn)
+
+    for table in (library, scan_jobs):
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+    for table in (library, sessions, scan_jobs):
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
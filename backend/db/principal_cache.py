@@ -0,0 +1,210 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as OrmSession
+
+from backend.config import settings
+
+#Session.info key for user ids to evict once the transaction commits
+PENDING_INVALIDATIONS = "principal_invalidations"
+REDIS_KEY_PREFIX = "neurotune:principal:"
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    #What an authenticated request knows about its caller — no password hash, no preferences
+    id: int
+    username: str
+    email: str
+    neurotype: Optional[str] = None
+    created_at: Optional[datetime] = None
+    last_active: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        return {name: v.isoformat() if isinstance(v, datetime) else v for name, v in data.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserPrincipal":
+        data = dict(data)
+        for name in ("created_at", "last_active"):
+            if isinstance(data.get(name), str):
+                data[name] = datetime.fromisoformat(data[name])
+        return cls(**data)
+
+
+class PrincipalBackend(ABC):
+    #Where PrincipalCache keeps entries; entries expire ttl_seconds after they are stored
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[UserPrincipal]:
+        ...
+
+    @abstractmethod
+    async def set(self, principal: UserPrincipal):
+        ...
+
+    @abstractmethod
+    async def delete(self, user_ids: Iterable[int]):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class LocalPrincipalBackend(PrincipalBackend):
+    #In-process LRU with a TTL — the default, and the stand-in for a shared backend in tests
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, user_id: int) -> Optional[UserPrincipal]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return principal
+
+    async def set(self, principal: UserPrincipal):
+        self._entries[principal.id] = (principal, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisPrincipalBackend(PrincipalBackend):
+    #Shared between workers, so an eviction in one process reaches all of them; needs the redis package
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, user_id: int) -> Optional[UserPrincipal]:
+        raw = await self._redis.get(f"{REDIS_KEY_PREFIX}{user_id}")
+        return UserPrincipal.from_dict(json.loads(raw)) if raw else None
+
+    async def set(self, principal: UserPrincipal):
+        await self._redis.set(
+            f"{REDIS_KEY_PREFIX}{principal.id}", json.dumps(principal.to_dict()), ex=max(1, int(self.ttl_seconds))
+        )
+
+    async def delete(self, user_ids: Iterable[int]):
+        keys = [f"{REDIS_KEY_PREFIX}{user_id}" for user_id in user_ids]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+class PrincipalCache:
+    #Read-through cache in front of the users table for get_current_user
+    #A backend failure is treated as a miss, so a down Redis degrades to plain DB lookups
+    def __init__(self, backend: PrincipalBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.backend_errors = 0
+        self._tasks = set()
+
+    async def get(
+        self,
+        user_id: int,
+        load: Callable[[int], Awaitable[Optional[UserPrincipal]]],
+    ) -> Optional[UserPrincipal]:
+        if not self.enabled:
+            return await load(user_id)
+        try:
+            principal = await self.backend.get(user_id)
+        except Exception as e:
+            self.backend_errors += 1
+            print(f"Principal cache read failed: {e}")
+            principal = None
+        if principal is not None:
+            self.hits += 1
+            return principal
+
+        self.misses += 1
+        principal = await load(user_id)
+        if principal is not None:
+            try:
+                await self.backend.set(principal)
+            except Exception as e:
+                self.backend_errors += 1
+                print(f"Principal cache write failed: {e}")
+        return principal
+
+    async def invalidate(self, user_ids: Iterable[int]):
+        user_ids = list(user_ids)
+        self.invalidations += len(user_ids)
+        try:
+            await self.backend.delete(user_ids)
+        except Exception as e:
+            self.backend_errors += 1
+            print(f"Principal cache invalidation failed: {e}")
+
+    def invalidate_on_commit(self, db: AsyncSession, user_id: int):
+        #Evicting at commit rather than at write time means a concurrent request can't re-cache
+        #the old row while this transaction is still open
+        db.sync_session.info.setdefault(PENDING_INVALIDATIONS, set()).add(user_id)
+
+    def _after_commit(self, user_ids: set):
+        task = asyncio.get_running_loop().create_task(self.invalidate(user_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "backend_errors": self.backend_errors,
+            **self.backend.stats(),
+        }
+
+
+def build_backend() -> PrincipalBackend:
+    if settings.principal_cache_backend == "redis":
+        return RedisPrincipalBackend(settings.principal_cache_redis_url, settings.principal_cache_ttl_seconds)
+    return LocalPrincipalBackend(settings.principal_cache_max_entries, settings.principal_cache_ttl_seconds)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _flush_invalidations(session: OrmSession):
+    user_ids = session.info.pop(PENDING_INVALIDATIONS, None)
+    if user_ids:
+        principal_cache._after_commit(user_ids)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_invalidations(session: OrmSession):
+    #Nothing changed, nothing to evict
+    session.info.pop(PENDING_INVALIDATIONS, None)
+
+
+# Singleton
+principal_cache = PrincipalCache(build_backend(), enabled=settings.principal_cache_enabled)
@@ -1,10 +1,112 @@
 #queries for auth/session management and audio ops
+#Unit of work: helpers add and flush, the caller commits once — get_db on the way out of a request
+import base64
+import json
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
+from typing import Iterable, List, Optional, Sequence
 from datetime import datetime, timezone
 
-from backend.models.orm import User, AudioTrack, Session, Library, Prompt
+from backend.db.principal_cache import UserPrincipal, principal_cache
+from backend.models.orm import User, AudioTrack, Session, Library, LibraryTag, Prompt, ScanJob, asc_nulls_first
+
+#Rows per multi-row INSERT statement in the bulk helpers
+BULK_CHUNK_SIZE = 500
+
+
+def encode_cursor(*values) -> str:
+    #Opaque page token holding the sort key of the last row on a page
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    #Raises ValueError for tokens that weren't produced by encode_cursor
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _clean_tags(tags: Optional[Iterable]) -> List[str]:
+    #Distinct string tags cut to the library_tags column width
+    width = LibraryTag.tag.type.length
+    return sorted({tag[:width] for tag in tags or () if isinstance(tag, str) and tag})
+
+
+async def _sync_library_tags(db: AsyncSession, rows: Sequence[dict]):
+    #Rewrites the library_tags rows of every track in rows that carries a tags value
+    #Rows are matched by id when they have one, otherwise by file_path
+    tagged = [row for row in rows if "tags" in row]
+    if not tagged:
+        return
+    tags_by_id = {row["id"]: row["tags"] for row in tagged if row.get("id") is not None}
+    tags_by_path = {row["file_path"]: row["tags"] for row in tagged if row.get("id") is None}
+    paths = list(tags_by_path)
+    for i in range(0, len(paths), BULK_CHUNK_SIZE):
+        result = await db.execute(
+            select(Library.id, Library.file_path).where(Library.file_path.in_(paths[i:i + BULK_CHUNK_SIZE]))
+        )
+        for track_id, file_path in result.all():
+            tags_by_id[track_id] = tags_by_path[file_path]
+
+    track_ids = list(tags_by_id)
+    for i in range(0, len(track_ids), BULK_CHUNK_SIZE):
+        await db.execute(delete(LibraryTag).where(LibraryTag.track_id.in_(track_ids[i:i + BULK_CHUNK_SIZE])))
+    await _insert_many(db, LibraryTag, [
+        {"tag": tag, "track_id": track_id}
+        for track_id, tags in tags_by_id.items()
+        for tag in _clean_tags(tags)
+    ])
+
+
+def _supports_returning(db: AsyncSession, statement: str) -> bool:
+    #statement is "insert" or "update"; MySQL has neither, SQLite 3.35+, MariaDB and Postgres do
+    return getattr(db.get_bind().dialect, f"{statement}_returning", False)
+
+
+def _utcnow_like(value: Optional[datetime]) -> datetime:
+    #SQLite hands DateTime columns back naive, match it so the two can be subtracted
+    now = datetime.now(timezone.utc)
+    if value is not None and value.tzinfo is None:
+        return now.replace(tzinfo=None)
+    return now
+
+
+async def _insert_many(db: AsyncSession, model, rows: Sequence[dict]) -> int:
+    #Multi-row INSERTs in chunks, no per-row identity fetch
+    for i in range(0, len(rows), BULK_CHUNK_SIZE):
+        await db.execute(insert(model), list(rows[i:i + BULK_CHUNK_SIZE]))
+    return len(rows)
+
+
+async def _upsert_many(db: AsyncSession, model, rows: Sequence[dict], key: str) -> int:
+    #INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE on a unique column, one statement per chunk
+    #Each chunk must share one set of columns, the updated columns are the non-key ones given
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    columns = [column for column in rows[0] if column != key]
+    for i in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = list(rows[i:i + BULK_CHUNK_SIZE])
+        if dialect == "mysql":
+            statement = mysql.insert(model).values(chunk)
+            statement = statement.on_duplicate_key_update({c: statement.inserted[c] for c in columns})
+        else:
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            statement = dialect_insert(model).values(chunk)
+            statement = statement.on_conflict_do_update(
+                index_elements=[key], set_={c: statement.excluded[c] for c in columns}
+            )
+        await db.execute(statement)
+    return len(rows)
+
 
 #CRUD ops for User
 class UserQueries:
@@ -29,8 +131,8 @@ class UserQueries:
             activity=True
         )
         db.add(user)
-        await db.commit()
-        await db.refresh(user)
+        #Flush sends the INSERT (with RETURNING for the id where supported), the request commits it
+        await db.flush()
         return user
 
     #User Details
@@ -48,6 +150,16 @@ class UserQueries:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_principal(db: AsyncSession, user_id: int) -> Optional[UserPrincipal]:
+        #Just the columns an authenticated request needs, for the principal cache
+        result = await db.execute(
+            select(User.id, User.username, User.email, User.neurotype, User.created_at, User.last_active)
+            .where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        return UserPrincipal(**row._mapping) if row else None
+
     @staticmethod
     async def get_by_username(db: AsyncSession, username: str) -> Optional[User]:
         result = await db.execute(
@@ -68,12 +180,14 @@ class UserQueries:
 
     @staticmethod
     async def update_last_active(db: AsyncSession, user_id: int) -> Optional[User]:
-        user = await UserQueries.get_by_id(db, user_id)
-        if user:
-            user.last_active = datetime.now(timezone.utc)
-            await db.commit()
-            await db.refresh(user)
-        return user
+        #One UPDATE, the row comes back through RETURNING or from the identity map
+        principal_cache.invalidate_on_commit(db, user_id)
+        statement = update(User).where(User.id == user_id).values(last_active=datetime.now(timezone.utc))
+        if _supports_returning(db, "update"):
+            result = await db.execute(statement.returning(User))
+            return result.scalar_one_or_none()
+        await db.execute(statement)
+        return await db.get(User, user_id)
 
 
 #CRUD ops for AudioTrack
@@ -87,7 +201,7 @@ class AudioTrackQueries:
         duration: float,
         frequency: float,
         bpm: Optional[float] = None,
-        tags: Optional[str] = None
+        tags: Optional[List[str]] = None
     ) -> AudioTrack:
         #new audio track
         track = AudioTrack(
@@ -102,8 +216,7 @@ class AudioTrackQueries:
             activity=True
         )
         db.add(track)
-        await db.commit()
-        await db.refresh(track)
+        await db.flush()
         return track
 
     #Audio Track Details
@@ -161,7 +274,7 @@ class SessionQueries:
     async def create_session(
         db: AsyncSession,
         intent: str,
-        schedule: str,
+        schedule: dict,
         duration_sec: int,
         user_id: Optional[int] = None
     ) -> Session:
@@ -170,10 +283,11 @@ class SessionQueries:
             intent=intent,
             schedule=schedule,
             duration_sec=duration_sec,
+            #Set here rather than by the server default, so the row needs no refresh to read it
+            started_at=datetime.now(timezone.utc),
         )
         db.add(session)
-        await db.commit()
-        await db.refresh(session)
+        await db.flush()
         return session
 
     @staticmethod
@@ -188,14 +302,47 @@ class SessionQueries:
         db: AsyncSession,
         user_id: int,
         limit: int = 20,
-        offset: int = 0
+        before: Optional[tuple] = None
+    ) -> List[Session]:
+        #Newest first; before is the (started_at, id) of the last session on the previous page
+        #Seeking past it keeps every page an index range scan, however far back the history goes
+        query = select(Session).where(Session.user_id == user_id)
+        if before is not None:
+            started_at, session_id = before
+            #The bare <= gives the planner a range to seek into, the OR settles ties on started_at
+            query = query.where(
+                Session.started_at <= started_at,
+                or_(Session.started_at < started_at, Session.id < session_id),
+            )
+        result = await db.execute(
+            query.order_by(Session.started_at.desc(), Session.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def update_schedule(
+        db: AsyncSession,
+        session_id: int,
+        schedule: dict,
+        duration_sec: int
+    ) -> None:
+        await db.execute(
+            update(Session)
+            .where(Session.id == session_id)
+            .values(schedule=schedule, duration_sec=duration_sec)
+        )
+
+    @staticmethod
+    async def list_top_rated(
+        db: AsyncSession,
+        min_rating: int = 4,
+        limit: int = 200
     ) -> List[Session]:
         result = await db.execute(
             select(Session)
-            .where(Session.user_id == user_id)
+            .where(Session.rating >= min_rating)
             .order_by(Session.started_at.desc())
             .limit(limit)
-            .offset(offset)
         )
         return result.scalars().all()
 
@@ -206,19 +353,27 @@ class SessionQueries:
         rating: Optional[int] = None,
         feedback_note: Optional[str] = None
     ) -> Optional[Session]:
-        session = await SessionQueries.get_by_id(db, session_id)
+        #Duration needs started_at, so read (or take from the identity map) then let the commit flush
+        session = await db.get(Session, session_id)
         if not session:
             return None
-        session.ended_at = datetime.now(timezone.utc)
+        session.ended_at = _utcnow_like(session.started_at)
         if session.started_at:
             delta = session.ended_at - session.started_at
             session.duration_sec = int(delta.total_seconds())
         session.rating = rating
         session.feedback_note = feedback_note
-        await db.commit()
-        await db.refresh(session)
         return session
 
+    @staticmethod
+    async def insert_many(db: AsyncSession, rows: Sequence[dict]) -> int:
+        return await _insert_many(db, Session, rows)
+
+    @staticmethod
+    async def upsert_many(db: AsyncSession, rows: Sequence[dict]) -> int:
+        #Keyed on id — rows with an existing id are overwritten, e.g. when importing history
+        return await _upsert_many(db, Session, rows, key="id")
+
 
 #CRUD ops for Library
 class LibraryQueries:
@@ -231,7 +386,7 @@ class LibraryQueries:
         duration_sec: Optional[float] = None,
         bpm: Optional[float] = None,
         key_signature: Optional[str] = None,
-        tags: Optional[str] = None,
+        tags: Optional[List[str]] = None,
         analyzed_at: Optional[datetime] = None
     ) -> Library:
         track = Library(
@@ -245,10 +400,24 @@ class LibraryQueries:
             analyzed_at=analyzed_at,
         )
         db.add(track)
-        await db.commit()
-        await db.refresh(track)
+        await db.flush()
+        if tags is not None:
+            await _sync_library_tags(db, [{"id": track.id, "tags": tags}])
         return track
 
+    @staticmethod
+    async def insert_many(db: AsyncSession, rows: Sequence[dict]) -> int:
+        count = await _insert_many(db, Library, rows)
+        await _sync_library_tags(db, rows)
+        return count
+
+    @staticmethod
+    async def upsert_many(db: AsyncSession, rows: Sequence[dict]) -> int:
+        #Keyed on file_path — rescanned files update in place instead of colliding on the unique path
+        count = await _upsert_many(db, Library, rows, key="file_path")
+        await _sync_library_tags(db, [{k: v for k, v in row.items() if k != "id"} for row in rows])
+        return count
+
     @staticmethod
     async def get_by_id(db: AsyncSession, track_id: int) -> Optional[Library]:
         result = await db.execute(
@@ -263,25 +432,105 @@ class LibraryQueries:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_fingerprints(db: AsyncSession, path_prefix: str) -> List[dict]:
+        #Lightweight fingerprint rows for every track under a directory, tombstoned ones included
+        result = await db.execute(
+            select(
+                Library.id,
+                Library.file_path,
+                Library.file_size,
+                Library.file_mtime,
+                Library.content_hash,
+                Library.missing_at,
+                Library.analyzed_at,
+            ).where(Library.file_path.startswith(path_prefix, autoescape=True))
+        )
+        return [dict(row._mapping) for row in result.all()]
+
+    @staticmethod
+    async def save_tracks_bulk(db: AsyncSession, rows: List[dict]) -> int:
+        #Rows with an id are re-analyzed tracks, the rest are new — one commit per batch
+        if not rows:
+            return 0
+        updates = [row for row in rows if row.get("id") is not None]
+        inserts = [{k: v for k, v in row.items() if k != "id"} for row in rows if row.get("id") is None]
+        if inserts:
+            await _insert_many(db, Library, inserts)
+        if updates:
+            await db.execute(update(Library), updates)
+        await _sync_library_tags(db, updates + inserts)
+        await db.commit()
+        return len(rows)
+
+    @staticmethod
+    async def relink_tracks(db: AsyncSession, moves: List[dict]) -> int:
+        #Point moved files at their new path without touching analysis results
+        if not moves:
+            return 0
+        await db.execute(update(Library), moves)
+        await db.commit()
+        return len(moves)
+
+    @staticmethod
+    async def tombstone_tracks(db: AsyncSession, track_ids: List[int], chunk_size: int = 500) -> int:
+        for i in range(0, len(track_ids), chunk_size):
+            await db.execute(
+                update(Library)
+                .where(Library.id.in_(track_ids[i:i + chunk_size]))
+                .values(missing_at=datetime.now(timezone.utc))
+            )
+        await db.commit()
+        return len(track_ids)
+
     @staticmethod
     async def list_tracks(
         db: AsyncSession,
         bpm_min: Optional[float] = None,
         bpm_max: Optional[float] = None,
         format: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        after: Optional[tuple] = None,
+        tag: Optional[str] = None
     ) -> List[Library]:
-        query = select(Library)
+        #Ordered by (bpm, id); after is that key for the last track on the previous page
+        #Unanalyzed tracks have no bpm and sort first on every backend (asc_nulls_first), which is what
+        #the cursor predicate below assumes
+        query = select(Library).where(Library.missing_at.is_(None))
         if bpm_min is not None:
             query = query.where(Library.bpm >= bpm_min)
         if bpm_max is not None:
             query = query.where(Library.bpm <= bpm_max)
         if format is not None:
             query = query.where(Library.format == format)
-        query = query.limit(limit)
+        if tag is not None:
+            #Resolved through the library_tags primary key rather than by parsing every tags list
+            query = query.where(Library.id.in_(select(LibraryTag.track_id).where(LibraryTag.tag == tag)))
+        if after is not None:
+            bpm, track_id = after
+            if bpm is None:
+                query = query.where(or_(Library.bpm.is_not(None), Library.id > track_id))
+            else:
+                #The bare >= gives the planner a range to seek into, the OR settles ties on bpm
+                query = query.where(Library.bpm >= bpm, or_(Library.bpm > bpm, Library.id > track_id))
+        query = query.order_by(asc_nulls_first(Library.bpm), Library.id).limit(limit)
         result = await db.execute(query)
         return result.scalars().all()
 
+    @staticmethod
+    async def list_mixable(db: AsyncSession, limit: int = 500) -> List[Library]:
+        #Analyzed tracks with a tempo and length, candidates for the session mix
+        result = await db.execute(
+            select(Library)
+            .where(
+                Library.missing_at.is_(None),
+                Library.bpm.is_not(None),
+                Library.duration_sec.is_not(None),
+            )
+            .limit(limit)
+        )
+        return result.scalars().all()
+
 
 #CRUD ops for Prompt
 class PromptQueries:
@@ -298,3 +547,38 @@ class PromptQueries:
             select(Prompt).where(Prompt.is_active)
         )
         return result.scalars().all()
+
+
+#CRUD ops for ScanJob
+class ScanJobQueries:
+    @staticmethod
+    async def create_job(db: AsyncSession, directory_path: str) -> ScanJob:
+        job = ScanJob(directory_path=directory_path, status="pending")
+        db.add(job)
+        await db.flush()
+        return job
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, job_id: int) -> Optional[ScanJob]:
+        result = await db.execute(
+            select(ScanJob).where(ScanJob.id == job_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def update_job(db: AsyncSession, job_id: int, **fields) -> None:
+        await db.execute(
+            update(ScanJob).where(ScanJob.id == job_id).values(**fields)
+        )
+        await db.commit()
+
+    @staticmethod
+    async def mark_interrupted(db: AsyncSession) -> int:
+        #Jobs left running by a previous process can only be resumed, not continued
+        result = await db.execute(
+            update(ScanJob)
+            .where(ScanJob.status.in_(["pending", "running"]))
+            .values(status="interrupted")
+        )
+        await db.commit()
+        return result.rowcount
@@ -0,0 +1,45 @@
+import torch
+from transformers import AutoModelForCausalLM
+
+from backend.config import settings
+
+#fp16  — half precision with device_map="auto", the GPU default
+#bf16  — bfloat16 on CPU; with bf16 checkpoints the safetensors stay memory-mapped, so
+#        uvicorn workers loading the same file share its pages
+#int8  — dynamic int8 quantization of every Linear layer, CPU only, private memory per process
+#fp32  — full precision reference
+BACKENDS = {"fp16", "bf16", "int8", "fp32"}
+
+
+def resolve_backend(device: str) -> str:
+    backend = settings.llm_backend.lower()
+    if backend == "auto":
+        return "fp16" if device == "cuda" else "bf16"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown llm_backend {settings.llm_backend!r}, expected auto or one of {sorted(BACKENDS)}")
+    return backend
+
+
+def schedule_model_id() -> str:
+    #A smaller distilled model can be swapped in just for schedule generation
+    return settings.llm_schedule_model_id or settings.hf_model_id
+
+
+def load_model(backend: str, model_id: str):
+    if backend == "fp16":
+        return AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=torch.float16,
+            device_map="auto",
+        )
+
+    common = {"use_safetensors": True, "low_cpu_mem_usage": True}
+    if backend == "bf16":
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.bfloat16, **common)
+    elif backend == "fp32":
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.float32, **common)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.float32, **common)
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    return model
@@ -1,28 +1,119 @@
 import asyncio
+import copy
 import json
 import time
 import torch
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 from pydantic import ValidationError
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+    AutoTokenizer,
+    DynamicCache,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
 
 from backend.config import settings
 from backend.models.schemas import ModulationSchedule
 from backend.llm_engine.prompts import build_schedule_prompt
 from backend.llm_engine.fallbacks import get_fallback_schedule
-from backend.llm_engine.validator import parse_llm_response
+from backend.llm_engine.validator import IncrementalJSONParser, parse_llm_response, parse_schedule_json
+from backend.llm_engine.grammar import ScheduleGrammar, TokenVocabulary
+from backend.llm_engine.backends import load_model, resolve_backend, schedule_model_id
+
+if TYPE_CHECKING:
+    from backend.llm_engine.scheduler import CancelToken
 
 MAX_RETRIES = 2
 
+#(request index, parsed step dict) — called from the model thread
+StepCallback = Callable[[int, dict], None]
+
+
+class ScheduleStreamCriteria(StoppingCriteria):
+    #Feeds each row's new tokens to an incremental JSON parser
+    #A row stops as soon as its first top-level object closes; finished steps go to on_step
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int, on_step: Optional[StepCallback] = None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.on_step = on_step
+        self.parsers = [IncrementalJSONParser() for _ in range(batch_size)]
+        self._token_offsets = [0] * batch_size
+        self._printed = [0] * batch_size
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        for row, parser in enumerate(self.parsers):
+            if not parser.complete:
+                self._feed_row(row, input_ids[row, self.prompt_length + self._token_offsets[row]:])
+            done.append(parser.complete)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    def _feed_row(self, row: int, tokens):
+        #Same offset bookkeeping as transformers' TextStreamer, so decoding stays linear
+        text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+        if text.endswith("\ufffd"):
+            return
+        chunk = text[self._printed[row]:]
+        if text.endswith("\n"):
+            self._token_offsets[row] += len(tokens)
+            self._printed[row] = 0
+        else:
+            self._printed[row] = len(text)
+        for step in self.parsers[row].feed(chunk):
+            if self.on_step:
+                self.on_step(row, step)
+
+
+class CancellationCriteria(StoppingCriteria):
+    #Stops rows whose request was abandoned or passed its deadline, checked every decode step
+    def __init__(self, cancel_tokens: List["CancelToken"]):
+        self.cancel_tokens = cancel_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = [token is not None and token.cancelled() for token in self.cancel_tokens]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class ScheduleGrammarProcessor(LogitsProcessor):
+    #Masks every token that would take a row outside the ModulationSchedule grammar
+    def __init__(self, vocab: TokenVocabulary, grammars: List[ScheduleGrammar], prompt_length: int):
+        self.vocab = vocab
+        self.grammars = grammars
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids, scores):
+        generated = input_ids.shape[1] - self.prompt_length
+        for row, grammar in enumerate(self.grammars):
+            if generated > 0 and not grammar.done and not grammar.failed:
+                grammar.advance(self.vocab.strings[int(input_ids[row, -1])])
+            allowed = grammar.allowed_tokens(self.vocab) or [self.vocab.eos_token_id]
+            mask = torch.full_like(scores[row], float("-inf"))
+            mask[allowed] = 0
+            scores[row] = scores[row] + mask
+        return scores
+
 
 class LLMEngine:
     def __init__(self):
         self.model = None
         self.tokenizer = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backend = None
+        self.vocab: Optional[TokenVocabulary] = None
+        self.prefix_ids: Optional[List[int]] = None
+        self.prefix_cache: Optional[DynamicCache] = None
+        self.tokens_generated = 0
+        self.schedules_generated = 0
+        self.rows_cancelled = 0
 
     async def load(self):
         #Called once during app lifespan startup — runs blocking load in executor
-        print(f"Loading {settings.hf_model_id} on {self.device}...")
+        self.backend = resolve_backend(self.device)
+        if self.backend != "fp16":
+            self.device = "cpu"
+        print(f"Loading {schedule_model_id()} ({self.backend}) on {self.device}...")
         start = time.time()
 
         loop = asyncio.get_running_loop()
@@ -33,25 +124,124 @@ class LLMEngine:
 
     def _load_model(self):
         #Synchronous model loading — called via run_in_executor
-        self.tokenizer = AutoTokenizer.from_pretrained(settings.hf_model_id)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            settings.hf_model_id,
-            torch_dtype=torch.float16,
-            device_map="auto",
-        )
+        #Rows are padded before their request suffix (see _encode_batch) so each ends at the generation prompt
+        model_id = schedule_model_id()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = load_model(self.backend or resolve_backend(self.device), model_id)
+        if settings.llm_constrained_decoding:
+            #Token strings for grammar masking, built once since it walks the whole vocabulary
+            self.vocab = TokenVocabulary(self.tokenizer)
+        if settings.llm_prefix_cache:
+            self._build_prefix_cache()
 
-    def generate_schedule(self, intent: str, duration_minutes: int = 25) -> ModulationSchedule:
-        #Synchronous inference — called from async endpoint via run_in_executor
-        prompt = build_schedule_prompt(intent, duration_minutes)
+    def _build_prefix_cache(self):
+        #Prefill the static instructions once; every request then only prefills its own suffix
+        #The prefix is the token run shared by two very different requests, minus one token
+        #of slack in case the first variable character merges with the last static token
+        a = self.tokenizer(self._build_input("a", 1))["input_ids"]
+        b = self.tokenizer(self._build_input("Zz 9", 120))["input_ids"]
+        shared = 0
+        while shared < min(len(a), len(b)) and a[shared] == b[shared]:
+            shared += 1
+        if shared < 2:
+            return
+        self.prefix_ids = a[:shared - 1]
+
+        prefix = torch.tensor([self.prefix_ids], device=self.model.device)
+        with torch.no_grad():
+            self.prefix_cache = self.model(
+                input_ids=prefix, past_key_values=DynamicCache(), use_cache=True
+            ).past_key_values
+        print(f"Cached KV for {len(self.prefix_ids)} prompt prefix tokens")
 
+    def _encode_batch(self, input_texts: List[str]):
+        #Layout per row: [shared prefix][padding][request suffix]
+        #Padding sits after the prefix so every row can reuse the same cached prefix KV;
+        #position ids come from the attention mask, so the gap doesn't shift the suffix
+        encoded = [self.tokenizer(text)["input_ids"] for text in input_texts]
+        pad_id = self.tokenizer.pad_token_id
+        prefix = self.prefix_ids
+        use_prefix = prefix is not None and all(ids[:len(prefix)] == prefix for ids in encoded)
+
+        head = prefix if use_prefix else []
+        tails = [ids[len(head):] for ids in encoded]
+        width = max(len(tail) for tail in tails)
+        input_ids = [head + [pad_id] * (width - len(tail)) + tail for tail in tails]
+        attention_mask = [[1] * len(head) + [0] * (width - len(tail)) + [1] * len(tail) for tail in tails]
+        inputs = {
+            "input_ids": torch.tensor(input_ids, device=self.model.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.model.device),
+        }
+
+        past_key_values = None
+        if use_prefix:
+            past_key_values = copy.deepcopy(self.prefix_cache)
+            past_key_values.batch_repeat_interleave(len(input_texts))
+        return inputs, past_key_values
+
+    def _build_input(self, intent: str, duration_minutes: int) -> str:
+        prompt = build_schedule_prompt(intent, duration_minutes)
         messages = [{"role": "user", "content": prompt}]
-        input_text = self.tokenizer.apply_chat_template(
+        return self.tokenizer.apply_chat_template(
             messages, tokenize=False, add_generation_prompt=True
         )
-        inputs = self.tokenizer(input_text, return_tensors="pt").to(self.device)
 
-        last_error = None
-        for attempt in range(MAX_RETRIES + 1):
+    def generate_schedule(self, intent: str, duration_minutes: int = 25) -> ModulationSchedule:
+        #Synchronous inference — called from async endpoint via run_in_executor
+        return self.generate_batch([(intent, duration_minutes)])[0]
+
+    def generate_batch(
+        self,
+        requests: List[Tuple[str, int]],
+        on_step: Optional[StepCallback] = None,
+        cancel_tokens: Optional[List[Optional["CancelToken"]]] = None,
+    ) -> List[ModulationSchedule]:
+        #One padded generate call per attempt for the whole micro-batch
+        #Rows that fail to parse are retried together, then fall back individually
+        #Partial steps are only streamed on the first attempt, the final schedule is authoritative
+        #With constrained decoding every row parses first time, so there is nothing to retry
+        #A cancelled row stops decoding at the next step, skips its retries and gets the fallback
+        results: List[Optional[ModulationSchedule]] = [None] * len(requests)
+        pending = list(range(len(requests)))
+        last_errors = {}
+        raw_outputs = {}
+        attempts = 1 if self.vocab is not None else MAX_RETRIES + 1
+        cancel_tokens = cancel_tokens or [None] * len(requests)
+
+        def is_cancelled(i: int) -> bool:
+            return cancel_tokens[i] is not None and cancel_tokens[i].cancelled()
+
+        for attempt in range(attempts):
+            for i in [i for i in pending if is_cancelled(i)]:
+                results[i] = get_fallback_schedule(*requests[i])
+                self.rows_cancelled += 1
+                pending.remove(i)
+            if not pending:
+                break
+            input_texts = [self._build_input(*requests[i]) for i in pending]
+            inputs, past_key_values = self._encode_batch(input_texts)
+            prompt_length = inputs["input_ids"].shape[1]
+
+            rows = list(pending)
+            stream_step = None
+            if on_step and attempt == 0:
+                def stream_step(row: int, step: dict):
+                    on_step(rows[row], step)
+            criteria = ScheduleStreamCriteria(self.tokenizer, prompt_length, len(rows), stream_step)
+
+            logits_processor = None
+            if self.vocab is not None:
+                grammars = [ScheduleGrammar(requests[i][0], requests[i][1] * 60) for i in rows]
+                logits_processor = LogitsProcessorList([
+                    ScheduleGrammarProcessor(self.vocab, grammars, prompt_length)
+                ])
+
+            stopping = [criteria] if settings.llm_early_stop else []
+            if any(cancel_tokens[i] is not None for i in rows):
+                stopping.append(CancellationCriteria([cancel_tokens[i] for i in rows]))
+
             start = time.time()
             with torch.no_grad():
                 outputs = self.model.generate(
@@ -60,26 +250,53 @@ class LLMEngine:
                     temperature=settings.llm_temperature,
                     top_p=0.95,
                     do_sample=True,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    stopping_criteria=StoppingCriteriaList(stopping) if stopping else None,
+                    logits_processor=logits_processor,
+                    past_key_values=past_key_values,
                 )
             inference_time = time.time() - start
-            print(f"LLM inference took {inference_time:.2f}s (attempt {attempt + 1})")
-
-            # Decode only new tokens (skip input)
-            new_tokens = outputs[0][inputs["input_ids"].shape[1]:]
-            raw_output = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
-
-            try:
-                return parse_llm_response(raw_output)
-            except json.JSONDecodeError as e:
-                last_error = e
-                print(f"LLM JSON parse failed (attempt {attempt + 1}): {e}")
-            except ValidationError as e:
-                last_error = e
-                print(f"LLM validation failed (attempt {attempt + 1}): {e}")
-
-        print(f"All retries exhausted, using fallback. Last error: {last_error}")
-        print(f"Raw output (first 500 chars): {raw_output[:500]}")
-        return get_fallback_schedule(intent, duration_minutes)
+
+            # Decode only new tokens (skip padded input)
+            new_tokens = outputs[:, prompt_length:]
+            generated = int((new_tokens != self.tokenizer.pad_token_id).sum())
+            self.tokens_generated += generated
+            print(
+                f"LLM inference took {inference_time:.2f}s for {len(rows)} requests, "
+                f"{generated} tokens (attempt {attempt + 1})"
+            )
+
+            failed = []
+            for row, i in enumerate(rows):
+                raw_outputs[i] = self.tokenizer.decode(new_tokens[row], skip_special_tokens=True)
+                parser = criteria.parsers[row]
+                if is_cancelled(i) and not parser.complete:
+                    #Cut off mid-document, not worth parsing or retrying
+                    results[i] = get_fallback_schedule(*requests[i])
+                    self.rows_cancelled += 1
+                    continue
+                try:
+                    if parser.complete:
+                        results[i] = parse_schedule_json(parser.result_text)
+                    else:
+                        results[i] = parse_llm_response(raw_outputs[i])
+                except json.JSONDecodeError as e:
+                    last_errors[i] = e
+                    failed.append(i)
+                    print(f"LLM JSON parse failed (attempt {attempt + 1}): {e}")
+                except ValidationError as e:
+                    last_errors[i] = e
+                    failed.append(i)
+                    print(f"LLM validation failed (attempt {attempt + 1}): {e}")
+            pending = failed
+
+        for i in pending:
+            intent, duration_minutes = requests[i]
+            print(f"All retries exhausted, using fallback. Last error: {last_errors.get(i)}")
+            print(f"Raw output (first 500 chars): {raw_outputs.get(i, '')[:500]}")
+            results[i] = get_fallback_schedule(intent, duration_minutes)
+        self.schedules_generated += len(requests)
+        return results
 
 
 # Singleton
@@ -43,3 +43,8 @@ def get_fallback_schedule(intent: str, duration_minutes: int = 25) -> Modulation
             return FALLBACK_SCHEDULES[key]
     # Default to focus
     return FALLBACK_SCHEDULES["focus"]
+
+
+def is_fallback_schedule(schedule: ModulationSchedule) -> bool:
+    #Fallbacks are returned by identity, so this tells callers the LLM didn't produce it
+    return any(schedule is fallback for fallback in FALLBACK_SCHEDULES.values())
@@ -0,0 +1,194 @@
+import json
+from typing import Dict, List, Optional, Tuple, get_args
+
+from backend.models.schemas import ModulationSchedule, ModulationStep
+
+#Decimal places the grammar allows per float field, ints get 0
+FIELD_DECIMALS = {"timestamp_sec": 0, "binaural_freq": 2, "ramp_duration_sec": 1}
+NUMERIC_CHARS = set("0123456789.")
+
+STEP_SEPARATOR = ", "
+STEPS_CLOSE = "]}"
+
+
+def _field_bounds(model, name: str) -> Tuple[Optional[float], Optional[float]]:
+    #Pull ge/le (or min_length/max_length) straight from the pydantic field metadata
+    low = high = None
+    for constraint in model.model_fields[name].metadata:
+        low = getattr(constraint, "ge", getattr(constraint, "min_length", low))
+        high = getattr(constraint, "le", getattr(constraint, "max_length", high))
+    return low, high
+
+
+def number_feasible(prefix: str, low: float, high: float, decimals: int) -> bool:
+    #Can this partial number still be completed into a value inside [low, high]?
+    if not prefix:
+        return True
+    if prefix.startswith(".") or prefix.count(".") > 1:
+        return False
+    int_part, dot, frac = prefix.partition(".")
+    if len(int_part) > 1 and int_part[0] == "0":
+        return False
+    if dot:
+        if decimals == 0 or len(frac) > decimals:
+            return False
+        base = float(f"{int_part}.{frac}") if frac else float(int_part)
+        if len(frac) == decimals:
+            return low <= base <= high
+        return base <= high and base + 10 ** -len(frac) > low
+
+    value = int(int_part)
+    max_digits = len(str(int(high)))
+    for extra in range(max_digits - len(int_part) + 1):
+        if int_part == "0" and extra > 0:
+            break
+        start = value * 10 ** extra
+        end = (value + 1) * 10 ** extra
+        if decimals == 0 and start <= high and end - 1 >= low:
+            return True
+        if decimals > 0 and start <= high and end > low:
+            return True
+    return False
+
+
+def number_complete(prefix: str, low: float, high: float) -> bool:
+    if not prefix or prefix.endswith("."):
+        return False
+    return low <= float(prefix) <= high
+
+
+class TokenVocabulary:
+    #Decoded string for every token id, indexed for prefix lookups — built once at model load
+    def __init__(self, tokenizer):
+        self.strings: List[str] = []
+        self.by_string: Dict[str, List[int]] = {}
+        self.numeric: List[Tuple[int, str]] = []
+        for token_id in range(len(tokenizer)):
+            text = tokenizer.convert_tokens_to_string([tokenizer.convert_ids_to_tokens(token_id)])
+            self.strings.append(text)
+            if not text or token_id in tokenizer.all_special_ids:
+                continue
+            self.by_string.setdefault(text, []).append(token_id)
+            if set(text) <= NUMERIC_CHARS:
+                self.numeric.append((token_id, text))
+        self.eos_token_id = tokenizer.eos_token_id
+        self.max_token_length = max((len(s) for s in self.by_string), default=1)
+
+    def prefix_tokens(self, text: str) -> List[int]:
+        #Tokens whose whole string is a non-empty prefix of text
+        allowed = []
+        for end in range(1, min(len(text), self.max_token_length) + 1):
+            allowed.extend(self.by_string.get(text[:end], ()))
+        return allowed
+
+
+class ScheduleGrammar:
+    #Character-level state machine for one canonical ModulationSchedule JSON document
+    #Segments: ("lit", text) forced text, ("choice", alts, tag) one of several texts,
+    #("num", field, low, high, decimals) a number constrained to the field's range
+    def __init__(self, intent: str, duration_sec: int):
+        self.duration_sec = duration_sec
+        self.steps = 0
+        self.min_steps, self.max_steps = _field_bounds(ModulationSchedule, "steps")
+        self.layers = list(get_args(ModulationStep.model_fields["layer"].annotation))
+        self.segments: List[tuple] = [
+            ("lit", f'{{"intent": {json.dumps(intent)}, "total_duration_sec": {duration_sec}, "steps": ['),
+        ]
+        self._push_step()
+        self.partial = ""
+        self.failed = False
+
+    @property
+    def done(self) -> bool:
+        return not self.segments
+
+    def _push_step(self):
+        self.steps += 1
+        segments = [("lit", "{")]
+        fields = ["timestamp_sec", "target_bpm", "binaural_freq", "ramp_duration_sec"]
+        for i, name in enumerate(fields):
+            low, high = _field_bounds(ModulationStep, name)
+            if name == "timestamp_sec":
+                high = self.duration_sec
+            segments.append(("lit", f'{", " if i else ""}"{name}": '))
+            segments.append(("num", name, low, high, FIELD_DECIMALS.get(name, 0)))
+        segments.append(("lit", ', "layer": '))
+        segments.append(("choice", [json.dumps(layer) for layer in self.layers], "layer"))
+        segments.append(("lit", "}"))
+        alternatives = []
+        if self.steps < self.max_steps:
+            alternatives.append(STEP_SEPARATOR)
+        if self.steps >= self.min_steps:
+            alternatives.append(STEPS_CLOSE)
+        segments.append(("choice", alternatives, "steps"))
+        self.segments.extend(segments)
+
+    def advance(self, text: str) -> bool:
+        for ch in text:
+            if not self._advance_char(ch):
+                self.failed = True
+                return False
+        return True
+
+    def _advance_char(self, ch: str) -> bool:
+        while self.segments:
+            segment = self.segments[0]
+            kind = segment[0]
+            if kind == "lit":
+                target = segment[1]
+                if target[len(self.partial)] != ch:
+                    return False
+                self.partial += ch
+                if self.partial == target:
+                    self._pop()
+                return True
+            if kind == "choice":
+                candidate = self.partial + ch
+                matches = [alt for alt in segment[1] if alt.startswith(candidate)]
+                if not matches:
+                    return False
+                self.partial = candidate
+                if candidate in matches and len(matches) == 1:
+                    self._pop()
+                    if segment[2] == "steps" and candidate == STEP_SEPARATOR:
+                        self._push_step()
+                return True
+            #Number: keep consuming while feasible, otherwise it must be complete here
+            _, _, low, high, decimals = segment
+            if ch in NUMERIC_CHARS and number_feasible(self.partial + ch, low, high, decimals):
+                self.partial += ch
+                return True
+            if not number_complete(self.partial, low, high):
+                return False
+            self._pop()
+        return False
+
+    def _pop(self):
+        self.segments.pop(0)
+        self.partial = ""
+
+    def allowed_tokens(self, vocab: TokenVocabulary) -> List[int]:
+        if self.failed:
+            return []
+        if self.done:
+            return [vocab.eos_token_id]
+        segment = self.segments[0]
+        kind = segment[0]
+        if kind == "lit":
+            return vocab.prefix_tokens(segment[1][len(self.partial):])
+        if kind == "choice":
+            allowed = []
+            for alt in segment[1]:
+                if alt.startswith(self.partial):
+                    allowed.extend(vocab.prefix_tokens(alt[len(self.partial):]))
+            return allowed
+
+        _, _, low, high, decimals = segment
+        allowed = [
+            token_id for token_id, text in vocab.numeric
+            if number_feasible(self.partial + text, low, high, decimals)
+        ]
+        if number_complete(self.partial, low, high):
+            #Next segment after a number is always literal text
+            allowed.extend(vocab.prefix_tokens(self.segments[1][1]))
+        return allowed
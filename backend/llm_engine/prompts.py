@@ -1,23 +1,22 @@
-SCHEDULE_PROMPT_TEMPLATE = """You are an audio therapy parameter generator. Given a user's session intent, produce a modulation schedule as a JSON object.
-
-The user's intent is: "{intent}"
-Requested session duration: {duration_minutes} minutes.
+#Static instructions come first so their KV cache can be computed once and reused,
+#only SCHEDULE_PROMPT_REQUEST varies per request
+SCHEDULE_PROMPT_INSTRUCTIONS = """You are an audio therapy parameter generator. Given a user's session intent, produce a modulation schedule as a JSON object.
 
 You must output ONLY a valid JSON object (no markdown, no explanation outside the JSON) with this exact structure:
 
-{{
-  "intent": "{intent}",
-  "total_duration_sec": {duration_sec},
+{
+  "intent": "<the user's intent, verbatim>",
+  "total_duration_sec": <requested duration in seconds>,
   "steps": [
-    {{
+    {
       "timestamp_sec": 0,
       "target_bpm": <int 40-200>,
       "binaural_freq": <float 0.5-40.0 Hz>,
       "ramp_duration_sec": <float>,
       "layer": "binaural"
-    }}
+    }
   ]
-}}
+}
 
 Rules for generating steps:
 - Create 3-6 steps that form a natural progression for the intent
@@ -28,12 +27,17 @@ Rules for generating steps:
 - The last step's timestamp_sec + ramp_duration_sec should approximately equal total_duration_sec
 - target_bpm represents isochronic pulse rate; typical range 60-80 for calm, 80-120 for focus
 
+"""
+
+SCHEDULE_PROMPT_REQUEST = """The user's intent is: "{intent}"
+Requested session duration: {duration_minutes} minutes ({duration_sec} seconds).
+
 Output ONLY the JSON object. No other text."""
 
 
 def build_schedule_prompt(intent: str, duration_minutes: int = 25) -> str:
     duration_sec = duration_minutes * 60
-    return SCHEDULE_PROMPT_TEMPLATE.format(
+    return SCHEDULE_PROMPT_INSTRUCTIONS + SCHEDULE_PROMPT_REQUEST.format(
         intent=intent,
         duration_minutes=duration_minutes,
         duration_sec=duration_sec,
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from typing import Callable, Optional
+
+import httpx
+
+from backend.config import settings
+from backend.models.schemas import ModulationSchedule
+from backend.llm_engine.fallbacks import get_fallback_schedule
+from backend.llm_engine.scheduler import SchedulerOverloaded
+
+#Extra time allowed on top of the worker-side deadline for the response to arrive
+DEADLINE_GRACE_SEC = 1.0
+
+
+class RemoteScheduler:
+    #Same submit/start/stop surface as GenerationScheduler, but requests go to the
+    #out-of-process worker (backend.llm_engine.server) over a pooled HTTP connection
+    def __init__(self, base_url: str, socket_path: Optional[str], pool_size: int):
+        self.base_url = base_url
+        self.socket_path = socket_path
+        self.pool_size = max(1, pool_size)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests_sent = 0
+        self.requests_shed = 0
+        self.requests_abandoned = 0
+
+    def start(self):
+        if self._client is None:
+            transport = httpx.AsyncHTTPTransport(
+                uds=self.socket_path,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            #Read timeout is left to the caller's wait_for, generations can be long
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=transport,
+                timeout=httpx.Timeout(None, connect=5.0),
+            )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def health(self) -> dict:
+        self.start()
+        response = await self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    async def submit(
+        self,
+        intent: str,
+        duration_minutes: int = 25,
+        on_step: Optional[Callable[[dict], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> ModulationSchedule:
+        #The worker enforces the deadline itself and answers with a fallback when it passes,
+        #the local wait_for only covers a worker that stopped responding
+        self.start()
+        self.requests_sent += 1
+        payload = {
+            "intent": intent,
+            "duration_minutes": duration_minutes,
+            "stream": on_step is not None,
+            "timeout_sec": timeout,
+        }
+        local_timeout = timeout + DEADLINE_GRACE_SEC if timeout is not None else None
+        try:
+            return await asyncio.wait_for(self._request(payload, on_step), local_timeout)
+        except asyncio.TimeoutError:
+            self.requests_abandoned += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "requests_sent": self.requests_sent,
+            "requests_shed": self.requests_shed,
+            "requests_abandoned": self.requests_abandoned,
+        }
+
+    async def _request(self, payload: dict, on_step: Optional[Callable[[dict], None]]) -> ModulationSchedule:
+        intent, duration_minutes = payload["intent"], payload["duration_minutes"]
+        if on_step is None:
+            response = await self._client.post("/generate", json=payload)
+            self._check(response)
+            return self._to_schedule(response.json(), intent, duration_minutes)
+
+        async with self._client.stream("POST", "/generate", json=payload) as response:
+            self._check(response)
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "schedule_step":
+                    on_step(event["step"])
+                elif event["type"] == "schedule":
+                    return self._to_schedule(event, intent, duration_minutes)
+        raise RuntimeError("LLM worker closed the stream without a schedule")
+
+    def _check(self, response: httpx.Response):
+        if response.status_code == 503:
+            self.requests_shed += 1
+            raise SchedulerOverloaded("LLM worker queue full")
+        response.raise_for_status()
+
+    @staticmethod
+    def _to_schedule(event: dict, intent: str, duration_minutes: int) -> ModulationSchedule:
+        #Hand back the shared fallback object so is_fallback_schedule keeps working across the hop
+        if event.get("fallback"):
+            return get_fallback_schedule(intent, duration_minutes)
+        return ModulationSchedule.model_validate(event["schedule"])
+
+
+# Singleton
+remote_scheduler = RemoteScheduler(
+    settings.llm_server_url,
+    socket_path=settings.llm_server_socket,
+    pool_size=settings.llm_server_pool_size,
+)
@@ -0,0 +1,173 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+from backend.db.queries import SessionQueries
+from backend.models.schemas import ModulationSchedule
+
+#Filler words that don't change what schedule a user wants
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "to", "me", "my", "i", "im", "want", "need",
+    "help", "please", "some", "with", "while", "of", "session", "music",
+}
+MAX_RAMP_SEC = 300
+
+
+def normalize_intent(intent: str) -> str:
+    #"Help me focus for Coding!" and "coding focus" map to the same key
+    tokens = re.findall(r"[a-z0-9]+", intent.lower())
+    kept = sorted({t for t in tokens if t not in STOPWORDS})
+    return " ".join(kept) if kept else " ".join(tokens)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def rescale_schedule(schedule: ModulationSchedule, duration_minutes: int) -> ModulationSchedule:
+    #Stretch step timing to a new session length, ramps stay within the schema limit
+    total = duration_minutes * 60
+    if total == schedule.total_duration_sec:
+        return schedule
+    factor = total / schedule.total_duration_sec
+    steps = [
+        step.model_copy(update={
+            "timestamp_sec": step.timestamp_sec * factor,
+            "ramp_duration_sec": min(step.ramp_duration_sec * factor, MAX_RAMP_SEC),
+        })
+        for step in schedule.steps
+    ]
+    return schedule.model_copy(update={"total_duration_sec": total, "steps": steps})
+
+
+class ScheduleCache:
+    #LRU + TTL cache of generated schedules keyed on (normalized intent, duration)
+    #Misses fall through to the same intent at another duration, then to fuzzy trigram matches
+    def __init__(self, max_entries: int, ttl_seconds: int, fuzzy: bool, similarity: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy = fuzzy
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[ModulationSchedule, float]]" = OrderedDict()
+        self._durations: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self.hits = 0
+        self.rescaled_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, intent: str, duration_minutes: int) -> Optional[ModulationSchedule]:
+        normalized = normalize_intent(intent)
+        schedule = self._lookup(normalized, duration_minutes)
+        if schedule is None and self.fuzzy:
+            match = self._closest_intent(normalized)
+            if match is not None:
+                schedule = self._lookup(match, duration_minutes)
+                if schedule is not None:
+                    self.fuzzy_hits += 1
+        if schedule is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return schedule.model_copy(update={"intent": intent})
+
+    def put(self, intent: str, duration_minutes: int, schedule: ModulationSchedule):
+        normalized = normalize_intent(intent)
+        key = (normalized, duration_minutes)
+        self._entries[key] = (schedule, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        self._durations.setdefault(normalized, set()).add(duration_minutes)
+        self._grams.setdefault(normalized, _trigrams(normalized))
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._forget(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._durations.clear()
+        self._grams.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "rescaled_hits": self.rescaled_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def prewarm(self, db: AsyncSession, limit: int) -> int:
+        #Seed from past sessions users rated highly, newest first so they win on conflicts
+        sessions = await SessionQueries.list_top_rated(db, min_rating=4, limit=limit)
+        loaded = 0
+        for session in reversed(sessions):
+            try:
+                schedule = ModulationSchedule.model_validate(session.schedule)
+            except ValidationError:
+                continue
+            self.put(session.intent, max(1, round(schedule.total_duration_sec / 60)), schedule)
+            loaded += 1
+        return loaded
+
+    def _lookup(self, normalized: str, duration_minutes: int) -> Optional[ModulationSchedule]:
+        entry = self._live_entry((normalized, duration_minutes))
+        if entry is not None:
+            return entry
+        #Same intent cached at a different length — rescale the closest one
+        for other in sorted(self._durations.get(normalized, ()), key=lambda d: abs(d - duration_minutes)):
+            entry = self._live_entry((normalized, other))
+            if entry is not None:
+                self.rescaled_hits += 1
+                return rescale_schedule(entry, duration_minutes)
+        return None
+
+    def _live_entry(self, key: Tuple[str, int]) -> Optional[ModulationSchedule]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        schedule, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._forget(key)
+            return None
+        self._entries.move_to_end(key)
+        return schedule
+
+    def _forget(self, key: Tuple[str, int]):
+        normalized, duration_minutes = key
+        durations = self._durations.get(normalized)
+        if durations is None:
+            return
+        durations.discard(duration_minutes)
+        if not durations:
+            del self._durations[normalized]
+            self._grams.pop(normalized, None)
+
+    def _closest_intent(self, normalized: str) -> Optional[str]:
+        grams = _trigrams(normalized)
+        best, best_score = None, self.similarity
+        for candidate, candidate_grams in self._grams.items():
+            score = len(grams & candidate_grams) / len(grams | candidate_grams)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+
+# Singleton
+schedule_cache = ScheduleCache(
+    max_entries=settings.schedule_cache_max_entries,
+    ttl_seconds=settings.schedule_cache_ttl_seconds,
+    fuzzy=settings.schedule_cache_fuzzy,
+    similarity=settings.schedule_cache_similarity,
+)
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from backend.models.schemas import ModulationSchedule
+from backend.llm_engine.fallbacks import get_fallback_schedule
+
+if TYPE_CHECKING:
+    from backend.llm_engine.client import LLMEngine
+
+
+def coalesce_key(intent: str, duration_minutes: int) -> Tuple[str, int]:
+    return (" ".join(intent.lower().split()), duration_minutes)
+
+
+class SchedulerOverloaded(Exception):
+    #Raised by submit when the admission queue is full — callers shed to a fallback schedule
+    pass
+
+
+class CancelToken:
+    #Shared between the event loop and the model thread, checked by the engine every decode step
+    #deadline is time.monotonic() based, None means no deadline
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def extend(self, deadline: Optional[float]):
+        #Coalesced waiters keep a shared generation alive until the latest of their deadlines
+        if self.deadline is not None:
+            self.deadline = None if deadline is None else max(self.deadline, deadline)
+
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+
+class GenerationScheduler:
+    #Queues schedule requests and decodes them in padded micro-batches on one model thread
+    #Identical in-flight requests share a single generation
+    #A generation is cancelled once every waiter has timed out or gone away
+    def __init__(self, engine: "LLMEngine", max_batch_size: int, max_wait_ms: int, max_queue_depth: int = 0):
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        #0 means unbounded
+        self.max_queue_depth = max(0, max_queue_depth)
+        self._queue: Optional[asyncio.Queue] = None
+        self._in_flight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._tokens: Dict[Tuple[str, int], CancelToken] = {}
+        self._waiters: Dict[Tuple[str, int], int] = {}
+        self._step_listeners: Dict[Tuple[str, int], List[Callable[[dict], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        #A single thread owns the model so batches never contend for it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm")
+        self.batches_run = 0
+        self.requests_coalesced = 0
+        self.requests_shed = 0
+        self.requests_abandoned = 0
+        self.requests_skipped = 0
+        self.peak_queue_depth = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue_depth)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(
+        self,
+        intent: str,
+        duration_minutes: int = 25,
+        on_step: Optional[Callable[[dict], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> ModulationSchedule:
+        #on_step receives each schedule step as soon as the model finishes writing it
+        #Raises asyncio.TimeoutError at the deadline, the model stops decoding that row shortly after
+        self.start()
+        key = coalesce_key(intent, duration_minutes)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        future = self._in_flight.get(key)
+        #A generation already cancelled for its previous waiters can't be joined, start a fresh one
+        if future is None or self._tokens[key].cancelled():
+            if self._queue.full():
+                self.requests_shed += 1
+                raise SchedulerOverloaded(f"LLM queue full ({self.max_queue_depth} pending)")
+            future = asyncio.get_running_loop().create_future()
+            token = CancelToken(deadline)
+            self._in_flight[key] = future
+            self._tokens[key] = token
+            self._queue.put_nowait((key, intent, duration_minutes, future, token))
+            self.peak_queue_depth = max(self.peak_queue_depth, self._queue.qsize())
+        else:
+            token = self._tokens[key]
+            token.extend(deadline)
+            self.requests_coalesced += 1
+        if on_step:
+            self._step_listeners.setdefault(key, []).append(on_step)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+
+        try:
+            #Shield so one caller timing out doesn't cancel the generation others are waiting on
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if not future.done():
+                self.requests_abandoned += 1
+                if self._in_flight.get(key) is future and self._waiters[key] == 1:
+                    token.cancel()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                self._waiters[key] -= 1
+                if on_step and on_step in self._step_listeners.get(key, ()):
+                    self._step_listeners[key].remove(on_step)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "batches_run": self.batches_run,
+            "requests_coalesced": self.requests_coalesced,
+            "requests_shed": self.requests_shed,
+            "requests_abandoned": self.requests_abandoned,
+            "requests_skipped": self.requests_skipped,
+            "rows_cancelled": getattr(self.engine, "rows_cancelled", 0),
+        }
+
+    async def _collect_batch(self) -> List[tuple]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _step_forwarder(self, loop: asyncio.AbstractEventLoop, keys: List[Tuple[str, int]]):
+        #Runs on the model thread — hop back onto the event loop for listeners
+        def forward(index: int, step: dict):
+            for listener in self._step_listeners.get(keys[index], ()):
+                loop.call_soon_threadsafe(listener, step)
+        return forward
+
+    def _release(self, key: Tuple[str, int], future: asyncio.Future):
+        #The key may already belong to a newer generation that replaced a cancelled one
+        if self._in_flight.get(key) is not future:
+            return
+        self._in_flight.pop(key, None)
+        self._tokens.pop(key, None)
+        self._waiters.pop(key, None)
+        self._step_listeners.pop(key, None)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            collected = await self._collect_batch()
+            #Requests abandoned while queued never reach the model
+            batch = []
+            for item in collected:
+                key, intent, duration, future, token = item
+                if token.cancelled():
+                    self.requests_skipped += 1
+                    if not future.done():
+                        future.set_result(get_fallback_schedule(intent, duration))
+                    self._release(key, future)
+                else:
+                    batch.append(item)
+            if not batch:
+                continue
+
+            requests = [(intent, duration) for _key, intent, duration, _future, _token in batch]
+            keys = [key for key, _intent, _duration, _future, _token in batch]
+            tokens = [token for _key, _intent, _duration, _future, token in batch]
+            on_step = self._step_forwarder(loop, keys) if any(k in self._step_listeners for k in keys) else None
+            try:
+                schedules = await loop.run_in_executor(
+                    self._executor, self.engine.generate_batch, requests, on_step, tokens
+                )
+                for (_key, _intent, _duration, future, _token), schedule in zip(batch, schedules):
+                    if not future.done():
+                        future.set_result(schedule)
+            except Exception as e:
+                for _key, _intent, _duration, future, _token in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                self.batches_run += 1
+                for key, _intent, _duration, future, _token in batch:
+                    self._release(key, future)
+
@@ -0,0 +1,153 @@
+#Standalone inference worker: owns the model and the batching scheduler so API processes don't
+#Usage: python -m backend.llm_engine.server [--uds /tmp/neurotune-llm.sock] [--stub]
+#       python -m backend.llm_engine.server --smoke   (POST /generate against the stub in-process, no socket)
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from backend.config import settings
+from backend.llm_engine.fallbacks import get_fallback_schedule, is_fallback_schedule
+from backend.llm_engine.scheduler import GenerationScheduler, SchedulerOverloaded
+
+
+class GenerateRequest(BaseModel):
+    intent: str = Field(..., min_length=1, max_length=500)
+    duration_minutes: int = Field(default=25, ge=1, le=180)
+    stream: bool = False
+    #Deadline for this request, the worker answers with a fallback schedule once it passes
+    timeout_sec: Optional[float] = Field(default=None, gt=0)
+
+
+class FallbackEngine:
+    #Stand-in for LLMEngine that answers every request with its fallback schedule, for tests
+    async def load(self):
+        pass
+
+    def generate_batch(self, requests: List[Tuple[str, int]], on_step=None, cancel_tokens=None):
+        #Same signature the scheduler calls LLMEngine.generate_batch with
+        return [get_fallback_schedule(intent, duration) for intent, duration in requests]
+
+
+def create_app(stub: bool = False) -> FastAPI:
+    if stub:
+        engine = FallbackEngine()
+    else:
+        from backend.llm_engine.client import llm_engine as engine
+    scheduler = GenerationScheduler(
+        engine,
+        max_batch_size=settings.llm_batch_size,
+        max_wait_ms=settings.llm_batch_wait_ms,
+        max_queue_depth=settings.llm_max_queue_depth,
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await engine.load()
+        scheduler.start()
+        print(f"LLM worker ready ({'stub' if stub else settings.hf_model_id})")
+        yield
+        await scheduler.stop()
+
+    app = FastAPI(title="NeuroTune LLM worker", lifespan=lifespan)
+
+    def result_event(schedule) -> dict:
+        return {"type": "schedule", "schedule": schedule.model_dump(), "fallback": is_fallback_schedule(schedule)}
+
+    async def submit(req: GenerateRequest, on_step=None):
+        try:
+            return await scheduler.submit(
+                req.intent, req.duration_minutes, on_step=on_step, timeout=req.timeout_sec
+            )
+        except asyncio.TimeoutError:
+            return get_fallback_schedule(req.intent, req.duration_minutes)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ready", "stub": stub, **scheduler.stats()}
+
+    @app.post("/generate")
+    async def generate(req: GenerateRequest):
+        #Shed before streaming starts so the client sees a plain 503
+        if scheduler.max_queue_depth and scheduler.stats()["queue_depth"] >= scheduler.max_queue_depth:
+            scheduler.requests_shed += 1
+            raise HTTPException(status_code=503, detail="LLM queue full")
+        if not req.stream:
+            try:
+                return result_event(await submit(req))
+            except SchedulerOverloaded as e:
+                raise HTTPException(status_code=503, detail=str(e))
+
+        #NDJSON: one schedule_step line per decoded step, then the final schedule line
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(submit(req, on_step=queue.put_nowait))
+
+        async def events():
+            try:
+                while not task.done() or not queue.empty():
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        yield json.dumps({"type": "schedule_step", "step": getter.result()}) + "\n"
+                    else:
+                        getter.cancel()
+                yield json.dumps(result_event(task.result())) + "\n"
+            finally:
+                task.cancel()
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    return app
+
+
+async def smoke_check() -> bool:
+    #Drives /generate on the stub app in-process, plain and streamed, so a change to the
+    #scheduler <-> engine contract fails here rather than in the first real request
+    import httpx
+
+    app = create_app(stub=True)
+    ok = True
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://smoke") as http:
+            response = await http.post("/generate", json={"intent": "focus", "duration_minutes": 5})
+            body = response.json() if response.status_code == 200 else {}
+            plain_ok = response.status_code == 200 and body.get("type") == "schedule" and body.get("schedule")
+            print(f"POST /generate          {response.status_code} {'ok' if plain_ok else response.text}")
+            ok = ok and bool(plain_ok)
+
+            response = await http.post("/generate", json={"intent": "focus", "duration_minutes": 5, "stream": True})
+            lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+            stream_ok = response.status_code == 200 and bool(lines) and lines[-1].get("type") == "schedule"
+            print(f"POST /generate (stream) {response.status_code} {'ok' if stream_ok else response.text}")
+            ok = ok and stream_ok
+    return ok
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--uds", default=settings.llm_server_socket, help="serve on a Unix socket instead")
+    parser.add_argument("--stub", action="store_true", help="answer with fallback schedules, no model")
+    parser.add_argument("--smoke", action="store_true", help="exercise /generate on the stub in-process and exit")
+    args = parser.parse_args(argv)
+
+    if args.smoke:
+        raise SystemExit(0 if asyncio.run(smoke_check()) else 1)
+
+    app = create_app(stub=args.stub)
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level="info")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
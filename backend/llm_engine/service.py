@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Optional
+
+from backend.config import settings
+
+#Seconds between health probes while waiting for a remote worker to come up
+WORKER_PROBE_INTERVAL_SEC = 1.0
+
+
+def is_remote() -> bool:
+    return settings.llm_mode == "remote"
+
+
+def _build_local_scheduler():
+    #torch and transformers are only imported here, on a worker thread, so the API serves immediately
+    from backend.llm_engine.client import llm_engine
+    from backend.llm_engine.scheduler import GenerationScheduler
+
+    scheduler = GenerationScheduler(
+        llm_engine,
+        max_batch_size=settings.llm_batch_size,
+        max_wait_ms=settings.llm_batch_wait_ms,
+        max_queue_depth=settings.llm_max_queue_depth,
+    )
+    return llm_engine, scheduler
+
+
+class LLMService:
+    #Warms the model (or waits for the remote worker) in the background and gates access to it
+    #Until ready, get_scheduler() returns None and callers answer from cache or fallbacks
+    #A failed load stays "failed" while it is retried with backoff, so it never reads as still warming up
+    def __init__(self):
+        self.status = "cold"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.load_attempts = 0
+        self.next_retry_at: Optional[float] = None
+        self._scheduler = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    @property
+    def warming_up(self) -> bool:
+        return self.status in ("cold", "loading")
+
+    @property
+    def unavailable(self) -> bool:
+        return self.status == "failed"
+
+    def get_scheduler(self):
+        return self._scheduler if self.ready else None
+
+    def start_loading(self):
+        if self._task is None:
+            self.status = "loading"
+            self._task = asyncio.create_task(self._load())
+
+    async def _load(self):
+        start = time.monotonic()
+        delay = settings.llm_load_retry_sec
+        while True:
+            self.load_attempts += 1
+            try:
+                scheduler = await self._load_once()
+                break
+            except Exception as e:
+                self.status = "failed"
+                self.error = str(e)
+                print(f"LLM Load Error (attempt {self.load_attempts}): {e}")
+                if delay <= 0:
+                    return
+            print(f"Retrying LLM load in {delay:.1f}s")
+            self.next_retry_at = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.llm_load_retry_max_sec)
+        self._scheduler = scheduler
+        self.load_seconds = time.monotonic() - start
+        self.error = None
+        self.next_retry_at = None
+        self.status = "ready"
+        print(f"LLM ready after {self.load_seconds:.1f}s")
+
+    async def _load_once(self):
+        if is_remote():
+            return await self._connect_remote()
+        loop = asyncio.get_running_loop()
+        engine, scheduler = await loop.run_in_executor(None, _build_local_scheduler)
+        await engine.load()
+        scheduler.start()
+        return scheduler
+
+    async def _connect_remote(self):
+        from backend.llm_engine.remote import remote_scheduler
+
+        remote_scheduler.start()
+        print(f"Waiting for LLM worker at {settings.llm_server_socket or settings.llm_server_url}")
+        try:
+            while True:
+                try:
+                    await remote_scheduler.health()
+                    return remote_scheduler
+                except Exception:
+                    await asyncio.sleep(WORKER_PROBE_INTERVAL_SEC)
+        except asyncio.CancelledError:
+            await remote_scheduler.stop()
+            raise
+
+    def stats(self) -> dict:
+        stats = {
+            "status": self.status,
+            "mode": settings.llm_mode,
+            "load_seconds": self.load_seconds,
+            "load_attempts": self.load_attempts,
+            "error": self.error,
+            "retry_in_sec": round(max(0.0, self.next_retry_at - time.monotonic()), 1) if self.next_retry_at else None,
+        }
+        if self._scheduler is not None:
+            stats["scheduler"] = self._scheduler.stats()
+        return stats
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._scheduler is not None:
+            await self._scheduler.stop()
+        self._scheduler = None
+        self._task = None
+        self.status = "cold"
+
+
+# Singleton
+llm_service = LLMService()
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+
+from backend.models.schemas import ModulationSchedule
+
+#How long a finished stream stays around for late websocket connections
+FINISHED_STREAM_TTL_SEC = 60
+
+
+class ScheduleStream:
+    #Fan-out of one session's schedule generation: partial steps, then the final schedule
+    #Events are buffered so a socket that connects late still gets the whole sequence
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.events: List[dict] = []
+        self.finished = False
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def add_step(self, step: dict):
+        self._publish({"type": "schedule_step", "index": len(self.events), "step": step})
+
+    def finish(self, schedule: ModulationSchedule, fallback: bool = False):
+        self._publish({"type": "schedule", "schedule": schedule.model_dump(), "fallback": fallback})
+        self.finished = True
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _publish(self, event: dict):
+        if self.finished:
+            return
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+
+class ScheduleStreamRegistry:
+    def __init__(self):
+        self._streams: Dict[int, ScheduleStream] = {}
+
+    def open(self, session_id: int) -> ScheduleStream:
+        stream = ScheduleStream(session_id)
+        self._streams[session_id] = stream
+        return stream
+
+    def get(self, session_id: int) -> Optional[ScheduleStream]:
+        return self._streams.get(session_id)
+
+    def close_later(self, session_id: int):
+        loop = asyncio.get_running_loop()
+        loop.call_later(FINISHED_STREAM_TTL_SEC, self._streams.pop, session_id, None)
+
+
+# Singleton
+schedule_streams = ScheduleStreamRegistry()
@@ -1,5 +1,6 @@
 import json
 import re
+from typing import List, Optional
 
 from backend.models.schemas import ModulationSchedule
 
@@ -30,5 +31,90 @@ def parse_llm_response(raw_output: str) -> ModulationSchedule:
     #Clean, extract JSON, and validate into ModulationSchedule
     cleaned = strip_think_tags(raw_output)
     json_str = extract_json(cleaned)
+    return parse_schedule_json(json_str)
+
+
+def parse_schedule_json(json_str: str) -> ModulationSchedule:
     data = json.loads(json_str)
     return ModulationSchedule(**data)
+
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class IncrementalJSONParser:
+    #Fed model output as it streams; skips <think> blocks and tracks bracket depth outside strings
+    #complete flips once the first top-level object closes, feed() returns finished array elements
+    def __init__(self):
+        self.text = ""
+        self.complete = False
+        self.result_text: Optional[str] = None
+        self._pos = 0
+        self._in_think = False
+        self._reset_json()
+
+    def _reset_json(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._start: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[dict]:
+        self.text += chunk
+        text = self.text
+        elements = []
+        while self._pos < len(text) and not self.complete:
+            i = self._pos
+            ch = text[i]
+
+            if ch == "<" and not self._in_string:
+                rest = text[i:]
+                if any(len(rest) < len(tag) and tag.startswith(rest) for tag in (THINK_OPEN, THINK_CLOSE)):
+                    #Possible tag split across chunks — wait for more text
+                    break
+                if rest.startswith(THINK_OPEN):
+                    self._in_think = True
+                    self._pos += len(THINK_OPEN)
+                    continue
+                if rest.startswith(THINK_CLOSE):
+                    #Anything before the end of reasoning wasn't the answer
+                    self._in_think = False
+                    self._reset_json()
+                    self._pos += len(THINK_CLOSE)
+                    continue
+
+            self._pos += 1
+            if self._in_think:
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._stack:
+                self._in_string = True
+            elif ch in "{[":
+                if not self._stack:
+                    if ch != "{":
+                        continue
+                    self._start = i
+                elif self._stack == ["{", "["] and ch == "{":
+                    self._element_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._stack == ["{", "["] and self._element_start is not None:
+                    try:
+                        elements.append(json.loads(text[self._element_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._element_start = None
+                elif not self._stack:
+                    self.complete = True
+                    self.result_text = text[self._start:i + 1]
+        return elements
@@ -8,9 +8,17 @@ import uvicorn
 
 from backend.models.schemas import APIResponse
 from backend.config import settings
-from backend.db.database import init_db, get_db
-from backend.llm_engine.client import llm_engine
+from backend.db.database import init_db, get_db, async_session_factory
+from backend.llm_engine.service import llm_service
+from backend.llm_engine.schedule_cache import schedule_cache
+from backend.audio_processor.pipeline import shutdown_executor
+from backend.audio_processor.jobs import scan_jobs
+from backend.audio_processor.playback import timer_wheel
+from backend.audio_processor.segment_cache import segment_cache
+from backend.audio_processor.track_index import track_index
+from backend.db.principal_cache import principal_cache
 from backend.routers.sessions import router as sessions_router
+from backend.routers.library import router as library_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,17 +26,24 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         print("Initialized Database")
+        interrupted = await scan_jobs.recover()
+        if interrupted:
+            print(f"Marked {interrupted} unfinished scan jobs as interrupted")
+        async with async_session_factory() as db:
+            warmed = await schedule_cache.prewarm(db, settings.schedule_cache_prewarm_limit)
+        print(f"Schedule cache pre-warmed with {warmed} rated sessions")
     except Exception as e:
         print(f"DB Setup Error: {e}")
 
-    try:
-        await llm_engine.load()
-        print("LLM engine loaded")
-    except Exception as e:
-        print(f"LLM Load Error: {e}")
+    #Model warm-up runs in the background, requests are served meanwhile (see /health/ready)
+    llm_service.start_loading()
 
     yield
     print("Shutting down")
+    await scan_jobs.shutdown()
+    await timer_wheel.stop()
+    await llm_service.stop()
+    shutdown_executor()
 
 #App instance
 app = FastAPI(
@@ -49,6 +64,8 @@ app.add_middleware(
 
 #Session routes
 app.include_router(sessions_router)
+#Library routes
+app.include_router(library_router)
 
 #GET
 @app.get("/", response_model=APIResponse)
@@ -78,10 +95,34 @@ async def health_check(db: AsyncSession = Depends(get_db)):
         data={
             "status": "healthy",
             "version": settings.api_version,
-            "database": db_status
+            "database": db_status,
+            "schedule_cache": schedule_cache.stats(),
+            "llm": llm_service.stats(),
+            "playback": timer_wheel.stats(),
+            "segment_cache": segment_cache.stats(),
+            "track_index": track_index.stats(),
+            "principal_cache": principal_cache.stats(),
         }
     )
 
+
+#Liveness: the process is up and serving, says nothing about the model
+@app.get("/health/live", response_model=APIResponse)
+async def liveness():
+    return APIResponse(success=True, message="alive", data={"status": "alive"})
+
+
+#Readiness: 503 until the model (or remote worker) can take schedule requests
+@app.get("/health/ready", response_model=APIResponse)
+async def readiness():
+    data = {"llm": llm_service.stats()}
+    if not llm_service.ready:
+        return JSONResponse(
+            status_code=503,
+            content=APIResponse(success=False, message="LLM not ready", data=data).model_dump(),
+        )
+    return APIResponse(success=True, message="ready", data=data)
+
 #Error Handling
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
@@ -1,10 +1,64 @@
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, func
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy import (
+    JSON, Column, Computed, ForeignKey, Index, Integer, BigInteger, String, DateTime, Float, Text, Boolean,
+    func, literal, literal_column,
+)
 
 
 class Base(DeclarativeBase):
     pass
 
+
+#JSON path functions for generated columns, spelled per dialect
+class json_array_length(FunctionElement):
+    type = Integer()
+    inherit_cache = True
+
+
+class json_number(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+class asc_nulls_first(FunctionElement):
+    #ORDER BY term: ascending with NULLs ahead of every value, on any backend
+    inherit_cache = True
+
+
+@compiles(json_array_length)
+def _json_array_length(element, compiler, **kw):
+    return f"json_array_length({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_length, "mysql")
+def _json_array_length_mysql(element, compiler, **kw):
+    return f"JSON_LENGTH({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_number)
+def _json_number(element, compiler, **kw):
+    return f"json_extract({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_number, "mysql")
+def _json_number_mysql(element, compiler, **kw):
+    return f"JSON_VALUE({compiler.process(element.clauses, **kw)} RETURNING DOUBLE)"
+
+
+@compiles(asc_nulls_first)
+def _asc_nulls_first(element, compiler, **kw):
+    #Postgres puts NULLs last on ASC
+    return f"{compiler.process(element.clauses, **kw)} ASC NULLS FIRST"
+
+
+@compiles(asc_nulls_first, "sqlite")
+@compiles(asc_nulls_first, "mysql")
+def _asc_nulls_first_native(element, compiler, **kw):
+    #Already NULLs first, and MySQL has no NULLS FIRST syntax
+    return f"{compiler.process(element.clauses, **kw)} ASC"
+
 #User model
 class User(Base):
     __tablename__ = "users"
@@ -15,7 +69,7 @@ class User(Base):
 
     #user neurodiversity trackers
     neurotype = Column(String(50), nullable=True)
-    user_preferences = Column(Text, nullable=True)
+    user_preferences = Column(JSON(none_as_null=True), nullable=True)
 
     #timestamps
     created_at = Column(DateTime, server_default=func.now())
@@ -38,8 +92,8 @@ class AudioTrack(Base):
     frequency = Column(Float, nullable=False)
     bpm = Column(Float, nullable=True)
 
-    #Metadata for track categories
-    tags = Column(Text, nullable=True)
+    #Metadata for track categories, a JSON list of strings
+    tags = Column(JSON(none_as_null=True), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     activity = Column(Boolean, nullable=True)
 
@@ -49,16 +103,28 @@ class AudioTrack(Base):
 #Session model — tracks LLM-generated audio sessions
 class Session(Base):
     __tablename__ = "sessions"
+    #A user's history, newest first — list_by_user seeks on (user_id, started_at)
+    __table_args__ = (
+        Index("ix_sessions_user_started", "user_id", "started_at"),
+        Index("ix_sessions_step_count", "step_count"),
+        Index("ix_sessions_initial_binaural", "initial_binaural_freq"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True)  # nullable for MVP (no auth)
     intent = Column(String(100), nullable=False)
-    schedule = Column(Text, nullable=False)  # JSON string
+    schedule = Column(JSON, nullable=False)  # ModulationSchedule, {} while it is still streaming
     duration_sec = Column(Integer, nullable=True)
     started_at = Column(DateTime, server_default=func.now())
     ended_at = Column(DateTime, nullable=True)
     rating = Column(Integer, nullable=True)
     feedback_note = Column(Text, nullable=True)
 
+    #Read-only, computed by the database from schedule so they can be indexed and filtered on
+    step_count = Column(Integer, Computed(json_array_length(literal_column("schedule"), literal("$.steps")), persisted=False))
+    initial_binaural_freq = Column(
+        Float, Computed(json_number(literal_column("schedule"), literal("$.steps[0].binaural_freq")), persisted=False)
+    )
+
     def __repr__(self):
         return f"<Session(intent={self.intent}, duration={self.duration_sec}s)>"
 
@@ -66,6 +132,11 @@ class Session(Base):
 #Library model — user-uploaded audio file metadata
 class Library(Base):
     __tablename__ = "library"
+    #list_tracks pages in (bpm, id) order, with or without a format filter; id rides along in both indexes
+    __table_args__ = (
+        Index("ix_library_format_bpm", "format", "bpm"),
+        Index("ix_library_bpm", "bpm"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     file_path = Column(String(512), unique=True, nullable=False)
     filename = Column(String(255), nullable=False)
@@ -73,14 +144,31 @@ class Library(Base):
     duration_sec = Column(Float, nullable=True)
     bpm = Column(Float, nullable=True)
     key_signature = Column(String(10), nullable=True)
-    tags = Column(Text, nullable=True)  # JSON string
+    tags = Column(JSON(none_as_null=True), nullable=True)  # list of strings, mirrored into library_tags
     analyzed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
+    #file fingerprint — lets rescans skip unchanged files and re-link moved ones
+    file_size = Column(BigInteger, nullable=True)
+    file_mtime = Column(Float, nullable=True)
+    content_hash = Column(String(32), nullable=True, index=True)
+    missing_at = Column(DateTime, nullable=True)  # tombstone, set when the file disappears
+
     def __repr__(self):
         return f"<Library(filename={self.filename}, bpm={self.bpm})>"
 
 
+#One row per tag on a library track, kept in step with Library.tags so tag filters are an index lookup
+class LibraryTag(Base):
+    __tablename__ = "library_tags"
+    __table_args__ = (Index("ix_library_tags_track", "track_id"),)
+    tag = Column(String(64), primary_key=True)
+    track_id = Column(Integer, ForeignKey("library.id", ondelete="CASCADE"), primary_key=True)
+
+    def __repr__(self):
+        return f"<LibraryTag(tag={self.tag}, track_id={self.track_id})>"
+
+
 #Prompt model — LLM prompt templates stored in DB
 class Prompt(Base):
     __tablename__ = "prompts"
@@ -95,3 +183,24 @@ class Prompt(Base):
 
     def __repr__(self):
         return f"<Prompt(name={self.name}, version={self.version})>"
+
+
+#Scan job model — background library scans, persisted so interrupted scans can resume
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    directory_path = Column(String(512), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    files_found = Column(Integer, default=0)
+    files_analyzed = Column(Integer, default=0)
+    files_failed = Column(Integer, default=0)
+    files_skipped = Column(Integer, default=0)
+    files_moved = Column(Integer, default=0)
+    files_removed = Column(Integer, default=0)
+    last_committed_path = Column(String(512), nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ScanJob(id={self.id}, status={self.status}, directory={self.directory_path})>"
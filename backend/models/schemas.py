@@ -89,6 +89,8 @@ class ModulationSchedule(BaseModel):
 class SessionStartRequest(BaseModel):
     intent: str = Field(..., min_length=1, max_length=100)
     duration_minutes: int = Field(25, ge=1, le=120)
+    #Return immediately and deliver the schedule step by step over the session websocket
+    stream: bool = False
 
 class SessionEndRequest(BaseModel):
     rating: Optional[int] = Field(None, ge=1, le=5)
@@ -143,7 +145,9 @@ class LibraryQueryParams(BaseModel):
     bpm_min: Optional[float] = Field(None, ge=20, le=300)
     bpm_max: Optional[float] = Field(None, ge=20, le=300)
     format: Optional[str] = None
+    tag: Optional[str] = Field(None, max_length=64)
     limit: int = Field(50, ge=1, le=200)
+    cursor: Optional[str] = None
 
 #Prompt schema
 class PromptResponse(BaseModel):
@@ -7,8 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import settings
 from backend.db.database import get_db
+from backend.db.principal_cache import UserPrincipal, principal_cache
 from backend.db.queries import UserQueries
-from backend.models.orm import User
 from backend.models.schemas import (
     APIResponse, UserCreate, LoginRequest
 )
@@ -37,8 +37,9 @@ def create_access_token(data: dict) -> str:
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
-    #Decode JWT and return user, raises 401 on any failure
+) -> UserPrincipal:
+    #Decode JWT and return the caller's principal, raises 401 on any failure
+    #Principals come from the read-through cache, the users row is only read on a miss
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
@@ -46,20 +47,19 @@ async def get_current_user(
     )
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        #JWT subjects are strings, the id goes in as one
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
 
-    user = await UserQueries.get_by_id(db, user_id)
+    user = await principal_cache.get(user_id, lambda uid: UserQueries.get_principal(db, uid))
     if user is None:
         raise credentials_exception
     return user
 
 
 @router.post("/register", response_model=APIResponse)
-async def register(req: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(req: UserCreate, db: AsyncSession = Depends(get_db, scope="function")):
     #Check email uniqueness
     if await UserQueries.get_by_email(db, req.email):
         raise HTTPException(status_code=409, detail="Email already registered")
@@ -77,7 +77,7 @@ async def register(req: UserCreate, db: AsyncSession = Depends(get_db)):
         neurotype=req.neurotype.value if req.neurotype else None,
     )
 
-    token = create_access_token({"sub": user.id})
+    token = create_access_token({"sub": str(user.id)})
     return APIResponse(
         success=True,
         message="User registered",
@@ -90,7 +90,7 @@ async def register(req: UserCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/login", response_model=APIResponse)
-async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(req: LoginRequest, db: AsyncSession = Depends(get_db, scope="function")):
     user = await UserQueries.get_by_email(db, req.email)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -101,7 +101,7 @@ async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)):
     #Update last active timestamp
     await UserQueries.update_last_active(db, user.id)
 
-    token = create_access_token({"sub": user.id})
+    token = create_access_token({"sub": str(user.id)})
     return APIResponse(
         success=True,
         message="Login successful",
@@ -114,7 +114,7 @@ async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/me", response_model=APIResponse)
-async def me(current_user: User = Depends(get_current_user)):
+async def me(current_user: UserPrincipal = Depends(get_current_user)):
     return APIResponse(
         success=True,
         message="Current user",
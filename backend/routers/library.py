@@ -1,16 +1,15 @@
-import asyncio
 import os
-from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from backend.db.database import get_db
-from backend.db.queries import LibraryQueries
+from backend.db.queries import LibraryQueries, decode_cursor, encode_cursor
 from backend.models.schemas import APIResponse, LibraryScanRequest
-from backend.audio_processor.scanner import scan_directory
-from backend.audio_processor.analyzer import analyze_track
+from backend.audio_processor.jobs import scan_jobs, FINISHED_STATUSES
+from backend.audio_processor.track_index import strong_etag, track_index
 
 router = APIRouter(prefix="/library", tags=["library"])
 
@@ -22,58 +21,108 @@ MEDIA_TYPES = {
 
 
 @router.post("/scan", response_model=APIResponse)
-async def scan_library(req: LibraryScanRequest, db: AsyncSession = Depends(get_db)):
-    #Scan a directory for audio files and analyze them with librosa
-    loop = asyncio.get_running_loop()
+async def scan_library(req: LibraryScanRequest):
+    #Start a background scan job — progress via status endpoint or websocket
+    if not os.path.isdir(req.directory_path):
+        raise HTTPException(status_code=400, detail=f"Directory does not exist: {req.directory_path}")
 
+    job = await scan_jobs.start(req.directory_path)
+    return APIResponse(
+        success=True,
+        message="Library scan started",
+        data={"job_id": job.id, "status": job.status},
+    )
+
+
+@router.get("/scan/{job_id}", response_model=APIResponse)
+async def scan_status(job_id: int):
+    status = await scan_jobs.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return APIResponse(success=True, message="Scan job status", data=status)
+
+
+@router.post("/scan/{job_id}/cancel", response_model=APIResponse)
+async def cancel_scan(job_id: int):
+    job = scan_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan job not running")
+    return APIResponse(success=True, message="Scan cancellation requested", data={"job_id": job_id})
+
+
+@router.post("/scan/{job_id}/resume", response_model=APIResponse)
+async def resume_scan(job_id: int):
     try:
-        found = await loop.run_in_executor(None, scan_directory, req.directory_path)
+        job = await scan_jobs.resume(job_id)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    tracks_analyzed = 0
-    for entry in found:
-        #Skip files already in the database
-        existing = await LibraryQueries.get_by_path(db, entry["file_path"])
-        if existing:
-            continue
-
-        #Run librosa analysis in executor to avoid blocking
-        analysis = await loop.run_in_executor(None, analyze_track, entry["file_path"])
-
-        await LibraryQueries.create_track(
-            db,
-            file_path=entry["file_path"],
-            filename=entry["filename"],
-            format=entry["format"],
-            duration_sec=analysis.get("duration_sec"),
-            bpm=analysis.get("bpm"),
-            key_signature=analysis.get("key_signature"),
-            analyzed_at=datetime.now(timezone.utc) if analysis.get("duration_sec") else None,
-        )
-        tracks_analyzed += 1
-
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scan job not found")
     return APIResponse(
         success=True,
-        message="Library scan complete",
-        data={
-            "tracks_found": len(found),
-            "tracks_analyzed": tracks_analyzed,
-        },
+        message="Library scan resumed",
+        data={"job_id": job.id, "status": job.status},
     )
 
 
+@router.websocket("/scan/{job_id}/ws")
+async def scan_websocket(websocket: WebSocket, job_id: int):
+    #Progress feed for a scan job, same transport as the session websocket
+    await websocket.accept()
+    job = scan_jobs.get_active(job_id)
+    try:
+        if job is None:
+            status = await scan_jobs.get_status(job_id)
+            if status is None:
+                await websocket.send_json({"type": "error", "message": "Scan job not found"})
+            else:
+                await websocket.send_json({"type": "progress", **status})
+            await websocket.close()
+            return
+
+        queue = job.subscribe()
+        try:
+            await websocket.send_json({"type": "connected", **job.snapshot()})
+            status = job.status
+            while status not in FINISHED_STATUSES:
+                snapshot = await queue.get()
+                status = snapshot["status"]
+                await websocket.send_json({"type": "progress", **snapshot})
+            await websocket.close()
+        finally:
+            job.unsubscribe(queue)
+    except WebSocketDisconnect:
+        print(f"Scan WebSocket disconnected for job {job_id}")
+
+
 @router.get("/", response_model=APIResponse)
 async def list_library(
     bpm_min: Optional[float] = Query(None, ge=20, le=300),
     bpm_max: Optional[float] = Query(None, ge=20, le=300),
     format: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None, max_length=64),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: AsyncSession = Depends(get_db),
 ):
+    after = None
+    if cursor:
+        try:
+            bpm, track_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(track_id, int) or not (bpm is None or isinstance(bpm, (int, float))):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (bpm, track_id)
+
+    #One extra row tells us whether there is another page
     tracks = await LibraryQueries.list_tracks(
-        db, bpm_min=bpm_min, bpm_max=bpm_max, format=format, limit=limit
+        db, bpm_min=bpm_min, bpm_max=bpm_max, format=format, limit=limit + 1, after=after, tag=tag
     )
+    next_cursor = None
+    if len(tracks) > limit:
+        tracks = tracks[:limit]
+        next_cursor = encode_cursor(tracks[-1].bpm, tracks[-1].id)
     return APIResponse(
         success=True,
         message=f"Found {len(tracks)} tracks",
@@ -87,22 +136,56 @@ async def list_library(
                     "duration_sec": t.duration_sec,
                     "bpm": t.bpm,
                     "key_signature": t.key_signature,
+                    "tags": t.tags,
                     "analyzed_at": t.analyzed_at.isoformat() if t.analyzed_at else None,
                 }
                 for t in tracks
             ],
+            "next_cursor": next_cursor,
         },
     )
 
 
-@router.get("/{track_id}/stream")
-async def stream_track(track_id: int, db: AsyncSession = Depends(get_db)):
-    track = await LibraryQueries.get_by_id(db, track_id)
-    if not track:
-        raise HTTPException(status_code=404, detail="Track not found")
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    #If-None-Match wins over If-Modified-Since, as RFC 9110 asks
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
-    if not os.path.isfile(track.file_path):
-        raise HTTPException(status_code=404, detail="Audio file not found on disk")
 
-    media_type = MEDIA_TYPES.get(track.format, "application/octet-stream")
-    return FileResponse(track.file_path, media_type=media_type, filename=track.filename)
+@router.get("/{track_id}/stream")
+async def stream_track(track_id: int, request: Request):
+    #Lookups come from the in-memory track index, so a seeking player never waits on the DB
+    #Range, multi-range (multipart/byteranges) and If-Range are handled by FileResponse against
+    #the strong ETag below; whole-file responses go out via the server's pathsend/sendfile path
+    resolved = await track_index.resolve(track_id)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    location, stat = resolved
+
+    etag = strong_etag(location, stat)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": "private, max-age=0, must-revalidate",
+        "accept-ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = MEDIA_TYPES.get(location.format, "application/octet-stream")
+    return FileResponse(
+        location.file_path,
+        media_type=media_type,
+        filename=location.filename,
+        stat_result=stat,
+        headers=headers,
+    )
@@ -1,40 +1,113 @@
 import asyncio
 import json
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db.database import get_db
-from backend.models.orm import Session as SessionModel
-from backend.models.schemas import APIResponse, SessionStartRequest
-from backend.llm_engine.client import llm_engine
+from backend.db.database import get_db, async_session_factory
+from backend.db.queries import LibraryQueries, SessionQueries
+from backend.models.schemas import APIResponse, ModulationSchedule, SessionStartRequest
+from backend.llm_engine.service import llm_service
+from backend.llm_engine.scheduler import SchedulerOverloaded
+from backend.llm_engine.schedule_cache import schedule_cache
+from backend.llm_engine.fallbacks import get_fallback_schedule, is_fallback_schedule
+from backend.llm_engine.streaming import ScheduleStream, schedule_streams
+from backend.audio_processor.segment_cache import segment_cache
+from backend.audio_processor.playback import PlaybackStream, clamp_tick_hz, timer_wheel
 from backend.config import settings
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
+#Strong refs so background generations aren't garbage collected mid-flight
+_background_tasks = set()
+
+
+async def _generate_schedule(intent: str, duration_minutes: int, on_step=None) -> ModulationSchedule:
+    #Queue for the batching scheduler — inference runs on its model thread or in the LLM worker
+    scheduler = llm_service.get_scheduler()
+    if scheduler is None:
+        return get_fallback_schedule(intent, duration_minutes)
+    try:
+        #The deadline travels with the request so the model stops decoding it when we give up
+        schedule = await scheduler.submit(
+            intent, duration_minutes, on_step=on_step, timeout=settings.llm_timeout_seconds
+        )
+    except asyncio.TimeoutError:
+        print(f"LLM deadline of {settings.llm_timeout_seconds}s passed, using fallback")
+        return get_fallback_schedule(intent, duration_minutes)
+    except SchedulerOverloaded as e:
+        print(f"Shedding schedule request: {e}")
+        return get_fallback_schedule(intent, duration_minutes)
+    if not is_fallback_schedule(schedule):
+        schedule_cache.put(intent, duration_minutes, schedule)
+    return schedule
+
+
+async def _stream_schedule(session_id: int, req: SessionStartRequest, stream: ScheduleStream):
+    #Background generation for streamed sessions, steps reach the websocket as they decode
+    try:
+        schedule = await _generate_schedule(req.intent, req.duration_minutes, on_step=stream.add_step)
+    except Exception as e:
+        print(f"Streamed generation failed for session {session_id}: {e}")
+        schedule = get_fallback_schedule(req.intent, req.duration_minutes)
+
+    try:
+        async with async_session_factory() as db:
+            await SessionQueries.update_schedule(
+                db, session_id, schedule.model_dump(), schedule.total_duration_sec
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Could not store streamed schedule for session {session_id}: {e}")
+
+    stream.finish(schedule, fallback=is_fallback_schedule(schedule))
+    schedule_streams.close_later(session_id)
+
 
 @router.post("/start", response_model=APIResponse)
-async def start_session(req: SessionStartRequest, db: AsyncSession = Depends(get_db)):
-    #Run LLM inference in a thread executor to avoid blocking the event loop
-    loop = asyncio.get_running_loop()
-    schedule = await asyncio.wait_for(
-        loop.run_in_executor(
-            None,
-            llm_engine.generate_schedule,
-            req.intent,
-            req.duration_minutes,
-        ),
-        timeout=settings.llm_timeout_seconds,
-    )
+async def start_session(req: SessionStartRequest, db: AsyncSession = Depends(get_db, scope="function")):
+    #Repeated intents are answered from the schedule cache without touching the model
+    schedule = schedule_cache.get(req.intent, req.duration_minutes)
+    #Until the model is ready, uncached intents get a fallback schedule flagged as such — warming_up
+    #while the first load is in progress, llm_unavailable once a load has failed
+    warming_up = llm_service.warming_up
+    llm_unavailable = llm_service.unavailable
+    if schedule is None and not llm_service.ready:
+        schedule = get_fallback_schedule(req.intent, req.duration_minutes)
+
+    if schedule is None and req.stream:
+        #Create the session now so the client can open its websocket while the model decodes
+        session_record = await SessionQueries.create_session(
+            db, intent=req.intent, schedule={}, duration_sec=req.duration_minutes * 60
+        )
+        #Committed before the response, the background generation writes to this row from its own session
+        await db.commit()
+
+        stream = schedule_streams.open(session_record.id)
+        task = asyncio.create_task(_stream_schedule(session_record.id, req, stream))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return APIResponse(
+            success=True,
+            message="Session started, schedule streaming",
+            data={
+                "session_id": session_record.id,
+                "schedule": None,
+                "streaming": True,
+                "fallback": False,
+                "warming_up": False,
+                "llm_unavailable": False,
+            },
+        )
+
+    if schedule is None:
+        schedule = await _generate_schedule(req.intent, req.duration_minutes)
 
     #to DB
-    session_record = SessionModel(
-        intent=req.intent,
-        schedule=schedule.model_dump_json(),
-        duration_sec=schedule.total_duration_sec,
+    session_record = await SessionQueries.create_session(
+        db, intent=req.intent, schedule=schedule.model_dump(), duration_sec=schedule.total_duration_sec
     )
-    db.add(session_record)
-    await db.flush()
-    await db.refresh(session_record)
 
     return APIResponse(
         success=True,
@@ -42,17 +115,155 @@ async def start_session(req: SessionStartRequest, db: AsyncSession = Depends(get
         data={
             "session_id": session_record.id,
             "schedule": schedule.model_dump(),
+            "fallback": is_fallback_schedule(schedule),
+            "warming_up": warming_up,
+            "llm_unavailable": llm_unavailable,
         },
     )
 
 
+AUDIO_MEDIA_TYPES = {"wav": "audio/wav", "flac": "audio/flac"}
+
+
+@router.get("/{session_id}/audio")
+async def render_session_audio(
+    session_id: int,
+    format: str = Query("wav", pattern="^(wav|flac)$"),
+    start: float = Query(0.0, ge=0),
+):
+    #Renders the session's schedule block by block as it is sent, first bytes go out after one block
+    schedule = await _load_schedule(session_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Session not found or schedule not ready")
+    #numpy and the renderer load with the first render, not at API startup
+    from backend.audio_processor.renderer import ScheduleRenderer, stream_flac, stream_wav
+
+    encoder = stream_flac if format == "flac" else stream_wav
+    media_type = AUDIO_MEDIA_TYPES[format]
+    renderer = ScheduleRenderer(schedule)
+    #Sync generator — Starlette iterates it on the threadpool, keeping rendering off the event loop
+    return StreamingResponse(
+        encoder(renderer, start),
+        media_type=media_type,
+        headers={"Content-Disposition": f'inline; filename="session-{session_id}.{format}"'},
+    )
+
+
+@router.get("/{session_id}/mix")
+async def mix_session_audio(session_id: int, db: AsyncSession = Depends(get_db)):
+    #Library tracks picked by tempo and key, bedded under the rendered modulation, as streamed WAV
+    schedule = await _load_schedule(session_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Session not found or schedule not ready")
+    tracks = await LibraryQueries.list_mixable(db, limit=settings.mix_candidate_limit)
+    from backend.audio_processor.mixer import stream_mix_wav
+
+    return StreamingResponse(
+        stream_mix_wav(schedule, tracks),
+        media_type="audio/wav",
+        headers={"Content-Disposition": f'inline; filename="session-{session_id}-mix.wav"'},
+    )
+
+
+@router.get("/{session_id}/playlist.m3u8")
+async def session_playlist(session_id: int):
+    #Segments are addressed by schedule hash, so sessions sharing a schedule share renders
+    schedule = await _load_schedule(session_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Session not found or schedule not ready")
+    return Response(
+        segment_cache.playlist(schedule, f"{router.prefix}/segments"),
+        media_type="application/vnd.apple.mpegurl",
+    )
+
+
+@router.get("/segments/{schedule_key}/{index}.wav")
+async def session_segment(schedule_key: str, index: int):
+    path = await segment_cache.get(schedule_key, index)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown segment")
+    #Render the next segment while this one plays
+    task = asyncio.create_task(segment_cache.get(schedule_key, index + 1))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    #FileResponse hands the file to the server's sendfile/pathsend path when it supports one
+    return FileResponse(
+        path,
+        media_type="audio/wav",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+async def _forward_stream(websocket: WebSocket, stream: ScheduleStream, on_schedule):
+    queue = stream.subscribe()
+    try:
+        while True:
+            event = await queue.get()
+            await websocket.send_json(event)
+            if event["type"] == "schedule":
+                on_schedule(ModulationSchedule.model_validate(event["schedule"]))
+                break
+    finally:
+        stream.unsubscribe(queue)
+
+
+async def _load_schedule(session_id: int) -> Optional[ModulationSchedule]:
+    async with async_session_factory() as db:
+        record = await SessionQueries.get_by_id(db, session_id)
+    if record is None or not record.schedule:
+        return None
+    return ModulationSchedule.model_validate(record.schedule)
+
+
+async def _send_frames(websocket: WebSocket, playback: PlaybackStream):
+    #Drains the stream's mailbox, a slow socket only ever holds up its own frames
+    while True:
+        for event in await playback.next_events():
+            await websocket.send_json(event)
+            if event["type"] == "ended":
+                return
+
+
 @router.websocket("/ws/{session_id}")
-async def session_websocket(websocket: WebSocket, session_id: int):
-    #Basic WebSocket, poc for transport. Sends connected message + ping/pong.
+async def session_websocket(
+    websocket: WebSocket,
+    session_id: int,
+    offset: float = 0.0,
+    tick_hz: Optional[float] = None,
+):
+    #Server-driven playback: once the schedule is known, interpolated parameter frames are pushed
+    #at tick_hz from the shared timer wheel. Reconnect with ?offset=<last frame t> to resume.
+    #Client messages: ping, request_schedule, seek {offset}, pause, resume.
+    #Streamed sessions also get schedule_step events and the final schedule pushed here.
     await websocket.accept()
+    forwarder = None
+    sender = None
+    playback: Optional[PlaybackStream] = None
+    paused_at: Optional[float] = None
+
+    def start_playback(schedule: ModulationSchedule):
+        nonlocal playback, sender
+        if playback is not None:
+            return
+        from backend.audio_processor.modulation import ModulationTimeline
+
+        playback = PlaybackStream(session_id, ModulationTimeline(schedule), offset, clamp_tick_hz(tick_hz))
+        timer_wheel.add(playback)
+        sender = asyncio.create_task(_send_frames(websocket, playback))
+
     try:
         await websocket.send_json({"type": "connected", "session_id": session_id})
 
+        stream = schedule_streams.get(session_id)
+        if stream is not None and not stream.finished:
+            forwarder = asyncio.create_task(_forward_stream(websocket, stream, start_playback))
+        else:
+            schedule = await _load_schedule(session_id)
+            if schedule is None:
+                await websocket.send_json({"type": "error", "message": "Session not found"})
+            else:
+                start_playback(schedule)
+
         while True:
             data = await websocket.receive_text()
             msg = json.loads(data)
@@ -64,5 +275,27 @@ async def session_websocket(websocket: WebSocket, session_id: int):
                     "type": "schedule_ack",
                     "message": "Schedule delivery via WebSocket confirmed",
                 })
+            elif playback is None:
+                continue
+            elif msg.get("type") == "seek":
+                playback.seek(float(msg.get("offset", 0)))
+                paused_at = None
+                timer_wheel.add(playback)
+                if sender.done():
+                    sender = asyncio.create_task(_send_frames(websocket, playback))
+            elif msg.get("type") == "pause" and paused_at is None:
+                paused_at = playback.position
+                timer_wheel.remove(playback)
+                await websocket.send_json({"type": "paused", "t": round(paused_at, 3)})
+            elif msg.get("type") == "resume" and paused_at is not None:
+                playback.seek(float(msg.get("offset", paused_at)))
+                paused_at = None
+                timer_wheel.add(playback)
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for session {session_id}")
+    finally:
+        if playback is not None:
+            timer_wheel.remove(playback)
+        for task in (forwarder, sender):
+            if task is not None:
+                task.cancel()